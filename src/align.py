@@ -0,0 +1,297 @@
+import json
+import os
+
+import numpy as np
+
+import instrument_paths  # noqa: F401 - puts the instrument folders on sys.path
+
+"""
+Time alignment between a PicoScope capture and a Saleae capture of the same device.
+
+The two instruments have unrelated time bases: a PicoStreamer capture counts from 0 at its
+first sample, and a Saleae export uses its own capture timestamps. Wire one sync signal (e.g. a
+GPIO the DUT toggles) to a Pico channel and a Saleae digital channel, then:
+
+    pico_sync = pico_edges("results/soak_01", 'A', level_mv=1650)
+    run = load_capture("lab_results/run_1")
+    clock = estimate_clock(pico_sync, run.trace(0).edges())    # saleae_t = offset + (1 + drift) * pico_t
+    print(clock)
+
+    # Saleae channels sampled on the Pico timeline, one chunk at a time
+    for chunk in join_chunks("results/soak_01", run, clock):
+        ...  # chunk['time_s'], chunk['pico_A'] (mV), chunk['dig_3'], chunk['ana_1']
+
+    export_joined("results/soak_01", run, clock, "results/joined_01")  # same, written to .npy columns
+    rail_mv = sample_pico_at("results/soak_01", uart_frames['start_s'], clock)  # Pico at Saleae events
+
+Everything works on memory-mapped files in chunks, so multi-gigabyte captures on both sides
+can be correlated without loading either one fully.
+"""
+
+CHUNK_SAMPLES = 1_000_000
+
+
+class ClockMap:
+    """
+    Linear map between the two time bases: t_saleae = offset_s + (1 + drift) * t_pico.
+    :param residual_s: RMS of the fit residuals over the matched sync edges.
+    :param matched: Number of sync edge pairs the fit used.
+    """
+
+    def __init__(self, offset_s=0.0, drift=0.0, residual_s=0.0, matched=0):
+        self.offset_s = float(offset_s)
+        self.drift = float(drift)
+        self.residual_s = float(residual_s)
+        self.matched = int(matched)
+
+    def __repr__(self):
+        return (f"ClockMap(offset={self.offset_s * 1e3:.6f} ms, drift={self.drift * 1e6:.3f} ppm, "
+                f"residual={self.residual_s * 1e9:.1f} ns, matched={self.matched})")
+
+    def to_saleae(self, t_pico):
+        return self.offset_s + (1.0 + self.drift) * np.asarray(t_pico, dtype=np.float64)
+
+    def to_pico(self, t_saleae):
+        return (np.asarray(t_saleae, dtype=np.float64) - self.offset_s) / (1.0 + self.drift)
+
+    def to_dict(self):
+        return {'offset_s': self.offset_s, 'drift': self.drift, 'residual_s': self.residual_s, 'matched': self.matched}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d['offset_s'], d['drift'], d.get('residual_s', 0.0), d.get('matched', 0))
+
+
+def analog_edges(raw, interval_s, hi, lo, direction='rising', chunk=CHUNK_SAMPLES):
+    """
+    Threshold-crossing times (s) in a raw int16 channel, read chunk by chunk.
+    Crossings use a Schmitt trigger (high at >= hi counts, low at <= lo counts) and are refined
+    to sub-sample precision by interpolating between the two samples around the crossing.
+    """
+    from pico_analytics import schmitt_states
+
+    times = []
+    state, last = None, None
+    for start in range(0, len(raw), chunk):
+        block = np.asarray(raw[start:start + chunk])
+        filled, prev = schmitt_states(block, hi, lo, state)
+        if filled is None:
+            last = int(block[-1])
+            continue
+        idx = np.flatnonzero((prev >= 0) & (filled >= 0) & (prev != filled))
+        if direction == 'rising':
+            idx = idx[filled[idx] == 1]
+        elif direction == 'falling':
+            idx = idx[filled[idx] == 0]
+
+        # previous sample for each crossing (from the last chunk for idx == 0)
+        before = np.where(idx > 0, block[np.maximum(idx - 1, 0)], block[0] if last is None else last).astype(np.float64)
+        after = block[idx].astype(np.float64)
+        level = np.where(filled[idx] == 1, hi, lo)
+        step = after - before
+        frac = np.clip(np.divide(level - before, step, out=np.ones_like(step), where=step != 0), 0.0, 1.0)
+        times.append((start + idx - 1 + frac) * interval_s)
+
+        state = int(filled[-1])
+        last = int(block[-1])
+    return np.concatenate(times) if times else np.zeros(0)
+
+
+def pico_edges(capture_dir, channel, level_mv, hysteresis_mv=0.0, direction='rising'):
+    """Sync edge times (s, Pico time base) of one channel of a saved PicoStreamer capture."""
+    from pico_driver import CHANNEL_INPUT_RANGES_MV
+    from pico_storage import open_capture
+
+    meta, channels = open_capture(capture_dir)
+    scale = CHANNEL_INPUT_RANGES_MV[meta['channel_ranges'][channel]] / meta['max_adc']
+    hi = int(np.ceil((level_mv + hysteresis_mv / 2) / scale))
+    lo = int(np.floor((level_mv - hysteresis_mv / 2) / scale))
+    return analog_edges(channels[channel], meta['sample_interval_ns'] / 1e9, hi, lo, direction)
+
+
+def _nearest(sorted_b, query):
+    """Index of and distance to the nearest element of sorted_b for every query value."""
+    idx = np.clip(np.searchsorted(sorted_b, query), 1, len(sorted_b) - 1) if len(sorted_b) > 1 else np.zeros(len(query), np.int64)
+    left = sorted_b[idx - 1] if len(sorted_b) > 1 else sorted_b[idx]
+    right = sorted_b[idx]
+    use_left = np.abs(query - left) < np.abs(query - right)
+    best = np.where(use_left, idx - 1, idx) if len(sorted_b) > 1 else idx
+    return best, np.abs(sorted_b[best] - query)
+
+
+def estimate_clock(pico_sync_s, saleae_sync_s, tolerance_s=None, vote_edges=200, iterations=3):
+    """
+    Fits the clock offset and drift between the instruments from shared sync edges.
+    One edge gives the offset only; more edges (ideally spread over the capture) also give drift.
+    The instruments don't need to have started together - the offset is found by voting over
+    candidate edge pairings before the least-squares fit. That needs a sync signal with uneven
+    gaps between edges: a strictly periodic one fits equally well at every whole period, so it
+    raises ValueError instead of returning an arbitrary offset.
+    :param pico_sync_s: Sync edge times on the Pico time base (e.g. pico_edges()).
+    :param saleae_sync_s: The same edges on the Saleae time base (e.g. trace.edges()).
+    :param tolerance_s: Max distance for two edges to count as the same edge once aligned
+                        (default: a quarter of the median Saleae edge spacing).
+    """
+    a = np.sort(np.asarray(pico_sync_s, dtype=np.float64))
+    b = np.sort(np.asarray(saleae_sync_s, dtype=np.float64))
+    if not len(a) or not len(b):
+        raise ValueError("Need at least one sync edge from each instrument")
+    if tolerance_s is None:
+        tolerance_s = float(np.median(np.diff(b))) / 4 if len(b) > 1 else np.inf
+
+    # coarse offset: try pairing the first edge of one side with each of the first edges of the other
+    k = min(vote_edges, len(a), len(b))
+    candidates = np.unique(np.concatenate([b[:k] - a[0], b[0] - a[:k]]))
+    shifted = a[:k][None, :] + candidates[:, None]
+    _, dist = _nearest(b, shifted.ravel())
+    score = (dist.reshape(shifted.shape) <= tolerance_s).sum(axis=1)
+    best = int(np.argmax(score))
+    # a periodic sync signal lines up just as well one period later: the vote can't pick the offset
+    other = np.abs(candidates - candidates[best]) > tolerance_s
+    if score[best] > 1 and other.any() and score[other].max() >= score[best] - 1:
+        runner_up = candidates[other][int(np.argmax(score[other]))]
+        raise ValueError(f"Sync edges match about as well at offsets {candidates[best]:.6f} s and {runner_up:.6f} s - "
+                         "the sync signal is too regular; use one with uneven gaps between edges")
+    clock = ClockMap(candidates[best])
+
+    for _ in range(iterations):
+        idx, dist = _nearest(b, clock.to_saleae(a))
+        ok = dist <= tolerance_s
+        pa, pb = a[ok], b[idx[ok]]
+        if len(pa) >= 2 and np.ptp(pa) > 0:
+            slope, offset = np.polyfit(pa, pb, 1)
+            clock = ClockMap(offset, slope - 1.0)
+        elif len(pa):
+            clock = ClockMap(float(np.mean(pb - pa)))
+        clock.matched = len(pa)
+        clock.residual_s = float(np.sqrt(np.mean((clock.to_saleae(pa) - pb) ** 2))) if len(pa) else 0.0
+    if clock.matched == 0:
+        raise ValueError("No sync edges could be matched - check the channels and tolerance_s")
+    return clock
+
+
+def asof(times, values, query, fill=0):
+    """Value of the last entry at or before each query time (times sorted); `fill` before the first."""
+    idx = np.searchsorted(times, query, side='right') - 1
+    return np.where(idx >= 0, values[np.maximum(idx, 0)], fill)
+
+
+def sample_uniform(samples, t0_s, dt_s, query_s, method='nearest'):
+    """
+    Samples a uniformly sampled signal at arbitrary times; NaN outside the signal.
+    Only the samples around the query times are read, so `samples` can be a large memmap.
+    """
+    pos = (np.asarray(query_s, dtype=np.float64) - t0_s) / dt_s
+    n = len(samples)
+    inside = (pos >= 0) & (pos <= n - 1)
+    out = np.full(pos.shape, np.nan)
+    if not inside.any():
+        return out
+    p = pos[inside]
+    if method == 'nearest':
+        out[inside] = samples[np.rint(p).astype(np.int64)]
+    elif method == 'linear':
+        i0 = np.minimum(np.floor(p).astype(np.int64), n - 2) if n > 1 else np.zeros(len(p), np.int64)
+        i1 = np.minimum(i0 + 1, n - 1)
+        frac = p - i0
+        out[inside] = samples[i0] * (1 - frac) + samples[i1] * frac
+    else:
+        raise ValueError("method must be 'nearest' or 'linear'")
+    return out
+
+
+def _pico(capture_dir):
+    from pico_driver import CHANNEL_INPUT_RANGES_MV
+    from pico_storage import open_capture
+
+    meta, channels = open_capture(capture_dir)
+    scales = {ch: CHANNEL_INPUT_RANGES_MV[meta['channel_ranges'][ch]] / meta['max_adc'] for ch in channels}
+    return meta, channels, scales
+
+
+def _sample_range(meta, t_start, t_end):
+    """Pico sample indices [first, last) covering an optional window in seconds."""
+    interval_s = meta['sample_interval_ns'] / 1e9
+    first = 0 if t_start is None else max(int(np.ceil(t_start / interval_s)), 0)
+    last = meta['sample_count'] if t_end is None else min(int(t_end / interval_s) + 1, meta['sample_count'])
+    return first, max(last, first)
+
+
+def join_chunks(pico_dir, saleae_run, clock, digital=None, analog=None, t_start=None, t_end=None,
+                chunk=CHUNK_SAMPLES, method='nearest'):
+    """
+    As-of join of Saleae channels onto the Pico sample grid, yielded chunk by chunk.
+    :param saleae_run: saleae_loader.SaleaeCapture.
+    :param digital, analog: Saleae channels to include (default: all).
+    :param t_start, t_end: Optional window on the Pico time base (s).
+    :return: Iterator of dicts: 'time_s' (Pico time), 'pico_A' (mV), 'dig_<ch>' (state, -1 before
+             the Saleae capture), 'ana_<ch>' (NaN outside the Saleae capture).
+    """
+    meta, channels, scales = _pico(pico_dir)
+    interval_s = meta['sample_interval_ns'] / 1e9
+    first, last = _sample_range(meta, t_start, t_end)
+    digital = list(saleae_run.digital) if digital is None else digital
+    analog = list(saleae_run.analog) if analog is None else analog
+    traces = {ch: saleae_run.trace(ch) for ch in digital}
+
+    for start in range(first, last, chunk):
+        stop = min(start + chunk, last)
+        t_pico = np.arange(start, stop) * interval_s
+        t_saleae = clock.to_saleae(t_pico)
+        out = {'time_s': t_pico}
+        for ch, raw in channels.items():
+            out[f"pico_{ch}"] = raw[start:stop].astype(np.float32) * np.float32(scales[ch])
+        t_ns = np.rint(t_saleae * 1e9).astype(np.int64)
+        for ch, trace in traces.items():
+            out[f"dig_{ch}"] = trace.state_at_ns(t_ns).astype(np.int8)
+        for ch in analog:
+            out[f"ana_{ch}"] = sample_uniform(saleae_run.analog[ch], saleae_run.analog_t0[ch], saleae_run.analog_dt[ch],
+                                              t_saleae, method).astype(np.float32)
+        yield out
+
+
+def export_joined(pico_dir, saleae_run, clock, out_dir, **kwargs):
+    """
+    Writes join_chunks() output as one .npy column per signal plus alignment.json.
+    Columns are written chunk by chunk into preallocated memmaps.
+    """
+    from pico_storage import read_meta
+
+    if not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+    first, last = _sample_range(read_meta(pico_dir), kwargs.get('t_start'), kwargs.get('t_end'))
+    columns = {}
+    n = 0
+    for part in join_chunks(pico_dir, saleae_run, clock, **kwargs):
+        size = len(part['time_s'])
+        for name, values in part.items():
+            if name not in columns:
+                columns[name] = np.lib.format.open_memmap(os.path.join(out_dir, f"{name}.npy"), mode='w+',
+                                                          dtype=values.dtype, shape=(last - first,))
+            columns[name][n:n + size] = values
+        n += size
+    for column in columns.values():
+        column.flush()
+
+    with open(os.path.join(out_dir, "alignment.json"), 'w') as f:
+        json.dump({'pico_dir': pico_dir, 'saleae_dir': saleae_run.directory, 'clock': clock.to_dict(),
+                   'samples': n, 'columns': sorted(columns)}, f, indent=2)
+    print(f"Joined {n} samples ({len(columns)} columns) into: {out_dir}")
+    return out_dir
+
+
+def sample_pico_at(pico_dir, saleae_times_s, clock, method='linear', chunk=CHUNK_SAMPLES):
+    """
+    Pico channel values (mV) at Saleae event times (e.g. decoded UART frame starts).
+    :return: Dict {channel: float array, NaN where the Pico wasn't recording}.
+    """
+    meta, channels, scales = _pico(pico_dir)
+    interval_s = meta['sample_interval_ns'] / 1e9
+    t_pico = clock.to_pico(saleae_times_s)
+    out = {}
+    for ch, raw in channels.items():
+        values = np.empty(len(t_pico))
+        for start in range(0, len(t_pico), chunk):
+            values[start:start + chunk] = sample_uniform(raw, 0.0, interval_s, t_pico[start:start + chunk], method)
+        out[ch] = values * scales[ch]
+    return out
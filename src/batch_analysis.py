@@ -0,0 +1,491 @@
+import csv
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import instrument_paths  # noqa: F401 - puts the instrument folders on sys.path
+
+from capture_catalog import data_files, detect_instrument, identity_sha256
+
+"""
+Batch post-processing of many stored captures on a process pool.
+
+    analyzer = BatchAnalyzer(jobs=['rc_fit', 'edge_stats', 'threshold_timing'],
+                             settings={'edge_stats': {'level_mv': 1650, 'hysteresis_mv': 100},
+                                       'threshold_timing': {'levels_mv': [2500], 'target_mv': 5000}})
+    results = analyzer.run(["results/", "lab_results/"])   # capture folders / CSVs, or folders of them
+    analyzer.write_report(results, "results/batch_report.json")   # + batch_report.csv
+
+One task per capture goes to a worker process, largest first, so throughput scales with cores
+until the disks can't keep up. Workers read memory-mapped binary data: Pico capture folders and
+npy exports directly, Saleae exports through the saleae_loader cache, and Pico CSVs through a
+float32 copy converted once into the batch cache. Results are cached per capture under the
+content hash of its data files (the same hash the capture catalog uses) and the job settings,
+so a rerun only processes captures that are new, changed, or need a job they haven't had.
+
+Jobs (each returns {channel: {metric: value}}):
+    rc_fit            - v(t) = v_inf + (v0 - v_inf) * exp(-t / tau) fit of analog channels
+    edge_stats        - edge count, frequency, period jitter, pulse widths, duty cycle of digital
+                        channels (and analog channels thresholded at level_mv)
+    threshold_timing  - crossing times of levels and time-to-X% of a target for analog channels
+"""
+
+CACHE_DIRNAME = ".batch_cache"
+HASH_CHUNK = 8 * 1024 * 1024
+READ_CHUNK = 1_000_000
+FIT_POINTS = 20_000 # rc_fit bins the curve down to this many points
+
+
+# --- capture access (runs in the workers) -------------------------------------------------------
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(HASH_CHUNK)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _base(path):
+    return path if os.path.isdir(path) else os.path.dirname(path)
+
+
+def content_hash(path):
+    """SHA-256 over a capture's data files (matches CaptureCatalog's data_sha256)."""
+    return identity_sha256({rel: _file_sha256(os.path.join(_base(path), rel)) for rel in data_files(path)})
+
+
+def stamp(path):
+    """Cheap change detector: (relative path, size, mtime) of every data file in the capture."""
+    base = _base(path)
+    out = []
+    for rel in data_files(path):
+        st = os.stat(os.path.join(base, rel))
+        out.append([rel, st.st_size, st.st_mtime_ns])
+    return out
+
+
+class AnalysisCapture:
+    """
+    What a job sees of one capture, whatever the instrument.
+    :attr analog: Dict {channel: (samples, mv_per_unit, t0_s, dt_s)} - samples are memory-mapped.
+    :attr digital: Dict {channel: DigitalTrace}.
+    """
+
+    def __init__(self, path, instrument, analog, digital):
+        self.path = path
+        self.instrument = instrument
+        self.analog = analog
+        self.digital = digital
+
+
+def _open_pico(path, cache_dir, sha256):
+    from pico_driver import CHANNEL_INPUT_RANGES_MV
+    from pico_storage import open_capture
+    if os.path.isdir(path):
+        meta, channels = open_capture(path)
+        if meta.get('mode') == 'rapid_block':
+            raise ValueError("rapid block segments aren't a continuous signal - the batch jobs don't apply")
+        dt = meta['sample_interval_ns'] / 1e9
+        return {ch: (raw, CHANNEL_INPUT_RANGES_MV[meta['channel_ranges'][ch]] / meta['max_adc'], 0.0, dt)
+                for ch, raw in channels.items()}
+
+    # CSV: parsed once into float32 .npy columns, then memory-mapped like everything else
+    folder = os.path.join(cache_dir, "csv", sha256)
+    meta_path = os.path.join(folder, "meta.json")
+    if not os.path.exists(meta_path):
+        _convert_pico_csv(path, folder)
+    with open(meta_path) as f:
+        meta = json.load(f)
+    return {ch: (np.load(os.path.join(folder, f"{ch}.npy"), mmap_mode='r'), 1.0, meta['t0_s'], meta['dt_s'])
+            for ch in meta['channels']}
+
+
+def _convert_pico_csv(path, folder):
+    import pandas as pd
+    with open(path, 'rb') as f:
+        rows = sum(block.count(b"\n") for block in iter(lambda: f.read(HASH_CHUNK), b"")) - 1
+    os.makedirs(folder, exist_ok=True)
+    outputs, t, start = {}, [], 0
+    for chunk in pd.read_csv(path, chunksize=READ_CHUNK):
+        if not outputs:
+            t = chunk['Time_Sec'].to_numpy()[:2]
+            for col in chunk.columns[1:]:
+                ch = col[2:-3] if col.startswith("Ch") and col.endswith("_mV") else col
+                outputs[ch] = (col, np.lib.format.open_memmap(os.path.join(folder, f"{ch}.npy"), mode='w+',
+                                                              dtype=np.float32, shape=(rows,)))
+        for col, out in outputs.values():
+            out[start:start + len(chunk)] = chunk[col].to_numpy(np.float32)
+        start += len(chunk)
+    for _, out in outputs.values():
+        out.flush()
+    meta = {'channels': list(outputs), 't0_s': float(t[0]) if len(t) else 0.0,
+            'dt_s': float(t[1] - t[0]) if len(t) > 1 else 0.0}
+    with open(os.path.join(folder, "meta.json"), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+
+def open_for_analysis(path, cache_dir, sha256):
+    instrument = detect_instrument(path)
+    if instrument == 'pico':
+        return AnalysisCapture(path, instrument, _open_pico(path, cache_dir, sha256), {})
+    if instrument == 'saleae':
+        from saleae_loader import load_capture
+        run = load_capture(path, cache_dir=os.path.join(cache_dir, "saleae", sha256)) # never write into the export folder
+        analog = {ch: (samples, 1000.0, run.analog_t0[ch], run.analog_dt[ch]) for ch, samples in run.analog.items()}
+        return AnalysisCapture(path, instrument, analog, {ch: run.trace(ch) for ch in run.digital})
+    raise ValueError(f"{path} is not a Pico capture / CSV or a Saleae export folder")
+
+
+# --- jobs ---------------------------------------------------------------------------------------
+
+def _selected(channels, wanted):
+    return [ch for ch in channels if wanted is None or str(ch) in [str(w) for w in wanted]]
+
+
+def _per_channel(setting, ch):
+    """A setting given either for every channel (value / list) or per channel ({'A': ...})."""
+    if isinstance(setting, dict):
+        return setting.get(str(ch))
+    return setting
+
+
+def _binned(samples, mv_per_unit, t0, dt, t_start, t_end, points):
+    """Mean-binned (time_s, mV) of a window of one channel, read in chunks."""
+    a = 0 if t_start is None else max(int((t_start - t0) / dt), 0)
+    b = len(samples) if t_end is None else min(int((t_end - t0) / dt) + 1, len(samples))
+    if b - a < 3:
+        return None, None
+    per_bin = max((b - a) // points, 1)
+    n_bins = (b - a) // per_bin
+    b = a + n_bins * per_bin
+    means = np.empty(n_bins)
+    step = max(READ_CHUNK // per_bin, 1) * per_bin
+    for start in range(a, b, step):
+        stop = min(start + step, b)
+        block = np.asarray(samples[start:stop], dtype=np.float64).reshape(-1, per_bin)
+        means[(start - a) // per_bin:(stop - a) // per_bin] = block.mean(axis=1)
+    t = t0 + (a + (np.arange(n_bins) + 0.5) * per_bin) * dt
+    return t, means * mv_per_unit
+
+
+def rc_fit(capture, channels=None, t_start=None, t_end=None, points=FIT_POINTS):
+    """
+    First-order step response fit per analog channel. The integral form of the curve,
+    v(t) = v0 + (v_inf * t - integral of v) / tau, is linear in its parameters, so tau comes from one
+    least-squares solve without an initial guess; v0 / v_inf are then refit against exp(-t / tau).
+    """
+    results = {}
+    for ch in _selected(capture.analog, channels):
+        t, v = _binned(*capture.analog[ch], t_start, t_end, points)
+        if t is None:
+            continue
+        t = t - t[0]
+        integral = np.concatenate([[0.0], np.cumsum((v[1:] + v[:-1]) / 2 * np.diff(t))])
+        coef = np.linalg.lstsq(np.column_stack([np.ones_like(t), t, -integral]), v, rcond=None)[0]
+        if coef[2] <= 0:
+            results[str(ch)] = {'tau_s': None, 'points': len(t)} # not a first-order rise / decay
+            continue
+        tau = 1.0 / coef[2]
+        decay = np.exp(-t / tau)
+        v_inf, delta = np.linalg.lstsq(np.column_stack([np.ones_like(t), decay]), v, rcond=None)[0]
+        residual = v - (v_inf + delta * decay)
+        spread = float(np.sum((v - v.mean()) ** 2))
+        results[str(ch)] = {
+            'tau_s': float(tau),
+            'v0_mv': float(v_inf + delta),
+            'v_inf_mv': float(v_inf),
+            'rmse_mv': float(np.sqrt(np.mean(residual ** 2))),
+            'r2': 1.0 - float(np.sum(residual ** 2)) / spread if spread else None,
+            'points': len(t),
+        }
+    return results
+
+
+def threshold_trace(samples, mv_per_unit, t0, dt, level_mv, hysteresis_mv=0.0):
+    """Schmitt-triggers an analog channel into a DigitalTrace (None if it never leaves the band)."""
+    from pico_analytics import schmitt_states
+    from saleae_digital import DigitalTrace
+    half = hysteresis_mv / 2
+    hi, lo = (level_mv + half) / mv_per_unit, (level_mv - half) / mv_per_unit
+    carry, times, states = None, [], []
+    for start in range(0, len(samples), READ_CHUNK):
+        filled, prev = schmitt_states(samples[start:start + READ_CHUNK], hi, lo, carry)
+        if filled is None:
+            continue
+        change = np.flatnonzero((filled >= 0) & (prev != filled)) # includes the first defined sample
+        times.append(start + change)
+        states.append(filled[change])
+        carry = int(filled[-1])
+    if not times:
+        return None
+    idx, states = np.concatenate(times), np.concatenate(states).astype(np.uint8)
+    return DigitalTrace(np.rint((t0 + idx * dt) * 1e9).astype(np.int64), states,
+                        int(round((t0 + len(samples) * dt) * 1e9)))
+
+
+def _trace_stats(trace):
+    periods = trace.periods()
+    highs = trace.pulse_widths(1)
+    lows = trace.pulse_widths(0)
+    return {
+        'edges': int(trace.edge_count()),
+        'duty_cycle': float(trace.duty_cycle()),
+        'frequency_hz': float(1 / np.median(periods)) if len(periods) else None,
+        'period_jitter_s': float(np.std(periods)) if len(periods) > 1 else None,
+        'min_high_s': float(highs.min()) if len(highs) else None,
+        'max_high_s': float(highs.max()) if len(highs) else None,
+        'min_low_s': float(lows.min()) if len(lows) else None,
+        'max_low_s': float(lows.max()) if len(lows) else None,
+    }
+
+
+def edge_stats(capture, channels=None, level_mv=None, hysteresis_mv=0.0):
+    """Edge timing per digital channel, and per analog channel when level_mv is given."""
+    results = {str(ch): _trace_stats(trace) for ch, trace in capture.digital.items()
+               if ch in _selected(capture.digital, channels)}
+    for ch in _selected(capture.analog, channels):
+        level = _per_channel(level_mv, ch)
+        if level is None:
+            continue
+        trace = threshold_trace(*capture.analog[ch], level, hysteresis_mv)
+        if trace is not None:
+            results[str(ch)] = dict(_trace_stats(trace), level_mv=level)
+    return results
+
+
+def threshold_timing(capture, levels_mv=(), hysteresis_mv=0.0, target_mv=None, percents=(10, 50, 63.2, 90, 99)):
+    """First rising / falling crossing of each level and time-to-X% of target, per analog channel."""
+    results = {}
+    for ch, (samples, mv_per_unit, t0, dt) in capture.analog.items():
+        levels = _per_channel(levels_mv, ch) or []
+        target = _per_channel(target_mv, ch)
+        if not levels and target is None:
+            continue
+        out = {}
+        for level in levels:
+            trace = threshold_trace(samples, mv_per_unit, t0, dt, level, hysteresis_mv)
+            rising = trace.edges(kind='rising') if trace is not None else []
+            falling = trace.edges(kind='falling') if trace is not None else []
+            out[f"crossings_{level:g}mv"] = len(rising) + len(falling)
+            out[f"first_rising_{level:g}mv_s"] = float(rising[0]) if len(rising) else None
+            out[f"first_falling_{level:g}mv_s"] = float(falling[0]) if len(falling) else None
+        if target is not None:
+            pending = {p: target * p / 100 / mv_per_unit for p in percents}
+            for start in range(0, len(samples), READ_CHUNK):
+                chunk = np.asarray(samples[start:start + READ_CHUNK])
+                peak = chunk.max() if len(chunk) else None
+                for p, level in list(pending.items()):
+                    if peak is not None and peak >= level:
+                        out[f"time_to_{p:g}pct_s"] = t0 + (start + int(np.argmax(chunk >= level))) * dt
+                        del pending[p]
+                if not pending:
+                    break
+            for p in pending:
+                out[f"time_to_{p:g}pct_s"] = None
+        results[str(ch)] = out
+    return results
+
+
+JOBS = {
+    'rc_fit': rc_fit,
+    'edge_stats': edge_stats,
+    'threshold_timing': threshold_timing,
+}
+
+
+# --- engine -------------------------------------------------------------------------------------
+
+def job_key(name, settings):
+    """Cache key of one job: its name plus a hash of its settings."""
+    return f"{name}:{hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:12]}"
+
+
+def _result_path(cache_dir, sha256):
+    return os.path.join(cache_dir, "results", sha256[:2], f"{sha256}.json")
+
+
+def _read_results(cache_dir, sha256):
+    path = _result_path(cache_dir, sha256)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_json(path, data):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+
+
+def analyze_capture(path, jobs, cache_dir):
+    """
+    Worker entry point: hashes one capture, runs whichever jobs aren't cached for that content,
+    and returns {'path', 'sha256', 'stamp', 'results', 'computed', 'seconds'}.
+    :param jobs: Dict {job name: settings dict}.
+    """
+    t0 = time.perf_counter()
+    sha256 = content_hash(path)
+    cached = _read_results(cache_dir, sha256)
+    todo = {name: settings for name, settings in jobs.items() if job_key(name, settings) not in cached}
+    if todo:
+        capture = open_for_analysis(path, cache_dir, sha256)
+        for name, settings in todo.items():
+            cached[job_key(name, settings)] = JOBS[name](capture, **settings)
+        _write_json(_result_path(cache_dir, sha256), cached)
+    return {
+        'path': path,
+        'sha256': sha256,
+        'stamp': stamp(path),
+        'results': {name: cached[job_key(name, settings)] for name, settings in jobs.items()},
+        'computed': sorted(todo),
+        'seconds': time.perf_counter() - t0,
+    }
+
+
+def find_captures(paths):
+    """Expands folders that aren't captures themselves into the captures directly inside them."""
+    found = []
+    for path in paths:
+        path = os.path.normpath(path)
+        if detect_instrument(path) is not None:
+            found.append(path)
+        elif os.path.isdir(path):
+            found.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                         if not name.startswith('.') and detect_instrument(os.path.join(path, name)) is not None)
+    return found
+
+
+def _size(path):
+    base = _base(path)
+    return sum(os.path.getsize(os.path.join(base, rel)) for rel in data_files(path))
+
+
+class BatchAnalyzer:
+    """
+    :param jobs: Names from JOBS to run on every capture.
+    :param settings: Dict {job name: keyword arguments for that job}.
+    :param workers: Worker processes (default: one per core).
+    :param cache_dir: Where results and converted CSVs are kept between runs.
+    """
+
+    def __init__(self, jobs=tuple(JOBS), settings=None, workers=None, cache_dir=CACHE_DIRNAME):
+        unknown = [name for name in jobs if name not in JOBS]
+        if unknown:
+            raise ValueError(f"Unknown jobs {unknown} - choose from {list(JOBS)}")
+        settings = settings or {}
+        self.jobs = {name: dict(settings.get(name, {})) for name in jobs}
+        self.workers = workers or os.cpu_count() or 1
+        self.cache_dir = cache_dir
+        self.stamps_path = os.path.join(cache_dir, "stamps.json")
+
+    def _stamps(self):
+        if not os.path.exists(self.stamps_path):
+            return {}
+        with open(self.stamps_path) as f:
+            return json.load(f)
+
+    def _from_cache(self, path, stamps):
+        """Result for an unchanged capture whose jobs are all cached, without hashing it."""
+        known = stamps.get(os.path.abspath(path))
+        if known is None or known['stamp'] != stamp(path):
+            return None
+        cached = _read_results(self.cache_dir, known['sha256'])
+        keys = {name: job_key(name, settings) for name, settings in self.jobs.items()}
+        if not all(key in cached for key in keys.values()):
+            return None
+        return {'path': path, 'sha256': known['sha256'], 'stamp': known['stamp'],
+                'results': {name: cached[key] for name, key in keys.items()}, 'computed': [], 'seconds': 0.0}
+
+    def run(self, paths, progress=True):
+        """
+        Analyzes every capture in paths (see find_captures) on the process pool.
+        :return: Dict {'captures': [per-capture results], 'errors': {path: message}, 'summary': aggregate(),
+                 'wall_s', 'cpu_s', 'computed', 'cached'}.
+        """
+        t0 = time.perf_counter()
+        captures = find_captures(paths)
+        stamps = self._stamps()
+        done, errors, todo = [], {}, []
+        for path in captures:
+            hit = self._from_cache(path, stamps)
+            if hit is not None:
+                done.append(hit)
+            else:
+                todo.append(path)
+        todo.sort(key=_size, reverse=True) # largest first, so one big capture doesn't finish last
+        if progress:
+            print(f"{len(captures)} captures: {len(done)} cached, {len(todo)} to analyze on {self.workers} workers")
+
+        if todo:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(todo))) as pool:
+                futures = {pool.submit(analyze_capture, path, self.jobs, self.cache_dir): path for path in todo}
+                for i, future in enumerate(as_completed(futures), 1):
+                    path = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        errors[path] = f"{type(e).__name__}: {e}"
+                        continue
+                    done.append(result)
+                    stamps[os.path.abspath(path)] = {'stamp': result['stamp'], 'sha256': result['sha256']}
+                    if progress:
+                        print(f"[{i}/{len(todo)}] {path} ({result['seconds']:.2f} s)")
+            _write_json(self.stamps_path, stamps)
+
+        done.sort(key=lambda r: r['path'])
+        for path, message in errors.items():
+            print(f"Failed: {path} - {message}")
+        return {
+            'captures': [{k: v for k, v in r.items() if k != 'stamp'} for r in done],
+            'errors': errors,
+            'summary': aggregate(done),
+            'wall_s': time.perf_counter() - t0,
+            'cpu_s': sum(r['seconds'] for r in done),
+            'computed': sum(1 for r in done if r['computed']),
+            'cached': sum(1 for r in done if not r['computed']),
+        }
+
+    @staticmethod
+    def write_report(results, path):
+        """Writes the full results as JSON and one row per (capture, job, channel) as CSV next to it."""
+        _write_json(path, results)
+        rows = []
+        for capture in results['captures']:
+            for job, channels in capture['results'].items():
+                for ch, metrics in channels.items():
+                    rows.append(dict({'path': capture['path'], 'job': job, 'channel': ch}, **metrics))
+        csv_path = os.path.splitext(path)[0] + ".csv"
+        fields = list(dict.fromkeys(k for row in rows for k in row))
+        with open(csv_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"Report saved to: {path} (+ {os.path.basename(csv_path)})")
+
+
+def aggregate(results):
+    """{job: {channel: {metric: count / mean / std / min / max}}} over every numeric result."""
+    values = {}
+    for r in results:
+        for job, channels in r['results'].items():
+            for ch, metrics in channels.items():
+                for metric, value in metrics.items():
+                    if isinstance(value, (int, float)) and not isinstance(value, bool):
+                        values.setdefault(job, {}).setdefault(ch, {}).setdefault(metric, []).append(value)
+    return {job: {ch: {metric: {'count': len(v), 'mean': float(np.mean(v)), 'std': float(np.std(v)),
+                                'min': float(np.min(v)), 'max': float(np.max(v))}
+                       for metric, v in metrics.items()}
+                  for ch, metrics in channels.items()}
+            for job, channels in values.items()}
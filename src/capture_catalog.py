@@ -0,0 +1,469 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import time
+
+import numpy as np
+
+import instrument_paths  # noqa: F401 - puts the instrument folders on sys.path
+
+"""
+Local catalog of captures: an SQLite index plus a content-addressed blob store.
+
+    with CaptureCatalog("catalog") as catalog:
+        run_id = catalog.add("results/run_01", tags=['supercap'])       # Pico disk / npy capture
+        catalog.add("lab_results/run_1")                                # Saleae export folder
+        catalog.add("results/data.csv", instrument='pico')               # Pico CSV export
+
+        for run in catalog.find(instrument='pico', channel='A', where=['max_mv > 4500']):
+            print(run['id'], run['name'], run['created'])
+        catalog.checkout(run_id, "restored/run_01")
+
+Every file is stored once under blobs/<sha256[:2]>/<sha256>, so re-adding a folder or
+two runs that share files cost no extra space. A run's identity is the hash of its data files
+only (see data_files()): a capture whose data is identical to one already in the catalog is not
+added twice, and plots, exports or metrics written into the folder later are stored with the
+existing run as attachments. Per-channel summaries (min / max / mean /
+RMS in mV, edge counts, duty cycle, frequency) are computed once when a run is added and stored
+in the index, so queries never open the raw data.
+"""
+
+DB_FILENAME = "catalog.sqlite"
+BLOB_DIRNAME = "blobs"
+HASH_CHUNK = 8 * 1024 * 1024
+SUMMARY_CHUNK = 1_000_000
+
+SKIP_DIRS = {'.cache', '__pycache__'} # derived data, rebuilt on load
+SIDECARS = {'metrics.json', 'summary.json', 'analysis.json'} # results kept in the run summary as well
+SALEAE_DATA = ('digital.csv', 'analog.csv')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    name TEXT,
+    instrument TEXT,
+    source TEXT,
+    created TEXT,
+    added TEXT,
+    duration_s REAL,
+    sample_interval_ns REAL,
+    bytes INTEGER,
+    data_sha256 TEXT UNIQUE,
+    tags TEXT,
+    config TEXT,
+    summary TEXT
+);
+CREATE TABLE IF NOT EXISTS files (
+    run_id INTEGER REFERENCES runs(id) ON DELETE CASCADE,
+    path TEXT,
+    sha256 TEXT,
+    bytes INTEGER,
+    data INTEGER, -- 1 = part of the run's identity, 0 = attachment
+    PRIMARY KEY (run_id, path)
+);
+CREATE TABLE IF NOT EXISTS channels (
+    run_id INTEGER REFERENCES runs(id) ON DELETE CASCADE,
+    channel TEXT,
+    kind TEXT,
+    range_mv REAL,
+    samples INTEGER,
+    min_mv REAL,
+    max_mv REAL,
+    mean_mv REAL,
+    rms_mv REAL,
+    edges INTEGER,
+    duty_cycle REAL,
+    frequency_hz REAL,
+    PRIMARY KEY (run_id, channel)
+);
+CREATE TABLE IF NOT EXISTS hashes (
+    path TEXT PRIMARY KEY,
+    bytes INTEGER,
+    mtime_ns INTEGER,
+    sha256 TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_instrument ON runs(instrument, created);
+CREATE INDEX IF NOT EXISTS runs_name ON runs(name);
+CREATE INDEX IF NOT EXISTS files_sha256 ON files(sha256);
+CREATE INDEX IF NOT EXISTS channels_max ON channels(channel, max_mv);
+"""
+
+RUN_COLUMNS = ('duration_s', 'sample_interval_ns', 'bytes')
+CHANNEL_COLUMNS = ('range_mv', 'samples', 'min_mv', 'max_mv', 'mean_mv', 'rms_mv', 'edges', 'duty_cycle', 'frequency_hz')
+_CONDITION = re.compile(r"^\s*(\w+)\s*(<=|>=|!=|=|<|>)\s*(\S+)\s*$")
+
+
+def _now(seconds=None):
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(seconds))
+
+
+def capture_files(path):
+    """Relative paths of the files making up a capture (a folder or a single file)."""
+    if os.path.isfile(path):
+        return [os.path.basename(path)]
+    found = []
+    for folder, dirs, files in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS)
+        for f in sorted(files):
+            found.append(os.path.relpath(os.path.join(folder, f), path).replace(os.sep, '/'))
+    return found
+
+
+def data_files(path, instrument=None):
+    """
+    Relative paths of the files that make up a capture's data, i.e. its identity:
+    Pico folders - capture.json and the channel files it lists; Pico CSVs - the file itself;
+    Saleae exports - digital.csv / analog.csv. Anything else counts every file in the folder.
+    """
+    instrument = instrument or detect_instrument(path)
+    if os.path.isfile(path):
+        return [os.path.basename(path)]
+    if instrument == 'pico':
+        with open(os.path.join(path, "capture.json")) as f:
+            meta = json.load(f)
+        listed = list(meta.get('files', {}).values())
+        if meta.get('trigger_offsets'):
+            listed.append(meta['trigger_offsets'])
+        return sorted(set(listed)) + ["capture.json"]
+    if instrument == 'saleae':
+        return [name for name in SALEAE_DATA if os.path.exists(os.path.join(path, name))]
+    return capture_files(path)
+
+
+def identity_sha256(file_hashes):
+    """Run identity from {relative path: sha256} of its data files."""
+    identity = hashlib.sha256()
+    for rel, sha256 in sorted(file_hashes.items()):
+        identity.update(f"{rel}\0{sha256}\n".encode())
+    return identity.hexdigest()
+
+
+def detect_instrument(path):
+    """'pico' for capture.json folders and Time_Sec CSVs, 'saleae' for digital/analog.csv exports, else None."""
+    if os.path.isdir(path):
+        if os.path.exists(os.path.join(path, "capture.json")):
+            return 'pico'
+        if os.path.exists(os.path.join(path, "digital.csv")) or os.path.exists(os.path.join(path, "analog.csv")):
+            return 'saleae'
+        return None
+    if path.endswith(".csv"):
+        with open(path) as f:
+            if f.readline().startswith("Time_Sec"):
+                return 'pico'
+    return None
+
+
+# --- per-instrument summaries -------------------------------------------------------------------
+
+def _moments(values, scale=1.0):
+    """min / max / mean / rms of a (memory-mapped) array, read in chunks."""
+    values = values.reshape(-1) # rapid block segments are 2-D; a view, nothing is read here
+    n = len(values)
+    if n == 0:
+        return {'samples': 0}
+    lo, hi, total, sumsq = np.inf, -np.inf, 0.0, 0.0
+    for a in range(0, n, SUMMARY_CHUNK):
+        chunk = np.asarray(values[a:a + SUMMARY_CHUNK], dtype=np.float64)
+        lo = min(lo, chunk.min())
+        hi = max(hi, chunk.max())
+        total += chunk.sum()
+        sumsq += np.dot(chunk, chunk)
+    return {'samples': n, 'min_mv': float(lo * scale), 'max_mv': float(hi * scale),
+            'mean_mv': float(total / n * scale), 'rms_mv': float(np.sqrt(sumsq / n) * scale)}
+
+
+def summarize_pico(path):
+    """Run-level and per-channel summary of a Pico capture folder or Time_Sec / ChX_mV CSV."""
+    if os.path.isdir(path):
+        from pico_driver import CHANNEL_INPUT_RANGES_MV
+        from pico_storage import open_capture
+        meta, channels = open_capture(path)
+        interval_ns = meta['sample_interval_ns']
+        run = {'sample_interval_ns': interval_ns, 'duration_s': meta['sample_count'] * interval_ns / 1e9} # per segment in rapid block
+        summary = {}
+        for ch, raw in channels.items():
+            range_mv = CHANNEL_INPUT_RANGES_MV[meta['channel_ranges'][ch]]
+            summary[ch] = dict(_moments(raw, range_mv / meta['max_adc']), kind='analog', range_mv=range_mv)
+        return run, summary, meta
+
+    import pandas as pd
+    columns, times, n = {}, [], 0
+    for chunk in pd.read_csv(path, chunksize=SUMMARY_CHUNK):
+        if n == 0:
+            times = chunk['Time_Sec'].to_numpy()[:2]
+        n += len(chunk)
+        last_t = float(chunk['Time_Sec'].iloc[-1])
+        for col in chunk.columns[1:]:
+            values = chunk[col].to_numpy(np.float64)
+            s = columns.setdefault(col, {'min': np.inf, 'max': -np.inf, 'sum': 0.0, 'sumsq': 0.0})
+            s['min'] = min(s['min'], values.min())
+            s['max'] = max(s['max'], values.max())
+            s['sum'] += values.sum()
+            s['sumsq'] += np.dot(values, values)
+    interval_s = float(times[1] - times[0]) if len(times) > 1 else 0.0
+    run = {'sample_interval_ns': interval_s * 1e9, 'duration_s': last_t - times[0] + interval_s if n else 0.0}
+    summary = {}
+    for col, s in columns.items():
+        ch = col[2:-3] if col.startswith("Ch") and col.endswith("_mV") else col
+        summary[ch] = {'kind': 'analog', 'samples': n, 'min_mv': float(s['min']), 'max_mv': float(s['max']),
+                       'mean_mv': s['sum'] / n, 'rms_mv': float(np.sqrt(s['sumsq'] / n))}
+    return run, summary, {}
+
+
+def summarize_saleae(path):
+    """
+    Run-level and per-channel summary of a Saleae export folder. Uses the loader cache if the
+    folder has a current one, otherwise builds a throwaway cache in a temp folder - indexing
+    never writes into the capture folder.
+    """
+    import tempfile
+    from saleae_loader import cache_is_current, load_capture
+    tmp = None if cache_is_current(path) else tempfile.mkdtemp(prefix="catalog_saleae_")
+    try:
+        return _summarize_saleae(load_capture(path, cache_dir=tmp))
+    finally:
+        if tmp is not None:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _summarize_saleae(capture):
+    summary = {}
+    for ch in capture.digital:
+        trace = capture.trace(ch)
+        periods = trace.periods()
+        summary[str(ch)] = {'kind': 'digital', 'edges': int(trace.edge_count()), 'duty_cycle': float(trace.duty_cycle()),
+                            'frequency_hz': float(1 / np.median(periods)) if len(periods) else None}
+    for ch, samples in capture.analog.items():
+        summary[str(ch)] = dict(_moments(samples, 1000.0), kind='analog') # volts -> mV
+    dts = [dt for dt in capture.analog_dt.values() if dt]
+    run = {'sample_interval_ns': min(dts) * 1e9 if dts else None, 'duration_s': capture.end_ns() / 1e9}
+    return run, summary, capture.meta
+
+
+SUMMARIZERS = {
+    'pico': summarize_pico,
+    'saleae': summarize_saleae,
+}
+
+
+class CaptureCatalog:
+    """
+    :param root: Folder holding catalog.sqlite and blobs/ (created if missing).
+    """
+
+    def __init__(self, root="catalog"):
+        self.root = root
+        self.blob_dir = os.path.join(root, BLOB_DIRNAME)
+        if not os.path.exists(self.blob_dir):
+            os.makedirs(self.blob_dir)
+        self.db = sqlite3.connect(os.path.join(root, DB_FILENAME))
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA foreign_keys = ON")
+        self.db.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.db.close()
+
+    def blob_path(self, sha256):
+        return os.path.join(self.blob_dir, sha256[:2], sha256)
+
+    # --- storing --------------------------------------------------------------------------------
+
+    def _known_hash(self, path, st):
+        row = self.db.execute("SELECT sha256 FROM hashes WHERE path = ? AND bytes = ? AND mtime_ns = ?",
+                              (path, st.st_size, st.st_mtime_ns)).fetchone()
+        return row['sha256'] if row else None
+
+    def _store_file(self, path):
+        """Hashes one file and copies it into the blob store (one pass, skipped for unchanged files already stored)."""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        sha256 = self._known_hash(path, st)
+        if sha256 is not None and os.path.exists(self.blob_path(sha256)):
+            return sha256, st.st_size
+
+        tmp = os.path.join(self.blob_dir, f"incoming.{os.getpid()}")
+        digest = hashlib.sha256()
+        with open(path, 'rb') as src, open(tmp, 'wb') as dst:
+            while True:
+                block = src.read(HASH_CHUNK)
+                if not block:
+                    break
+                digest.update(block)
+                dst.write(block)
+        sha256 = digest.hexdigest()
+        target = self.blob_path(sha256)
+        if os.path.exists(target):
+            os.remove(tmp) # identical content already stored
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(tmp, target)
+        self.db.execute("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?)", (path, st.st_size, st.st_mtime_ns, sha256))
+        return sha256, st.st_size
+
+    def add(self, path, name=None, instrument=None, config=None, tags=()):
+        """
+        Stores a capture (folder or single file) and indexes its summary.
+        :param instrument: 'pico' or 'saleae' (detected from the files if None). Other captures are
+                           stored and searchable by name / tag, without channel summaries.
+        :param config: Dict of settings to keep with the run (e.g. the testbench config section).
+        :return: Run id. If a run with identical data is already in the catalog, its id is returned.
+        """
+        path = os.path.normpath(path)
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        instrument = instrument or detect_instrument(path)
+        base = path if os.path.isdir(path) else os.path.dirname(path)
+
+        files = {rel: self._store_file(os.path.join(base, rel)) for rel in capture_files(path)}
+        data = set(data_files(path, instrument))
+        missing = data - set(files)
+        if missing:
+            raise FileNotFoundError(f"{path} is missing data files: {', '.join(sorted(missing))}")
+        data_sha256 = identity_sha256({rel: files[rel][0] for rel in data})
+
+        existing = self.db.execute("SELECT id FROM runs WHERE data_sha256 = ?", (data_sha256,)).fetchone()
+        if existing is not None:
+            # same data: keep any new or changed plots / exports / metrics with the existing run
+            self.db.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, 0)",
+                                [(existing['id'], rel, sha256, size) for rel, (sha256, size) in files.items()
+                                 if rel not in data])
+            self.db.commit()
+            print(f"{path} is already in the catalog as run {existing['id']}.")
+            return existing['id']
+
+        run, channels, meta = SUMMARIZERS[instrument](path) if instrument in SUMMARIZERS else ({}, {}, {})
+        mtimes = [os.path.getmtime(os.path.join(base, rel)) for rel in files]
+        for sidecar in SIDECARS:
+            if sidecar in files: # e.g. OnlineAnalytics / SaleaeWrapper results, queryable without the blobs
+                with open(os.path.join(base, sidecar)) as f:
+                    meta = dict(meta, **{sidecar[:-5]: json.load(f)})
+
+        cur = self.db.execute(
+            "INSERT INTO runs (name, instrument, source, created, added, duration_s, sample_interval_ns, bytes,"
+            " data_sha256, tags, config, summary) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (name or os.path.basename(path), instrument, os.path.abspath(path), _now(min(mtimes) if mtimes else None),
+             _now(), run.get('duration_s'), run.get('sample_interval_ns'), sum(size for _, size in files.values()),
+             data_sha256, ",".join(tags), json.dumps(config or {}), json.dumps(meta)))
+        run_id = cur.lastrowid
+        self.db.executemany("INSERT INTO files VALUES (?, ?, ?, ?, ?)",
+                            [(run_id, rel, sha256, size, int(rel in data)) for rel, (sha256, size) in files.items()])
+        self.db.executemany("INSERT INTO channels VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            [(run_id, ch, s.get('kind')) + tuple(s.get(col) for col in CHANNEL_COLUMNS)
+                             for ch, s in channels.items()])
+        self.db.commit()
+        print(f"Added {path} to the catalog as run {run_id} ({len(files)} files).")
+        return run_id
+
+    # --- querying -------------------------------------------------------------------------------
+
+    @staticmethod
+    def _condition(text):
+        """'max_mv > 4500' -> (column, op, value), checked against the known columns."""
+        match = _CONDITION.match(text)
+        if match is None or match.group(1) not in RUN_COLUMNS + CHANNEL_COLUMNS:
+            raise ValueError(f"Bad condition {text!r}: expected '<column> <op> <number>' with a column in "
+                             f"{', '.join(RUN_COLUMNS + CHANNEL_COLUMNS)}")
+        return match.group(1), match.group(2), float(match.group(3))
+
+    def find(self, instrument=None, name=None, tag=None, since=None, until=None, channel=None, where=(), limit=None):
+        """
+        Runs matching every given filter, newest first. Only the index is read.
+        :param name: Exact name, or a pattern with * wildcards (e.g. 'step_*').
+        :param since, until: 'YYYY-MM-DD[THH:MM:SS]' bounds on the capture time, both inclusive
+                             (a date on its own covers the whole day).
+        :param channel: Channel the `where` conditions apply to (any channel if None).
+        :param where: Conditions like 'max_mv > 4500' or 'duration_s >= 60'. Channel conditions
+                      must all hold on the same channel.
+        :return: List of run dicts (see get(), without files / channels).
+        """
+        clauses, params, on_channel = [], [], []
+        if instrument:
+            clauses.append("r.instrument = ?")
+            params.append(instrument)
+        if name:
+            clauses.append("r.name GLOB ?" if '*' in name else "r.name = ?")
+            params.append(name)
+        if tag:
+            clauses.append("(',' || r.tags || ',') LIKE ?")
+            params.append(f"%,{tag},%")
+        if since:
+            clauses.append("r.created >= ?")
+            params.append(since)
+        if until:
+            clauses.append("r.created <= ?")
+            params.append(until + "T23:59:59" if len(until) == 10 else until) # a date includes that whole day
+        for text in where:
+            column, op, value = self._condition(text)
+            if column in RUN_COLUMNS:
+                clauses.append(f"r.{column} {op} ?")
+                params.append(value)
+            else:
+                on_channel.append((f"c.{column} {op} ?", value))
+        if channel is not None or on_channel:
+            sub = ["c.run_id = r.id"] + [c for c, _ in on_channel]
+            sub_params = [value for _, value in on_channel]
+            if channel is not None:
+                sub.insert(1, "c.channel = ?")
+                sub_params.insert(0, str(channel))
+            clauses.append(f"EXISTS (SELECT 1 FROM channels c WHERE {' AND '.join(sub)})")
+            params.extend(sub_params)
+
+        sql = "SELECT r.* FROM runs r"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY r.created DESC, r.id DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return [self._run(row) for row in self.db.execute(sql, params)]
+
+    @staticmethod
+    def _run(row):
+        run = dict(row)
+        run['tags'] = [t for t in run['tags'].split(",") if t]
+        run['config'] = json.loads(run['config'])
+        run['summary'] = json.loads(run['summary'])
+        return run
+
+    def get(self, run_id):
+        """One run with its files and per-channel summaries."""
+        row = self.db.execute("SELECT * FROM runs WHERE id = ?", (run_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"No run {run_id} in the catalog")
+        run = self._run(row)
+        run['files'] = [dict(r, data=bool(r['data']))
+                        for r in self.db.execute("SELECT path, sha256, bytes, data FROM files WHERE run_id = ?", (run_id,))]
+        run['channels'] = {r['channel']: {k: r[k] for k in r.keys() if k not in ('run_id', 'channel') and r[k] is not None}
+                           for r in self.db.execute("SELECT * FROM channels WHERE run_id = ?", (run_id,))}
+        return run
+
+    # --- restoring / removing -------------------------------------------------------------------
+
+    def checkout(self, run_id, dest):
+        """Copies a run's files out of the blob store into dest. Returns dest."""
+        for f in self.get(run_id)['files']:
+            target = os.path.join(dest, *f['path'].split('/'))
+            os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+            shutil.copyfile(self.blob_path(f['sha256']), target)
+        print(f"Run {run_id} restored to: {dest}")
+        return dest
+
+    def remove(self, run_id):
+        """Drops a run from the index and deletes blobs no other run uses."""
+        shas = [r['sha256'] for r in self.db.execute("SELECT sha256 FROM files WHERE run_id = ?", (run_id,))]
+        self.db.execute("DELETE FROM runs WHERE id = ?", (run_id,))
+        for sha256 in set(shas):
+            if self.db.execute("SELECT 1 FROM files WHERE sha256 = ? LIMIT 1", (sha256,)).fetchone() is None:
+                self.db.execute("DELETE FROM hashes WHERE sha256 = ?", (sha256,))
+                if os.path.exists(self.blob_path(sha256)):
+                    os.remove(self.blob_path(sha256))
+        self.db.commit()
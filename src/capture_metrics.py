@@ -0,0 +1,206 @@
+import bisect
+import json
+import os
+import threading
+import time
+
+"""
+Low-overhead, in-process metrics for capture sessions (shared by PicoStreamer and SaleaeWrapper).
+
+    metrics.observe('callback_seconds', dt)          # histogram (latency, chunk size, ...)
+    metrics.count('poll_idle_waits')                 # counter
+    metrics.gauge('dropped_samples', n)              # last value
+    metrics.event('overflow', channel='A')           # timestamped event (+ an _events_total counter)
+    with metrics.timer('export_seconds', format='csv'):
+        ...
+
+Histograms use fixed buckets (a bisect per observation, no allocation), and can be sampled
+(sample_every=N keeps every Nth observation per histogram) for the hottest paths. Counters,
+gauges and events are always exact. save() writes metrics.json or Prometheus text format
+(metrics.prom) next to the results so runs can be compared.
+"""
+
+# 1 us .. 10 s, 1-2.5-5 steps
+TIME_BUCKETS = [float(f"{m}e{e}") for e in range(-6, 1) for m in (1, 2.5, 5)] + [10.0]
+# 1 .. 2**32
+SIZE_BUCKETS = [float(2 ** k) for k in range(0, 33, 2)]
+
+MAX_EVENTS = 10_000
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.bounds = buckets
+        self.counts = [0] * (len(buckets) + 1) # last slot is +Inf
+        self.sum = 0.0
+        self.n = 0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.n += 1
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Upper bucket bound holding the q-quantile (bucket resolution)."""
+        if not self.n:
+            return None
+        target = q * self.n
+        running = 0
+        for bound, count in zip(self.bounds + [self.max], self.counts):
+            running += count
+            if running >= target:
+                return min(bound, self.max) # pyright: ignore[reportArgumentType]
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.n, 'sum': self.sum, 'min': self.min, 'max': self.max,
+            'mean': self.sum / self.n if self.n else None,
+            'p50': self.quantile(0.5), 'p99': self.quantile(0.99),
+            'buckets': {str(b): c for b, c in zip(self.bounds + ['+Inf'], self.counts) if c},
+        }
+
+
+class Metrics:
+    """
+    :param namespace: Prefix for exported metric names (e.g. 'pico', 'saleae').
+    :param sample_every: Keep every Nth histogram observation (1 = all).
+    """
+
+    def __init__(self, namespace='capture', sample_every=1):
+        self.namespace = namespace
+        self.sample_every = max(int(sample_every), 1)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.histograms = {}
+            self.counters = {}
+            self.gauges = {}
+            self.events = []
+            self._ticks = {}
+            self.started = time.time()
+            self._t0 = time.perf_counter()
+
+    @staticmethod
+    def _key(name, labels):
+        return (name, tuple(sorted(labels.items()))) if labels else (name, ())
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            if self.sample_every > 1:
+                tick = self._ticks.get(key, 0)
+                self._ticks[key] = tick + 1
+                if tick % self.sample_every:
+                    return
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = Histogram(TIME_BUCKETS if name.endswith('_seconds') else SIZE_BUCKETS)
+            hist.observe(value)
+
+    def count(self, name, n=1, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def gauge(self, name, value, **labels):
+        with self.lock:
+            self.gauges[self._key(name, labels)] = value
+
+    def event(self, name, **fields):
+        self.count(f"{name}_events_total")
+        with self.lock:
+            if len(self.events) < MAX_EVENTS:
+                self.events.append(dict(fields, name=name, t=time.perf_counter() - self._t0))
+
+    def timer(self, name, **labels):
+        return _Timer(self, name, labels)
+
+    def to_dict(self):
+        def flat(key):
+            name, labels = key
+            return name + ("{" + ",".join(f"{k}={v}" for k, v in labels) + "}" if labels else "")
+
+        with self.lock:
+            return {
+                'namespace': self.namespace,
+                'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+                'sample_every': self.sample_every,
+                'histograms': {flat(k): h.to_dict() for k, h in self.histograms.items()},
+                'counters': {flat(k): v for k, v in self.counters.items()},
+                'gauges': {flat(k): v for k, v in self.gauges.items()},
+                'events': list(self.events),
+            }
+
+    def to_prometheus(self):
+        """Prometheus text exposition format."""
+        def labels(pairs, extra=()):
+            pairs = list(pairs) + list(extra)
+            return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}" if pairs else ""
+
+        lines = []
+        typed = set()
+
+        def declare(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        with self.lock:
+            for (name, lbl), hist in sorted(self.histograms.items()):
+                full = f"{self.namespace}_{name}"
+                declare(full, 'histogram')
+                running = 0
+                for bound, count in zip(hist.bounds + ['+Inf'], hist.counts):
+                    running += count
+                    lines.append(f"{full}_bucket{labels(lbl, [('le', bound)])} {running}")
+                lines.append(f"{full}_sum{labels(lbl)} {hist.sum}")
+                lines.append(f"{full}_count{labels(lbl)} {hist.n}")
+            for (name, lbl), value in sorted(self.counters.items()):
+                full = f"{self.namespace}_{name}"
+                declare(full, 'counter')
+                lines.append(f"{full}{labels(lbl)} {value}")
+            for (name, lbl), value in sorted(self.gauges.items()):
+                full = f"{self.namespace}_{name}"
+                declare(full, 'gauge')
+                lines.append(f"{full}{labels(lbl)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def save(self, directory, fmt='json'):
+        """Writes metrics.json ('json') or metrics.prom ('prom') into directory. Returns the path."""
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        if fmt == 'json':
+            path = os.path.join(directory, "metrics.json")
+            with open(path, 'w') as f:
+                json.dump(self.to_dict(), f, indent=2)
+        elif fmt == 'prom':
+            path = os.path.join(directory, "metrics.prom")
+            with open(path, 'w') as f:
+                f.write(self.to_prometheus())
+        else:
+            raise ValueError("fmt must be 'json' or 'prom'")
+        return path
+
+
+class _Timer:
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.seconds = time.perf_counter() - self.t0
+        self.metrics.observe(self.name, self.seconds, **self.labels)
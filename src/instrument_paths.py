@@ -0,0 +1,19 @@
+import os
+import sys
+
+"""
+Puts the instrument folders on sys.path for the shared modules in src/.
+
+The PicoScope and Saleae modules live in their own folders (each with its own setup.sh / venv)
+and import each other by bare name, so align.py, capture_catalog.py, batch_analysis.py and
+testbench.py import this module before any instrument module:
+
+    import instrument_paths  # noqa: F401
+"""
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+FOLDERS = ('picoscope', 'logic_analyzer')
+
+for _folder in FOLDERS:
+    if os.path.join(SRC_DIR, _folder) not in sys.path:
+        sys.path.insert(0, os.path.join(SRC_DIR, _folder))
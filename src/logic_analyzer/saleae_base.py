@@ -1,14 +1,20 @@
 import os
+import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from saleae import automation
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # src/, modules shared by both instruments
+from capture_metrics import Metrics
+
 class SaleaeWrapper:
     """
     A simplified wrapper for the Saleae Logic 2 Automation API.
     Designed for a quick-start to capturing data.
     """
     
-    def __init__(self, port=10430): # uh I think this is constant
+    def __init__(self, port=10430, export_workers=2, max_pending_exports=4, metrics=None): # uh I think this is constant
         self.port = port
         self.manager = None
         self.device_id = None
@@ -17,6 +23,16 @@ class SaleaeWrapper:
         # State tracking
         self.enabled_digital = []
         self.enabled_analog = []
+
+        # Background exports for submit_capture() / capture_batch()
+        self.export_workers = export_workers
+        self.max_pending_exports = max_pending_exports
+        self.export_pool = None
+        self.export_slots = None
+
+        # capture / export timings, written next to the results by save_metrics() / close()
+        self.metrics = metrics or Metrics('saleae')
+        self.metrics_dirs = set()
         
     def __enter__(self):
         """Allows usage in 'with' statements."""
@@ -89,45 +105,155 @@ class SaleaeWrapper:
         # Ensure output directory exists
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
-
-        capture_config = automation.CaptureConfiguration(
-            capture_mode=automation.TimedCaptureMode(duration_seconds=duration_seconds)
-        )
+        if self.export_pool is None: # a batch still exporting keeps its metrics until wait_for_exports()
+            self.metrics.reset()
 
         print(f"Starting {duration_seconds}s capture...")
         
         # Start the capture
         if self.device_id is not None:
             try: 
-                with self.manager.start_capture( # pyright: ignore[reportOptionalMemberAccess]
-                    device_id=self.device_id,
-                    device_configuration=self.device_config,
-                    capture_configuration=capture_config
-                ) as capture:
-                    
-                    # Block until capture is done
-                    capture.wait()
-                    print("Capture complete. processing...")
-                    
-                    # Export to CSV
-                    export_path = os.path.join(output_dir, file_basename)
-                    
-                    # Note: Saleae exports separate files for analog/digital in the folder
-                    capture.export_raw_data_csv(
-                        directory=export_path,
-                        digital_channels=self.enabled_digital,
-                        analog_channels=self.enabled_analog
-                    )
-                    if save_sal is True:
-                        capture.export_to_sal
-                    print(f"Data saved to: {export_path}")
-                    return export_path
-            except ValueError:
-                pass
+                capture = self._run_capture(duration_seconds)
+                print("Capture complete. processing...")
+
+                # Export to CSV
+                export_path = os.path.join(output_dir, file_basename)
+                self._export(capture, export_path, file_basename, save_sal,
+                             list(self.enabled_digital), list(self.enabled_analog))
+            except Exception as e:
+                # the metrics file must not read like a successful run
+                self.metrics.event('capture_failed', run=file_basename, error=f"{type(e).__name__}: {e}")
+                self.save_metrics(output_dir)
+                raise
+            print(f"Data saved to: {export_path}")
+            self.save_metrics(output_dir)
+            return export_path
+
+    def _run_capture(self, duration_seconds):
+        """Starts a timed capture with the current device_config and blocks until it is done."""
+        capture_config = automation.CaptureConfiguration(
+            capture_mode=automation.TimedCaptureMode(duration_seconds=duration_seconds)
+        )
+        capture = self.manager.start_capture( # pyright: ignore[reportOptionalMemberAccess]
+            device_id=self.device_id,
+            device_configuration=self.device_config,
+            capture_configuration=capture_config
+        )
+        try:
+            with self.metrics.timer('capture_wait_seconds'):
+                capture.wait()
+        except BaseException:
+            capture.close()
+            raise
+        self.metrics.count('captures')
+        return capture
+
+    def _export(self, capture, export_path, file_basename, save_sal, digital, analog, convert=False):
+        """Exports one finished capture to CSV (and optionally .sal / binary cache), then closes it."""
+        try:
+            # Note: Saleae exports separate files for analog/digital in the folder
+            with self.metrics.timer('export_csv_seconds'):
+                capture.export_raw_data_csv(
+                    directory=export_path,
+                    digital_channels=digital,
+                    analog_channels=analog
+                )
+            if save_sal is True:
+                with self.metrics.timer('export_sal_seconds'):
+                    capture.save_capture(filepath=os.path.join(export_path, f"{file_basename}.sal"))
+        finally:
+            capture.close() # frees the capture's memory in Logic 2
+        if convert:
+            from saleae_loader import build_cache
+            with self.metrics.timer('convert_seconds'):
+                build_cache(export_path)
+        self.metrics.count('exports')
+        return export_path
+
+    def submit_capture(self, duration_seconds, output_dir, file_basename="capture", save_sal=False, convert=False):
+        """
+        Runs one capture, then hands its export to a background thread and returns right away,
+        so the next capture can be armed while this one is still being written to disk.
+        :param convert: Also build the saleae_loader binary cache in the background.
+        :return: concurrent.futures.Future resolving to the export path.
+        """
+        if not self.device_config:
+            raise RuntimeError("Run setup_channels() before capturing.")
+        if self.export_pool is None: # first capture of a batch: its metrics start here
+            self.metrics.reset()
+            self.export_pool = ThreadPoolExecutor(max_workers=self.export_workers, thread_name_prefix="saleae-export")
+            self.export_slots = threading.BoundedSemaphore(self.max_pending_exports)
+
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+
+        digital, analog = list(self.enabled_digital), list(self.enabled_analog)
+        self.metrics_dirs.add(output_dir)
+
+        # finished-but-not-exported captures live in Logic 2's memory, so limit how many can pile up
+        if not self.export_slots.acquire(blocking=False): # pyright: ignore[reportOptionalMemberAccess]
+            self.metrics.count('export_backpressure_waits')
+            with self.metrics.timer('export_backpressure_seconds'):
+                self.export_slots.acquire() # pyright: ignore[reportOptionalMemberAccess]
+        try:
+            print(f"Starting {duration_seconds}s capture ({file_basename})...")
+            capture = self._run_capture(duration_seconds)
+        except BaseException as e:
+            self.export_slots.release() # pyright: ignore[reportOptionalMemberAccess]
+            self.metrics.event('capture_failed', run=file_basename, error=f"{type(e).__name__}: {e}")
+            raise
+
+        def job():
+            try:
+                path = self._export(capture, os.path.join(output_dir, file_basename), file_basename, save_sal,
+                                    digital, analog, convert)
+                print(f"Data saved to: {path}")
+                return path
+            except Exception as e:
+                self.metrics.event('export_failed', run=file_basename, error=f"{type(e).__name__}: {e}")
+                raise
+            finally:
+                self.export_slots.release() # pyright: ignore[reportOptionalMemberAccess]
+
+        return self.export_pool.submit(job)
+
+    def capture_batch(self, runs, duration_seconds, output_dir, save_sal=False, convert=False, before_each=None):
+        """
+        Runs a sequence of captures on the same connection and device configuration.
+        Exports run in the background (see submit_capture) while the next capture records.
+        :param runs: Names for the runs, e.g. ["run_1", "run_2"] - one export folder each.
+        :param before_each: Optional function called with the run name before each capture
+                            (e.g. to send the command that triggers your device).
+        :return: Dict {run name: Future resolving to the export path}.
+        """
+        futures = {}
+        for name in runs:
+            if before_each is not None:
+                before_each(name)
+            futures[name] = self.submit_capture(duration_seconds, output_dir, name, save_sal, convert)
+        return futures
+
+    def wait_for_exports(self):
+        """
+        Blocks until every submitted export has finished, then saves metrics.json to each output folder.
+        The next submit_capture() starts a new batch with fresh metrics.
+        """
+        if self.export_pool is not None:
+            self.export_pool.shutdown(wait=True)
+            self.export_pool = None
+        for directory in sorted(self.metrics_dirs):
+            self.save_metrics(directory)
+        self.metrics_dirs.clear()
 
+    def save_metrics(self, directory, fmt='json'):
+        """Writes the capture / export metrics as metrics.json ('json') or metrics.prom ('prom')."""
+        path = self.metrics.save(directory, fmt)
+        print(f"Metrics saved to: {path}")
+        return path
 
     def close(self):
         """Closes the connection to the manager."""
+        self.wait_for_exports()
         if self.manager:
             self.manager.close()
             print("Saleae connection closed.")
\ No newline at end of file
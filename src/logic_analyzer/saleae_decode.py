@@ -0,0 +1,292 @@
+import numpy as np
+
+from saleae_digital import DigitalTrace
+
+"""
+UART / SPI / I2C decoders that run on DigitalTrace transition arrays.
+
+Nothing here iterates over samples. Bit sample points are computed as arrays of timestamps and
+looked up in the transition index with np.searchsorted (DigitalTrace.state_at_ns), and bits are
+packed into words with array arithmetic. The only Python loop is UART's frame-start chain
+(one step per frame, over precomputed integer indices).
+
+Each decoder returns a structured numpy array, one row per frame/word, with timestamps in
+seconds and error flags:
+
+    run = load_capture("lab_results/run_1")
+    frames = decode_uart(run.trace(3), baud=115_200)
+    text = uart_bytes(frames).decode(errors='replace')
+    bad = frames[frames['framing_error'] | frames['parity_error']]
+
+encode_uart / encode_spi / encode_i2c build synthetic traces, which is handy for checking a
+decoder setup (baud, mode, bit order) before pointing it at a real capture.
+"""
+
+UART_FRAME = np.dtype([
+    ('start_s', 'f8'), ('end_s', 'f8'), ('value', 'u2'),
+    ('parity_error', '?'), ('framing_error', '?'), ('break', '?'),
+])
+
+SPI_WORD = np.dtype([
+    ('start_s', 'f8'), ('end_s', 'f8'), ('mosi', 'u4'), ('miso', 'u4'),
+    ('bits', 'u1'), ('incomplete', '?'),
+])
+
+I2C_BYTE = np.dtype([
+    ('start_s', 'f8'), ('end_s', 'f8'), ('value', 'u1'), ('ack', '?'),
+    ('address_byte', '?'), ('incomplete', '?'),
+])
+
+
+def _edge_times(trace, state):
+    """ns times of the edges into `state` (the initial-state entry is not an edge)."""
+    return np.asarray(trace.times_ns[1:])[np.asarray(trace.states[1:]) == state]
+
+
+def _group(keys_change):
+    """Group index per element given a boolean 'starts a new group' array."""
+    return np.cumsum(keys_change) - 1
+
+
+def _positions(segment):
+    """Position of each element inside its run of equal (sorted) segment ids."""
+    n = len(segment)
+    starts = np.flatnonzero(np.r_[True, segment[1:] != segment[:-1]]) if n else np.zeros(0, np.int64)
+    lengths = np.diff(np.r_[starts, n])
+    return np.arange(n) - np.repeat(starts, lengths)
+
+
+def _pack(bits, bit_index, word, n_words, width, msb_first):
+    """Sums bit * weight per word, where bits/bit_index/word are flat per-bit arrays."""
+    shift = (width - 1 - bit_index) if msb_first else bit_index
+    return np.bincount(word, weights=bits.astype(np.float64) * np.exp2(shift), minlength=n_words).astype(np.uint64)
+
+
+def decode_uart(trace, baud, data_bits=8, parity=None, stop_bits=1, lsb_first=True, inverted=False):
+    """
+    Decodes asynchronous serial frames.
+    :param trace: DigitalTrace of the TX (or RX) line.
+    :param parity: None, 'even' or 'odd'.
+    :param inverted: True for an idle-low line (e.g. RS-232 levels after a non-inverting buffer).
+    :return: UART_FRAME array.
+    """
+    if parity not in (None, 'even', 'odd'):
+        raise ValueError("parity must be None, 'even' or 'odd'")
+    bit_ns = 1e9 / baud
+    idle = 0 if inverted else 1
+    n_par = 0 if parity is None else 1
+    frame_bits = 1 + data_bits + n_par + stop_bits
+
+    # every edge out of idle is a candidate start bit; a real one is still active mid-bit
+    cand = _edge_times(trace, 1 - idle)
+    cand = cand[cand + int(round(frame_bits * bit_ns)) <= trace.end_ns]
+    valid = trace.state_at_ns(np.rint(cand + 0.5 * bit_ns).astype(np.int64)) == 1 - idle
+
+    # after a frame, the next start bit can't begin before the middle of its last stop bit
+    after = np.searchsorted(cand, cand + (frame_bits - 0.5) * bit_ns, side='left')
+    starts = []
+    i, n = 0, len(cand)
+    valid_l, after_l = valid.tolist(), after.tolist()
+    while i < n:
+        if valid_l[i]:
+            starts.append(i)
+            i = after_l[i]
+        else:
+            i += 1
+    t0 = cand[np.array(starts, dtype=np.int64)]
+
+    # sample every bit after the start bit at its centre, all frames at once
+    offsets = (np.arange(1, frame_bits) + 0.5) * bit_ns
+    levels = trace.state_at_ns(np.rint(t0[:, None] + offsets[None, :]).astype(np.int64))
+    if inverted:
+        levels = 1 - levels
+    data = levels[:, :data_bits]
+    stops = levels[:, data_bits + n_par:]
+
+    shift = np.arange(data_bits) if lsb_first else np.arange(data_bits)[::-1]
+    out = np.zeros(len(t0), dtype=UART_FRAME)
+    out['start_s'] = t0 / 1e9
+    out['end_s'] = (t0 + frame_bits * bit_ns) / 1e9
+    out['value'] = (data.astype(np.uint32) << shift).sum(axis=1)
+    if parity is not None:
+        ones = data.sum(axis=1) + levels[:, data_bits]
+        out['parity_error'] = (ones % 2 != 0) if parity == 'even' else (ones % 2 == 0)
+    out['framing_error'] = (stops != 1).any(axis=1)
+    out['break'] = (levels == 0).all(axis=1)
+    return out
+
+
+def uart_bytes(frames):
+    """Payload of the error-free frames as bytes."""
+    ok = ~(frames['parity_error'] | frames['framing_error'] | frames['break'])
+    return frames['value'][ok].astype(np.uint8).tobytes()
+
+
+def decode_spi(clk, mosi=None, miso=None, cs=None, cpol=0, cpha=0, bits_per_word=8, msb_first=True,
+               cs_active_low=True):
+    """
+    Decodes SPI words. Words restart at every chip-select assertion; a word cut short by CS is
+    returned with incomplete=True.
+    :param clk, mosi, miso, cs: DigitalTraces (mosi / miso / cs are optional).
+    :param cpol, cpha: SPI mode (mode = 2 * cpol + cpha).
+    :return: SPI_WORD array.
+    """
+    # mode 0/3 sample on the rising edge, mode 1/2 on the falling edge
+    sample = _edge_times(clk, 1 if cpol == cpha else 0)
+
+    segment = np.zeros(len(sample), dtype=np.int64)
+    if cs is not None:
+        active = 0 if cs_active_low else 1
+        sample = sample[cs.state_at_ns(sample) == active]
+        segment = np.searchsorted(_edge_times(cs, active), sample, side='right')
+
+    pos = _positions(segment)
+    bit_index = pos % bits_per_word
+    word = _group(np.r_[True, (segment[1:] != segment[:-1]) | (pos[1:] // bits_per_word != pos[:-1] // bits_per_word)]) \
+        if len(sample) else np.zeros(0, np.int64)
+    n_words = int(word[-1]) + 1 if len(word) else 0
+    counts = np.bincount(word, minlength=n_words)
+
+    out = np.zeros(n_words, dtype=SPI_WORD)
+    first = np.flatnonzero(bit_index == 0) if n_words else np.zeros(0, np.int64)
+    out['start_s'] = sample[first] / 1e9
+    out['end_s'] = sample[np.r_[first[1:], len(sample)] - 1] / 1e9 if n_words else 0
+    out['bits'] = counts
+    out['incomplete'] = counts != bits_per_word
+    for name, trace in (('mosi', mosi), ('miso', miso)):
+        if trace is not None:
+            out[name] = _pack(trace.state_at_ns(sample), bit_index, word, n_words, bits_per_word, msb_first)
+    return out
+
+
+def decode_i2c(scl, sda):
+    """
+    Decodes I2C bytes. Each byte is 8 data bits (MSB first) plus the ACK bit; the first byte
+    after a START or repeated START is flagged as the address byte (address = value >> 1,
+    read = value & 1).
+    :return: I2C_BYTE array.
+    """
+    # START: SDA falls while SCL is high, STOP: SDA rises while SCL is high
+    sda_t = np.asarray(sda.times_ns[1:])
+    sda_s = np.asarray(sda.states[1:])
+    cond = scl.state_at_ns(sda_t) == 1
+    cond_t, cond_start = sda_t[cond], sda_s[cond] == 0
+
+    rising = _edge_times(scl, 1)
+    falling = _edge_times(scl, 0)
+
+    # a clock pulse that contains a START / STOP is not a data bit (e.g. the pulse before a STOP)
+    nxt_c = np.searchsorted(cond_t, rising, side='right')
+    nxt_f = np.searchsorted(falling, rising, side='right')
+    c_time = np.where(nxt_c < len(cond_t), cond_t[np.minimum(nxt_c, len(cond_t) - 1)], np.iinfo(np.int64).max) \
+        if len(cond_t) else np.full(len(rising), np.iinfo(np.int64).max)
+    f_time = np.where(nxt_f < len(falling), falling[np.minimum(nxt_f, len(falling) - 1)], np.iinfo(np.int64).max) \
+        if len(falling) else np.full(len(rising), np.iinfo(np.int64).max)
+
+    # each bit belongs to the most recent condition, which must be a START
+    last = nxt_c - 1
+    keep = (c_time > f_time) & (last >= 0)
+    keep[keep] &= cond_start[last[keep]]
+    sample, segment = rising[keep], last[keep]
+
+    pos = _positions(segment)
+    bit_index = pos % 9
+    byte_no = pos // 9
+    word = _group(np.r_[True, (segment[1:] != segment[:-1]) | (byte_no[1:] != byte_no[:-1])]) \
+        if len(sample) else np.zeros(0, np.int64)
+    n_words = int(word[-1]) + 1 if len(word) else 0
+    counts = np.bincount(word, minlength=n_words)
+    bits = sda.state_at_ns(sample)
+
+    data = bit_index < 8
+    out = np.zeros(n_words, dtype=I2C_BYTE)
+    first = np.flatnonzero(bit_index == 0) if n_words else np.zeros(0, np.int64)
+    out['start_s'] = sample[first] / 1e9
+    out['end_s'] = sample[np.r_[first[1:], len(sample)] - 1] / 1e9 if n_words else 0
+    out['value'] = _pack(bits[data], bit_index[data], word[data], n_words, 8, True)
+    ack_bit = bit_index == 8
+    out['ack'][word[ack_bit]] = bits[ack_bit] == 0
+    out['address_byte'] = byte_no[first] == 0
+    out['incomplete'] = counts != 9
+    return out
+
+
+def _levels_to_trace(times_ns, levels, end_ns):
+    """DigitalTrace from a level per time step, keeping only the steps where the level changes."""
+    times_ns = np.asarray(times_ns, dtype=np.int64)
+    levels = np.asarray(levels, dtype=np.uint8)
+    keep = np.r_[True, levels[1:] != levels[:-1]]
+    return DigitalTrace(times_ns[keep], levels[keep], end_ns)
+
+
+def encode_uart(data, baud, data_bits=8, parity=None, stop_bits=1, idle_bits=2, lsb_first=True):
+    """Synthetic TX line for `data` (bytes or ints), idle high, idle_bits of idle between frames."""
+    levels = [1] * idle_bits
+    for value in data:
+        bits = [(value >> k) & 1 for k in range(data_bits)]
+        if not lsb_first:
+            bits.reverse()
+        levels += [0] + bits
+        if parity is not None:
+            levels.append((sum(bits) + (parity == 'odd')) % 2)
+        levels += [1] * (stop_bits + idle_bits)
+    bit_ns = 1e9 / baud
+    times = np.rint(np.arange(len(levels)) * bit_ns)
+    return _levels_to_trace(times, levels, int(round(len(levels) * bit_ns)))
+
+
+def encode_spi(mosi_words, miso_words=None, clock_hz=1e6, bits_per_word=8, cpol=0, cpha=0, msb_first=True):
+    """Synthetic (clk, mosi, miso, cs) traces for one CS-framed transfer."""
+    miso_words = miso_words if miso_words is not None else [0] * len(mosi_words)
+    order = range(bits_per_word - 1, -1, -1) if msb_first else range(bits_per_word)
+    mosi_bits = [(w >> k) & 1 for w in mosi_words for k in order]
+    miso_bits = [(w >> k) & 1 for w in miso_words for k in order]
+
+    # two half-periods per bit, plus one idle half-period before and after
+    clk, mosi, miso, cs = [cpol], [0], [0], [1]
+    for a, b in zip(mosi_bits, miso_bits):
+        first, second = (cpol, 1 - cpol) if cpha == 0 else (1 - cpol, cpol)
+        clk += [first, second]
+        mosi += [a, a]
+        miso += [b, b]
+        cs += [0, 0]
+    clk.append(cpol)
+    mosi.append(0)
+    miso.append(0)
+    cs.append(1)
+
+    half_ns = 1e9 / clock_hz / 2
+    times = np.rint(np.arange(len(clk)) * half_ns)
+    end = int(round(len(clk) * half_ns))
+    return tuple(_levels_to_trace(times, lv, end) for lv in (clk, mosi, miso, cs))
+
+
+def encode_i2c(transactions, clock_hz=100e3):
+    """
+    Synthetic (scl, sda) traces. Every byte is ACKed.
+    :param transactions: List of (address, read, data bytes); each starts with a START and
+                         ends with a STOP.
+    """
+    scl, sda = [1], [1]
+
+    def step(c, d):
+        scl.append(c)
+        sda.append(d)
+
+    for address, read, payload in transactions:
+        step(1, 0) # START
+        step(0, 0)
+        for value in [(address << 1) | int(bool(read))] + list(payload):
+            for bit in [(value >> k) & 1 for k in range(7, -1, -1)] + [0]: # 8 data bits + ACK
+                step(0, bit)
+                step(1, bit)
+                step(1, bit)
+                step(0, bit)
+        step(0, 0) # STOP
+        step(1, 0)
+        step(1, 1)
+
+    quarter_ns = 1e9 / clock_hz / 4
+    times = np.rint(np.arange(len(scl)) * quarter_ns)
+    end = int(round(len(scl) * quarter_ns))
+    return _levels_to_trace(times, scl, end), _levels_to_trace(times, sda, end)
@@ -0,0 +1,148 @@
+import numpy as np
+
+"""
+Transition-encoded digital channels.
+
+A DigitalTrace stores only the times at which a channel changes state, so a mostly idle GPIO or
+UART line captured at 500 MS/s costs a few bytes per edge instead of one byte per sample. Every
+query is a binary search (np.searchsorted) over the transition times, so its cost depends on the
+number of transitions involved, never on the sample rate:
+
+    trace = run.trace(0)                          # from saleae_loader.load_capture()
+    trace.state_at(1.25)                          # level at t = 1.25 s
+    rising = trace.edges(0.0, 0.1, 'rising')      # edge times (s) in a window
+    counts, bins = trace.pulse_width_histogram(bins=50)
+    trace.duty_cycle(0.0, 5.0)
+
+Times passed in and returned are seconds; storage is int64 nanoseconds.
+"""
+
+
+class DigitalTrace:
+    """
+    One digital channel as (transition time, state after the transition) pairs.
+    :param times_ns: int64 transition timestamps, ascending. The first entry is the initial
+                     state at the start of the capture, not an edge.
+    :param states: uint8 state (0/1) from each timestamp until the next one.
+    :param end_ns: End of the capture (defaults to the last transition).
+    """
+
+    def __init__(self, times_ns, states, end_ns=None):
+        if len(times_ns) != len(states):
+            raise ValueError("times_ns and states must have the same length")
+        if len(times_ns) == 0:
+            raise ValueError("A trace needs at least its initial state")
+        self.times_ns = times_ns
+        self.states = states
+        self.start_ns = int(times_ns[0])
+        self.end_ns = int(times_ns[-1]) if end_ns is None else int(end_ns)
+        self._high_ns = None
+
+    @classmethod
+    def from_samples(cls, samples, sample_rate, start_s=0.0):
+        """Encodes a dense 0/1 sample array (e.g. a thresholded analog channel)."""
+        samples = np.asarray(samples).astype(np.uint8)
+        change = np.flatnonzero(samples[1:] != samples[:-1]) + 1
+        idx = np.concatenate([[0], change])
+        times_ns = np.rint(start_s * 1e9 + idx * (1e9 / sample_rate)).astype(np.int64)
+        end_ns = int(round(start_s * 1e9 + len(samples) * (1e9 / sample_rate)))
+        return cls(times_ns, samples[idx], end_ns)
+
+    def __len__(self):
+        """Number of edges (the initial state is not counted)."""
+        return len(self.times_ns) - 1
+
+    @staticmethod
+    def _ns(t_s):
+        return np.rint(np.asarray(t_s, dtype=np.float64) * 1e9).astype(np.int64)
+
+    def _span(self, t0, t1):
+        """Clamps an optional (t0, t1) window in seconds to the capture, as ns."""
+        lo = self.start_ns if t0 is None else max(int(self._ns(t0)), self.start_ns)
+        hi = self.end_ns if t1 is None else min(int(self._ns(t1)), self.end_ns)
+        if hi < lo:
+            raise ValueError("Window end is before window start")
+        return lo, hi
+
+    def _edge_slice(self, lo_ns, hi_ns):
+        """Indices [a, b) of the edges with lo_ns <= time < hi_ns (index 0 is never an edge)."""
+        a = max(int(np.searchsorted(self.times_ns, lo_ns, side='left')), 1)
+        b = max(int(np.searchsorted(self.times_ns, hi_ns, side='left')), a)
+        return a, b
+
+    def state_at(self, t):
+        """State at time t (s); t may be a scalar or an array. Times before the capture start are -1."""
+        out = self.state_at_ns(self._ns(t))
+        return int(out) if out.ndim == 0 else out
+
+    def state_at_ns(self, t_ns):
+        """Same as state_at() for int64 ns times of any shape (used by the protocol decoders)."""
+        idx = np.searchsorted(self.times_ns, t_ns, side='right') - 1
+        return np.where(idx >= 0, self.states[np.maximum(idx, 0)], -1)
+
+    def edges(self, t0=None, t1=None, kind='both'):
+        """
+        Edge times (s) with t0 <= t < t1.
+        :param kind: 'rising', 'falling' or 'both'.
+        """
+        a, b = self._edge_slice(*self._span(t0, t1))
+        times = self.times_ns[a:b]
+        if kind == 'rising':
+            times = times[self.states[a:b] == 1]
+        elif kind == 'falling':
+            times = times[self.states[a:b] == 0]
+        elif kind != 'both':
+            raise ValueError("kind must be 'rising', 'falling' or 'both'")
+        return times / 1e9
+
+    def edge_count(self, t0=None, t1=None):
+        a, b = self._edge_slice(*self._span(t0, t1))
+        return b - a
+
+    def pulse_widths(self, level=1, t0=None, t1=None):
+        """Widths (s) of every complete pulse at `level` that starts and ends inside the window."""
+        a, b = self._edge_slice(*self._span(t0, t1))
+        starts = np.arange(a, b - 1)
+        starts = starts[self.states[starts] == level]
+        return (self.times_ns[starts + 1] - self.times_ns[starts]) / 1e9
+
+    def periods(self, t0=None, t1=None, kind='rising'):
+        """Times (s) between consecutive rising (or falling) edges inside the window."""
+        return np.diff(self.edges(t0, t1, kind))
+
+    def pulse_width_histogram(self, level=1, bins=50, t0=None, t1=None):
+        """np.histogram of pulse_widths(): returns (counts, bin_edges_s)."""
+        return np.histogram(self.pulse_widths(level, t0, t1), bins=bins)
+
+    def period_histogram(self, bins=50, t0=None, t1=None, kind='rising'):
+        """np.histogram of periods(): returns (counts, bin_edges_s)."""
+        return np.histogram(self.periods(t0, t1, kind), bins=bins)
+
+    def _high_time_until(self, t_ns):
+        """Total high time (ns) from the capture start to t_ns, via a prefix sum over segments."""
+        if self._high_ns is None:
+            seg = np.diff(self.times_ns) * (self.states[:-1] == 1)
+            self._high_ns = np.concatenate([[0], np.cumsum(seg)])
+        idx = int(np.searchsorted(self.times_ns, t_ns, side='right')) - 1
+        return int(self._high_ns[idx]) + (t_ns - int(self.times_ns[idx])) * int(self.states[idx] == 1)
+
+    def high_time(self, t0=None, t1=None):
+        """Seconds spent high inside the window."""
+        lo, hi = self._span(t0, t1)
+        return (self._high_time_until(hi) - self._high_time_until(lo)) / 1e9
+
+    def duty_cycle(self, t0=None, t1=None):
+        """Fraction of the window spent high."""
+        lo, hi = self._span(t0, t1)
+        if hi == lo:
+            return float(self.state_at(lo / 1e9))
+        return (self._high_time_until(hi) - self._high_time_until(lo)) / (hi - lo)
+
+    def window(self, t0=None, t1=None):
+        """A new DigitalTrace restricted to [t0, t1)."""
+        lo, hi = self._span(t0, t1)
+        _, b = self._edge_slice(lo, hi)
+        a = min(int(np.searchsorted(self.times_ns, lo, side='right')), b) # an edge exactly at lo is the initial state
+        times = np.concatenate([[lo], self.times_ns[a:b]])
+        states = np.concatenate([[self.state_at(lo / 1e9)], self.states[a:b]]).astype(np.uint8)
+        return DigitalTrace(times, states, hi)
@@ -0,0 +1,212 @@
+import json
+import os
+
+import numpy as np
+
+from saleae_digital import DigitalTrace
+
+"""
+Fast loader for the CSVs written by SaleaeWrapper.capture_timed() (capture.export_raw_data_csv).
+
+The first load streams digital.csv / analog.csv in chunks of lines, parses each chunk with
+numpy, and converts it into a compact binary cache next to the CSVs:
+    digital channels - int64 transition timestamps (ns) + uint8 state after each transition
+    analog channels  - float32 samples on a uniform time base (t0 + i * dt)
+Later loads memory-map the cache, so re-analysing a run starts almost instantly and only the
+parts you touch are read from disk. The cache is rebuilt automatically if a CSV changes.
+
+    run = load_capture("lab_results/run_1")
+    times_ns, states = run.digital[0]
+    gpio = run.trace(0)              # DigitalTrace with indexed time queries
+    current = run.analog[1]          # np.memmap, float32
+    t = run.analog_time(1)           # seconds, built on demand
+"""
+
+CACHE_DIRNAME = ".cache"
+CACHE_META = "cache.json"
+CACHE_VERSION = 1
+CHUNK_BYTES = 64 * 1024 * 1024 # CSV text parsed per batch
+
+
+def _channel_key(column):
+    """'Channel 3' -> 3; custom channel names are kept as strings."""
+    name = column.strip()
+    if name.lower().startswith('channel '):
+        try:
+            return int(name.split()[1])
+        except ValueError:
+            pass
+    return name
+
+
+def _read_chunks(path):
+    """Yields (channel keys, float64 array of rows) for each batch of lines in a Saleae CSV."""
+    with open(path, 'r') as f:
+        header = f.readline().strip().split(',')
+        channels = [_channel_key(c) for c in header[1:]]
+        while True:
+            lines = f.readlines(CHUNK_BYTES)
+            if not lines:
+                break
+            rows = np.loadtxt(lines, delimiter=',', dtype=np.float64, ndmin=2)
+            yield channels, rows
+
+
+def _source_stamp(path):
+    st = os.stat(path)
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+class SaleaeCapture:
+    """
+    One exported run, backed by the binary cache.
+    :attr digital: Dict {channel: (times_ns int64, states uint8)} - one entry per transition,
+                   the first entry is the initial state at the start of the capture.
+    :attr analog: Dict {channel: float32 samples}.
+    """
+
+    def __init__(self, directory, meta, cache_dir=None):
+        self.directory = directory
+        self.meta = meta
+        cache = cache_dir or os.path.join(directory, CACHE_DIRNAME)
+
+        self.digital = {}
+        for entry in meta['digital']:
+            n = entry['transitions']
+            times = np.memmap(os.path.join(cache, entry['times']), dtype=np.int64, mode='r', shape=(n,)) if n else np.zeros(0, np.int64)
+            states = np.memmap(os.path.join(cache, entry['states']), dtype=np.uint8, mode='r', shape=(n,)) if n else np.zeros(0, np.uint8)
+            self.digital[self._key(entry['channel'])] = (times, states)
+
+        self.analog = {}
+        self.analog_t0 = {}
+        self.analog_dt = {}
+        for entry in meta['analog']:
+            key = self._key(entry['channel'])
+            n = entry['samples']
+            self.analog[key] = np.memmap(os.path.join(cache, entry['file']), dtype=np.float32, mode='r', shape=(n,)) if n else np.zeros(0, np.float32)
+            self.analog_t0[key] = entry['t0_s']
+            self.analog_dt[key] = entry['dt_s']
+
+    @staticmethod
+    def _key(channel):
+        # json turns every key into a string; keep numeric channels as ints
+        return int(channel) if isinstance(channel, str) and channel.isdigit() else channel
+
+    def end_ns(self):
+        """End of the capture: last analog sample if there is one, else the last digital transition."""
+        ends = [int(round((self.analog_t0[ch] + len(a) * self.analog_dt[ch]) * 1e9)) for ch, a in self.analog.items() if len(a)]
+        ends += [int(t[-1]) for t, _ in self.digital.values() if len(t)]
+        return max(ends)
+
+    def trace(self, channel):
+        """DigitalTrace for one digital channel."""
+        times, states = self.digital[channel]
+        return DigitalTrace(times, states, self.end_ns())
+
+    def analog_time(self, channel):
+        """Time axis (s) for one analog channel."""
+        return self.analog_t0[channel] + np.arange(len(self.analog[channel])) * self.analog_dt[channel]
+
+
+def _build_digital(csv_path, cache):
+    """Streams digital.csv and keeps only the rows where each channel changes state."""
+    times, states, carry, channels = {}, {}, {}, []
+    for channels, rows in _read_chunks(csv_path):
+        t_ns = np.rint(rows[:, 0] * 1e9).astype(np.int64)
+        for i, ch in enumerate(channels):
+            s = rows[:, i + 1].astype(np.uint8)
+            # digital.csv has one row per change on *any* channel; keep this channel's changes
+            change = np.empty(len(s), dtype=bool)
+            change[0] = carry.get(ch) is None or s[0] != carry[ch]
+            change[1:] = s[1:] != s[:-1]
+            times.setdefault(ch, []).append(t_ns[change])
+            states.setdefault(ch, []).append(s[change])
+            carry[ch] = s[-1]
+
+    entries = []
+    for ch in channels:
+        name = str(ch).replace(' ', '_')
+        entry = {'channel': ch, 'times': f"digital_{name}_t.i64", 'states': f"digital_{name}_s.u8"}
+        t = np.concatenate(times[ch]) if ch in times else np.zeros(0, np.int64)
+        s = np.concatenate(states[ch]) if ch in states else np.zeros(0, np.uint8)
+        t.tofile(os.path.join(cache, entry['times']))
+        s.tofile(os.path.join(cache, entry['states']))
+        entry['transitions'] = len(t)
+        entries.append(entry)
+    return entries
+
+
+def _build_analog(csv_path, cache):
+    """Streams analog.csv straight into float32 files; only t0 and dt of the time column are kept."""
+    files, entries = {}, {}
+    t0 = t1 = None
+    n = 0
+    try:
+        for channels, rows in _read_chunks(csv_path):
+            if t0 is None:
+                t0 = float(rows[0, 0])
+                files = {ch: open(os.path.join(cache, f"analog_{str(ch).replace(' ', '_')}.f32"), 'wb') for ch in channels}
+                entries = {ch: {'channel': ch, 'file': os.path.basename(f.name)} for ch, f in files.items()}
+            for i, ch in enumerate(channels):
+                rows[:, i + 1].astype(np.float32).tofile(files[ch])
+            n += len(rows)
+            t1 = float(rows[-1, 0])
+    finally:
+        for f in files.values():
+            f.close()
+
+    dt = (t1 - t0) / (n - 1) if n > 1 else 0.0 # pyright: ignore[reportOptionalOperand]
+    for entry in entries.values():
+        entry.update(samples=n, t0_s=t0, dt_s=dt)
+    return list(entries.values())
+
+
+def build_cache(directory, cache_dir=None):
+    """Parses the CSVs in an export folder into the binary cache. Returns the cache metadata."""
+    cache = cache_dir or os.path.join(directory, CACHE_DIRNAME)
+    if not os.path.exists(cache):
+        os.makedirs(cache)
+
+    meta = {'version': CACHE_VERSION, 'sources': {}, 'digital': [], 'analog': []}
+    for name, build in (('digital.csv', _build_digital), ('analog.csv', _build_analog)):
+        path = os.path.join(directory, name)
+        if os.path.exists(path):
+            print(f"Converting {path} to binary cache...")
+            meta['sources'][name] = _source_stamp(path)
+            meta[name.split('.')[0]] = build(path, cache)
+    if not meta['sources']:
+        raise FileNotFoundError(f"No digital.csv or analog.csv found in {directory}")
+
+    with open(os.path.join(cache, CACHE_META), 'w') as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def cache_is_current(directory, cache_dir=None):
+    """Returns the cache metadata if it exists and matches the CSVs on disk, else None."""
+    meta_path = os.path.join(cache_dir or os.path.join(directory, CACHE_DIRNAME), CACHE_META)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, 'r') as f:
+        meta = json.load(f)
+    if meta.get('version') != CACHE_VERSION:
+        return None
+    for name in ('digital.csv', 'analog.csv'):
+        path = os.path.join(directory, name)
+        if os.path.exists(path) != (name in meta['sources']):
+            return None
+        if os.path.exists(path) and _source_stamp(path) != meta['sources'][name]:
+            return None
+    return meta
+
+
+def load_capture(directory, rebuild=False, cache_dir=None):
+    """
+    Loads a Saleae CSV export folder (as returned by capture_timed), using the binary cache.
+    :param rebuild: Force the CSVs to be parsed again.
+    :param cache_dir: Where the binary cache lives (default: .cache inside the export folder).
+    """
+    meta = None if rebuild else cache_is_current(directory, cache_dir)
+    if meta is None:
+        meta = build_cache(directory, cache_dir)
+    return SaleaeCapture(directory, meta, cache_dir)
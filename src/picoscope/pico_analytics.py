@@ -0,0 +1,216 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+from pico_driver import CHANNEL_INPUT_RANGES_MV
+
+"""
+Streaming analytics for PicoStreamer channels.
+
+OnlineAnalytics updates running min / max / mean / RMS, threshold crossing times and
+time-to-X% per chunk, using vectorized numpy on the raw int16 data. Thresholds are converted
+to ADC counts once at start, so nothing is scaled to mV until a result is asked for.
+
+Use it as a pipeline stage (results are queryable with snapshot() while the capture runs,
+and written as a small JSON summary when it ends):
+
+    stats = pipeline.subscribe(OnlineAnalytics(thresholds_mv={'A': [2500]}, target_mv={'A': 5000},
+                                               summary_path="results/supercap_01/summary.json"))
+"""
+
+
+def schmitt_states(raw, hi, lo, carry):
+    """
+    Vectorized Schmitt trigger over one chunk of raw counts.
+    A sample is high (1) at or above `hi`, low (0) at or below `lo`, and keeps the previous
+    state in between. `carry` is the state at the end of the previous chunk (None if unknown).
+    :return: (state per sample, state of the preceding sample), both int8 with -1 = unknown,
+             or (None, None) if the whole chunk sits inside the band with no known state.
+    """
+    n = len(raw)
+    state = np.full(n, -1, dtype=np.int8)
+    state[raw >= hi] = 1
+    state[raw <= lo] = 0
+    carry = -1 if carry is None else carry
+
+    # samples inside the hysteresis band keep the last defined state
+    defined = state >= 0
+    if not defined.any():
+        if carry < 0:
+            return None, None
+        return np.full(n, carry, dtype=np.int8), np.full(n, carry, dtype=np.int8)
+    last = np.where(defined, np.arange(n), -1)
+    np.maximum.accumulate(last, out=last)
+    filled = np.where(last >= 0, state[np.maximum(last, 0)], carry).astype(np.int8)
+
+    prev = np.empty(n, dtype=np.int8)
+    prev[0] = carry
+    prev[1:] = filled[:-1]
+    return filled, prev
+
+
+class ChannelStats:
+    """Running statistics for one channel, all kept in ADC counts."""
+
+    def __init__(self, scale, interval_s, thresholds_mv=(), hysteresis_mv=0.0, target_mv=None,
+                 percents=(), max_events=10_000):
+        self.scale = scale
+        self.interval_s = interval_s
+        self.max_events = max_events
+
+        self.count = 0
+        self.position = 0 # absolute index of the next expected sample
+        self.gaps = 0
+        self.min = None
+        self.max = None
+        self.sum = 0
+        self.sumsq = 0.0
+
+        # each threshold is a Schmitt trigger: high above level + h/2, low below level - h/2
+        half = hysteresis_mv / 2
+        self.thresholds = [{
+            'level_mv': mv,
+            'hi': int(np.ceil((mv + half) / scale)),
+            'lo': int(np.floor((mv - half) / scale)),
+            'state': None,
+            'crossings': [], # (time_s, +1 rising / -1 falling)
+            'dropped': 0,
+        } for mv in thresholds_mv]
+
+        # time-to-X%: first sample at or above X% of target
+        self.time_to = {}
+        if target_mv is not None:
+            self.time_to = {p: {'counts': int(np.ceil(target_mv * p / 100 / scale)), 'time_s': None} for p in percents}
+        self.target_mv = target_mv
+
+    def update(self, raw, start_sample):
+        """Folds one chunk of raw int16 samples (starting at absolute index start_sample) into the stats."""
+        n = len(raw)
+        if n == 0:
+            return
+        if start_sample != self.position:
+            self._gap()
+        self.position = start_sample + n
+        lo, hi = int(raw.min()), int(raw.max())
+        self.min = lo if self.min is None else min(self.min, lo)
+        self.max = hi if self.max is None else max(self.max, hi)
+        self.sum += int(raw.sum(dtype=np.int64))
+        as_float = raw.astype(np.float64)
+        self.sumsq += float(np.dot(as_float, as_float))
+        self.count += n
+
+        for thr in self.thresholds:
+            self._update_threshold(thr, raw, start_sample)
+
+        for t in self.time_to.values():
+            if t['time_s'] is None and hi >= t['counts']:
+                first = int(np.argmax(raw >= t['counts']))
+                t['time_s'] = (start_sample + first) * self.interval_s
+
+    def _gap(self):
+        """Samples were missed: the threshold states don't carry over, so no crossing is made up across the gap."""
+        self.gaps += 1
+        for thr in self.thresholds:
+            thr['state'] = None
+
+    def _update_threshold(self, thr, raw, start_sample):
+        """Schmitt-trigger state tracking and crossing extraction for one chunk."""
+        filled, prev = schmitt_states(raw, thr['hi'], thr['lo'], thr['state'])
+        if filled is None:
+            return
+        edges = np.nonzero((prev >= 0) & (filled >= 0) & (prev != filled))[0]
+
+        room = self.max_events - len(thr['crossings'])
+        if len(edges) > room:
+            thr['dropped'] += len(edges) - room
+            edges = edges[:room]
+        times = (start_sample + edges) * self.interval_s
+        thr['crossings'].extend(zip(times.tolist(), np.where(filled[edges] == 1, 1, -1).tolist()))
+        thr['state'] = int(filled[-1])
+
+    def summary(self):
+        """Current results converted to mV / seconds."""
+        if self.count == 0:
+            return {'samples': 0}
+        return {
+            'samples': self.count,
+            'gaps': self.gaps,
+            'min_mv': self.min * self.scale, # pyright: ignore[reportOptionalOperand]
+            'max_mv': self.max * self.scale, # pyright: ignore[reportOptionalOperand]
+            'mean_mv': self.sum / self.count * self.scale,
+            'rms_mv': float(np.sqrt(self.sumsq / self.count)) * self.scale,
+            'thresholds': [{
+                'level_mv': thr['level_mv'],
+                'crossings': len(thr['crossings']) + thr['dropped'],
+                'first_rising_s': next((t for t, d in thr['crossings'] if d > 0), None),
+                'first_falling_s': next((t for t, d in thr['crossings'] if d < 0), None),
+                'times_s': [t for t, _ in thr['crossings']],
+                'directions': [d for _, d in thr['crossings']],
+            } for thr in self.thresholds],
+            'target_mv': self.target_mv,
+            'time_to_percent_s': {str(p): t['time_s'] for p, t in self.time_to.items()},
+        }
+
+
+class OnlineAnalytics:
+    """
+    Pipeline stage that keeps ChannelStats for every enabled channel.
+    :param thresholds_mv: Dict {'A': [mV, ...]} of levels whose crossing times to record.
+    :param hysteresis_mv: Width of the band around each level that must be crossed fully,
+                          so noise sitting on a level doesn't produce thousands of crossings.
+    :param target_mv: Dict {'A': mV} final value for time-to-X% (e.g. supercap charge voltage).
+    :param percents: Percent-of-target levels to time.
+    :param summary_path: If set, the summary JSON is written there when the capture ends.
+    """
+
+    name = 'stats'
+
+    def __init__(self, thresholds_mv=None, hysteresis_mv=0.0, target_mv=None,
+                 percents=(10, 50, 63.2, 90, 99), summary_path=None, max_events=10_000):
+        self.thresholds_mv = thresholds_mv or {}
+        self.hysteresis_mv = hysteresis_mv
+        self.target_mv = target_mv or {}
+        self.percents = percents
+        self.summary_path = summary_path
+        self.max_events = max_events
+        self.channels = {}
+        self.lock = threading.Lock()
+
+    def start(self, meta):
+        interval_s = meta['sample_interval_ns'] / 1e9
+        with self.lock:
+            self.channels = {
+                ch: ChannelStats(CHANNEL_INPUT_RANGES_MV[rng] / meta['max_adc'], interval_s,
+                                 self.thresholds_mv.get(ch, ()), self.hysteresis_mv,
+                                 self.target_mv.get(ch), self.percents, self.max_events)
+                for ch, rng in meta['channel_ranges'].items()
+            }
+
+    def consume(self, desc):
+        with self.lock:
+            for ch, data in desc.data.items():
+                self.channels[ch].update(data, desc.start_sample)
+
+    def update(self, channel, raw, start_sample):
+        """Feeds data directly, for use outside a pipeline (e.g. chunks of a stored capture)."""
+        with self.lock:
+            self.channels[channel].update(raw, start_sample)
+
+    def finish(self):
+        if self.summary_path:
+            self.save(self.summary_path)
+
+    def snapshot(self):
+        """Results so far for every channel - safe to call while the capture is running."""
+        with self.lock:
+            return {ch: stats.summary() for ch, stats in self.channels.items()}
+
+    def save(self, path):
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        with open(path, 'w') as f:
+            json.dump(self.snapshot(), f, indent=2)
+        print(f"Summary saved to: {path}")
@@ -1,20 +1,44 @@
 try:
-    import ctypes, threading, time, os
+    import ctypes, threading, time, os, sys
     import numpy as np
-    import pandas as pd
-    import matplotlib.pyplot as plt
-    from picosdk.ps2000a import ps2000a as ps
-    from picosdk.functions import assert_pico_ok, adc2mV
+    from pico_driver import load_driver, assert_pico_ok, timebase_for_interval, CHANNEL_INPUT_RANGES_MV, TIME_UNIT_S
+    from pico_storage import GrowableMemmap, write_meta, open_capture
+    from pico_views import ScaledChannel, TimeBase
+    from pico_export import EXPORTERS, export_csv
+    from pico_decimate import MinMaxPyramid, minmax_envelope, interleave
+    from pico_pipeline import CapturePipeline
+    from pico_trigger import TriggeredRecorder
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) # src/, modules shared by both instruments
+    from capture_metrics import Metrics
 except ImportError:
     raise SystemExit("Error importing modules - Did you run pico_setup.sh?")
 
+# streaming buffer / poll sizing, see PicoStreamer._plan_streaming()
+DRIVER_BUFFER_SECONDS = 0.25            # driver buffer holds this much signal per channel
+MIN_DRIVER_BUFFER = 1000                # samples
+MAX_DRIVER_BUFFER_BYTES = 64_000_000    # across all enabled channels
+POLL_FILL_FRACTION = 0.25               # idle poll period = time to fill this fraction of the buffer
+MIN_POLL_S, MAX_POLL_S = 0.001, 0.05
+STATUS_PERIOD_S = 1.0
+BLOCK_POLL_S = 0.001                    # ps2000aIsReady poll period in block mode
+
 class PicoStreamer:
     """
     A simplified wrapper for the PicoScope 2000a Series (e.g., the 2206B in the lab) 
     Handles streaming, buffer management, and file saving.
     """
 
-    def __init__(self, max_samples=20_000_000):
+    def __init__(self, max_samples=20_000_000, driver=None, serial=None, metrics=None):
+        """
+        :param max_samples: Per-channel sample cap for in-memory captures.
+        :param driver: None for the real picosdk driver, 'sim' for the simulator in
+                       pico_driver.py, or a driver object (e.g. SimulatedPs2000a(...)).
+        :param serial: Serial number of the unit to open (e.g. 'JO123/0456'). None opens the first one found.
+        :param metrics: capture_metrics.Metrics to record into (e.g. Metrics('pico', sample_every=10)).
+        """
+        self.driver = driver
+        self.ps = None # resolved by open_unit(), so offline use (load_capture) never loads a driver
+        self.serial = serial
         self.chandle = ctypes.c_int16()
         self.status = {}
         self.max_samples = max_samples
@@ -26,13 +50,33 @@ class PicoStreamer:
         
         # data storage
         self.buffers_raw = {'A': None, 'B': None}
+        self.disk_dir = None # set by run_capture when streaming straight to disk
+        self.pyramids = {} # optional min/max pyramids for fast zoomed plots, see build_plot_pyramids()
         self.data_mv: dict = {'A': np.array([]), 'B': np.array([]), 'Time': np.array([])}
         self.sample_count = 0
+        self.start_time_ns = None
         self.max_adc = ctypes.c_int16()
         
+        # streaming health, filled in by run_capture
+        self.dropped_samples = 0 # samples lost because the driver buffer overran
+        self.overflow_counts = {'A': 0, 'B': 0} # callbacks that reported over-range per channel
+        self.driver_buffer_size = MIN_DRIVER_BUFFER
+        self.poll_period_s = MAX_POLL_S
+        
         # flags
         self.stop_event = threading.Event()
         self.auto_stop = False
+        self._chunk_ready = False
+        self._first_chunk = None # (perf_counter time, samples) of the first callback, for gap tracking
+        self.pipeline = None # optional CapturePipeline fed from the callback, see run_capture()
+        self.record = True # False = samples only go to the pipeline (triggered / analysis-only runs)
+        self.metrics = metrics or Metrics('pico') # callback / poll / export timings, see save_metrics()
+
+        # rapid block results, filled in by run_rapid_block() / load_capture()
+        self.segments = {} # {'A': int16 array (segments, samples per segment)}
+        self.trigger_offsets_s = np.zeros(0) # sub-sample trigger time of each segment, relative to its trigger sample
+        self.pre_trigger_samples = 0
+        self.segment_interval_ns = None
 
     def __enter__(self):
         """Allows use of 'with' statement to ensure scope closes safely."""
@@ -45,14 +89,17 @@ class PicoStreamer:
 
     def open_unit(self):
         """Connects to the PicoScope."""
-        print("Initializing PicoScope...")
-        self.status["openunit"] = ps.ps2000aOpenUnit(ctypes.byref(self.chandle), None) # pyright: ignore[reportAttributeAccessIssue]
+        print("Initializing PicoScope..." if self.serial is None else f"Initializing PicoScope {self.serial}...")
+        if self.ps is None:
+            self.ps = load_driver(self.driver, self.serial)
+        serial = None if self.serial is None else ctypes.c_char_p(self.serial.encode())
+        self.status["openunit"] = self.ps.ps2000aOpenUnit(ctypes.byref(self.chandle), serial) # pyright: ignore[reportAttributeAccessIssue]
         try:
             assert_pico_ok(self.status["openunit"])
             self.is_open = True
             
             # get Max ADC value for conversion later
-            ps.ps2000aMaximumValue(self.chandle, ctypes.byref(self.max_adc)) # pyright: ignore[reportAttributeAccessIssue]
+            self.ps.ps2000aMaximumValue(self.chandle, ctypes.byref(self.max_adc)) # pyright: ignore[reportAttributeAccessIssue]
             print("Scope connected successfully.")
         except Exception as e:
             print(f"Error opening scope: {e}")
@@ -69,25 +116,25 @@ class PicoStreamer:
             raise ValueError("Channel must be 'A' or 'B'")
 
         ch_map = {
-            'A': ps.PS2000A_CHANNEL['PS2000A_CHANNEL_A'], # pyright: ignore[reportAttributeAccessIssue]
-            'B': ps.PS2000A_CHANNEL['PS2000A_CHANNEL_B'] # pyright: ignore[reportAttributeAccessIssue]
+            'A': self.ps.PS2000A_CHANNEL['PS2000A_CHANNEL_A'], # pyright: ignore[reportAttributeAccessIssue]
+            'B': self.ps.PS2000A_CHANNEL['PS2000A_CHANNEL_B'] # pyright: ignore[reportAttributeAccessIssue]
         }
         
         # map simple strings to Pico Enums
         range_map = {
-            '10V': ps.PS2000A_RANGE['PS2000A_10V'], # pyright: ignore[reportAttributeAccessIssue]
-            '5V':  ps.PS2000A_RANGE['PS2000A_5V'], # pyright: ignore[reportAttributeAccessIssue]
-            '2V':  ps.PS2000A_RANGE['PS2000A_2V'], # pyright: ignore[reportAttributeAccessIssue]
-            '1V':  ps.PS2000A_RANGE['PS2000A_1V'], # pyright: ignore[reportAttributeAccessIssue]
+            '10V': self.ps.PS2000A_RANGE['PS2000A_10V'], # pyright: ignore[reportAttributeAccessIssue]
+            '5V':  self.ps.PS2000A_RANGE['PS2000A_5V'], # pyright: ignore[reportAttributeAccessIssue]
+            '2V':  self.ps.PS2000A_RANGE['PS2000A_2V'], # pyright: ignore[reportAttributeAccessIssue]
+            '1V':  self.ps.PS2000A_RANGE['PS2000A_1V'], # pyright: ignore[reportAttributeAccessIssue]
         }
         
-        selected_range = range_map.get(voltage_range, ps.PS2000A_RANGE['PS2000A_10V']) # pyright: ignore[reportAttributeAccessIssue]
+        selected_range = range_map.get(voltage_range, self.ps.PS2000A_RANGE['PS2000A_10V']) # pyright: ignore[reportAttributeAccessIssue]
         self.channel_ranges[channel] = selected_range
         
         # configure and enable
-        status = ps.ps2000aSetChannel( # pyright: ignore[reportAttributeAccessIssue]
+        status = self.ps.ps2000aSetChannel( # pyright: ignore[reportAttributeAccessIssue]
             self.chandle, ch_map[channel], 1, 
-            ps.PS2000A_COUPLING['PS2000A_DC'], # pyright: ignore[reportAttributeAccessIssue]
+            self.ps.PS2000A_COUPLING['PS2000A_DC'], # pyright: ignore[reportAttributeAccessIssue]
             selected_range, 0.0
         )
         assert_pico_ok(status)
@@ -96,27 +143,110 @@ class PicoStreamer:
 
     def _streaming_callback(self, handle, noOfSamples, startIndex, overflow, triggerAt, triggered, autoStop, param):
         """Internal C-type callback for data collection."""
-        destEnd = self.sample_count + noOfSamples
-        sourceEnd = startIndex + noOfSamples
+        t0 = time.perf_counter()
+        self._store_chunk(noOfSamples, startIndex, overflow, autoStop)
+        self.metrics.observe('callback_seconds', time.perf_counter() - t0)
+        self.metrics.observe('chunk_samples', noOfSamples)
+
+    def _store_chunk(self, noOfSamples, startIndex, overflow, autoStop):
+        """Copies one driver chunk to RAM / disk / the pipeline."""
+        self._chunk_ready = True
+        if self._first_chunk is None:
+            self._first_chunk = (time.perf_counter(), noOfSamples)
+        if overflow:
+            # bit 0 = channel A, bit 1 = channel B
+            if overflow & 1:
+                self.overflow_counts['A'] += 1
+                self.metrics.event('overflow', channel='A', sample=self.sample_count)
+            if overflow & 2:
+                self.overflow_counts['B'] += 1
+                self.metrics.event('overflow', channel='B', sample=self.sample_count)
+        if autoStop:
+            self.auto_stop = True
+
+        # pipeline-only mode: nothing is stored here, stages see every chunk
+        if not self.record:
+            self._publish(self.sample_count, startIndex, startIndex + noOfSamples)
+            self.sample_count += noOfSamples
+            return
+
+        # disk mode: append the chunk to the growable files, no sample cap
+        if self.disk_dir is not None:
+            sourceEnd = startIndex + noOfSamples
+            if self.enabled_channels['A']:
+                self.buffers_raw['A'].append(self.temp_buffer_a[startIndex:sourceEnd]) # pyright: ignore[reportAttributeAccessIssue, reportOptionalMemberAccess]
+            if self.enabled_channels['B']:
+                self.buffers_raw['B'].append(self.temp_buffer_b[startIndex:sourceEnd]) # pyright: ignore[reportAttributeAccessIssue, reportOptionalMemberAccess]
+            self._publish(self.sample_count, startIndex, sourceEnd)
+            self.sample_count += noOfSamples
+            return
         
+        destEnd = min(self.sample_count + noOfSamples, self.max_samples)
         if destEnd >= self.max_samples:
             self.auto_stop = True
-            destEnd = self.max_samples
+        sourceEnd = startIndex + (destEnd - self.sample_count)
         
         # only streams enabled channels
         if self.enabled_channels['A'] and self.buffers_raw['A'] is not None:
-            try:
-                self.buffers_raw['A'][self.sample_count:destEnd] = self.temp_buffer_a[startIndex:sourceEnd]
-            except ValueError:
-                print("Unexpected inputs to streaming callback")
+            self.buffers_raw['A'][self.sample_count:destEnd] = self.temp_buffer_a[startIndex:sourceEnd]
         if self.enabled_channels['B'] and self.buffers_raw['B'] is not None:
-            try:
-                self.buffers_raw['B'][self.sample_count:destEnd] = self.temp_buffer_b[startIndex:sourceEnd]
-            except ValueError:
-                print("Unexpected inputs to streaming callback")
-        self.sample_count += noOfSamples
-        if autoStop:
-            self.auto_stop = True
+            self.buffers_raw['B'][self.sample_count:destEnd] = self.temp_buffer_b[startIndex:sourceEnd]
+        self._publish(self.sample_count, startIndex, sourceEnd)
+        self.sample_count = destEnd
+
+    def _publish(self, start_sample, startIndex, sourceEnd):
+        """Hands the chunk to the pipeline stages, if a pipeline is attached."""
+        if self.pipeline is None:
+            return
+        chunks = {}
+        if self.enabled_channels['A']:
+            chunks['A'] = self.temp_buffer_a[startIndex:sourceEnd]
+        if self.enabled_channels['B']:
+            chunks['B'] = self.temp_buffer_b[startIndex:sourceEnd]
+        self.pipeline.publish(start_sample, chunks)
+
+    def _plan_streaming(self, sample_interval_ns):
+        """
+        Sizes the driver buffers and the idle poll period from the sample rate.
+        The buffer holds DRIVER_BUFFER_SECONDS of signal (within a memory cap shared by
+        the enabled channels), and the loop polls well before it can fill up.
+        :return: (buffer_size in samples per channel, poll period in seconds)
+        """
+        n_channels = max(sum(self.enabled_channels.values()), 1)
+        rate = 1e9 / sample_interval_ns
+        buffer_size = int(rate * DRIVER_BUFFER_SECONDS)
+        buffer_size = min(max(buffer_size, MIN_DRIVER_BUFFER), MAX_DRIVER_BUFFER_BYTES // (2 * n_channels))
+        poll_s = min(max(buffer_size / rate * POLL_FILL_FRACTION, MIN_POLL_S), MAX_POLL_S)
+        return buffer_size, poll_s
+
+    def _track_gaps(self, interval_s, disk_mode):
+        """
+        Counts samples the driver must have discarded: anything produced since the first
+        chunk that we haven't received and that no longer fits in the driver buffer.
+        """
+        if self._first_chunk is None or self.auto_stop:
+            return
+        t_first, n_first = self._first_chunk
+        expected = n_first + (time.perf_counter() - t_first) / interval_s
+        if not disk_mode:
+            expected = min(expected, self.max_samples)
+        backlog = expected - self.sample_count - self.dropped_samples
+        if backlog > self.driver_buffer_size:
+            self.dropped_samples += int(backlog - self.driver_buffer_size)
+
+    def _status_message(self):
+        status_msg = f"\rSamples: {self.sample_count}"
+        for ch in ['A', 'B']:
+            if self.enabled_channels[ch] and self.buffers_raw[ch] is not None and self.sample_count > 0:
+                status_msg += f" | Ch{ch}: {self._latest_raw(ch) * self._mv_per_count(ch):.1f} mV"
+        if self.dropped_samples:
+            status_msg += f" | dropped: {self.dropped_samples}"
+        return status_msg
+
+    def _report_status(self, done):
+        """Background thread that prints progress, keeping formatting off the poll loop."""
+        while not done.wait(STATUS_PERIOD_S):
+            print(self._status_message(), end="")
 
     def _wait_for_input(self):
         """Background thread to listen for user stopping the test."""
@@ -129,95 +259,438 @@ class PicoStreamer:
             except EOFError:
                 break
 
-    def run_capture(self, sample_interval_ns=1_000_000):
+    def run_capture(self, sample_interval_ns=1_000_000, disk_dir=None, wait_for_input=True, pipeline=None, record=True,
+                    duration_s=None):
         """
         Starts the streaming capture. 
+        :param disk_dir: If set, samples are appended to memory-mapped files in this folder
+                        instead of RAM, and the capture is no longer capped at max_samples.
+                        Reopen the result later with pico_storage.open_capture(disk_dir).
+        :param wait_for_input: Listen on stdin for 'done'. Turn off for unattended/scripted runs.
+        :param duration_s: Stop this long after streaming starts. Unlike setting stop_event from a
+                           timer, this can't fire before the capture has begun.
+        :param pipeline: Optional pico_pipeline.CapturePipeline. Every chunk is also published to
+                        its stages (disk writer, stats, live plot...), which run on worker threads
+                        while the capture streams and are drained before run_capture returns.
+        :param record: False keeps no copy of the samples here (only the pipeline sees them), so
+                      the run is unbounded and memory doesn't grow. Used by run_triggered_capture().
         """
         if not (self.enabled_channels['A'] or self.enabled_channels['B']):
             print("Error: No channels setup! Call setup_channel() first.")
             return
+        if not record and (disk_dir is not None or pipeline is None):
+            raise ValueError("record=False needs a pipeline and can't be combined with disk_dir")
 
-        # disable unused channels to prevent driver errors
-        ch_map = {'A': ps.PS2000A_CHANNEL['PS2000A_CHANNEL_A'], 'B': ps.PS2000A_CHANNEL['PS2000A_CHANNEL_B']} # pyright: ignore[reportAttributeAccessIssue]
-        for ch, enabled in self.enabled_channels.items():
-            if not enabled:
-                ps.ps2000aSetChannel(self.chandle, ch_map[ch], 0, 0, 0, 0) # 3rd arg 0 means it is disabled # pyright: ignore[reportAttributeAccessIssue]
+        ch_map = self._disable_unused_channels()
+
+        # reset state from any previous run on this unit
+        self.sample_count = 0
+        self.auto_stop = False
+        self.stop_event.clear()
+        self.dropped_samples = 0
+        self.overflow_counts = {'A': 0, 'B': 0}
+        self._first_chunk = None
+        self.metrics.reset()
 
-        # allocate memory for enable channels only
-        buffer_size = 1000
+        # allocate memory for enable channels only, driver buffers sized from the sample rate
+        buffer_size, poll_s = self._plan_streaming(sample_interval_ns)
+        self.driver_buffer_size, self.poll_period_s = buffer_size, poll_s
+        self.disk_dir = disk_dir
+        self.record = record
+        unbounded = disk_dir is not None or not record # only in-memory recording stops at max_samples
+        if disk_dir is not None and not os.path.exists(disk_dir):
+            os.makedirs(disk_dir)
         
+        self.buffers_raw = {'A': None, 'B': None}
         if self.enabled_channels['A']:
-            self.buffers_raw['A'] = np.zeros(shape=self.max_samples, dtype=np.int16) # pyright: ignore[reportArgumentType, reportAttributeAccessIssue]
+            self.buffers_raw['A'] = self._allocate_storage('A') # pyright: ignore[reportArgumentType, reportAttributeAccessIssue]
             self.temp_buffer_a = np.zeros(shape=buffer_size, dtype=np.int16)
-            ps.ps2000aSetDataBuffers(self.chandle, ch_map['A'], # pyright: ignore[reportAttributeAccessIssue]
+            self.ps.ps2000aSetDataBuffers(self.chandle, ch_map['A'], # pyright: ignore[reportAttributeAccessIssue]
                                     self.temp_buffer_a.ctypes.data_as(ctypes.POINTER(ctypes.c_int16)),
-                                    None, buffer_size, 0, ps.PS2000A_RATIO_MODE['PS2000A_RATIO_MODE_NONE']) # pyright: ignore[reportAttributeAccessIssue]
+                                    None, buffer_size, 0, self.ps.PS2000A_RATIO_MODE['PS2000A_RATIO_MODE_NONE']) # pyright: ignore[reportAttributeAccessIssue]
 
         if self.enabled_channels['B']:
-            self.buffers_raw['B'] = np.zeros(shape=self.max_samples, dtype=np.int16) # pyright: ignore[reportArgumentType, reportAttributeAccessIssue]
+            self.buffers_raw['B'] = self._allocate_storage('B') # pyright: ignore[reportArgumentType, reportAttributeAccessIssue]
             self.temp_buffer_b = np.zeros(shape=buffer_size, dtype=np.int16)
-            ps.ps2000aSetDataBuffers(self.chandle, ch_map['B'], # pyright: ignore[reportAttributeAccessIssue]
+            self.ps.ps2000aSetDataBuffers(self.chandle, ch_map['B'], # pyright: ignore[reportAttributeAccessIssue]
                                     self.temp_buffer_b.ctypes.data_as(ctypes.POINTER(ctypes.c_int16)),
-                                    None, buffer_size, 0, ps.PS2000A_RATIO_MODE['PS2000A_RATIO_MODE_NONE']) # pyright: ignore[reportAttributeAccessIssue]
+                                    None, buffer_size, 0, self.ps.PS2000A_RATIO_MODE['PS2000A_RATIO_MODE_NONE']) # pyright: ignore[reportAttributeAccessIssue]
 
-        # start streaming
-        cFuncPtr = ps.StreamingReadyType(self._streaming_callback) # pyright: ignore[reportAttributeAccessIssue]
-        sample_interval = ctypes.c_int32(int(sample_interval_ns / 1000))
+        # start streaming (ns units, the driver writes back the interval it actually uses)
+        cFuncPtr = self.ps.StreamingReadyType(self._streaming_callback) # pyright: ignore[reportAttributeAccessIssue]
+        sample_interval = ctypes.c_int32(int(sample_interval_ns))
+        auto_stop = 0 if unbounded else 1 # disk / pipeline-only captures run until stopped
         
-        ps.ps2000aRunStreaming(self.chandle, ctypes.byref(sample_interval), # pyright: ignore[reportAttributeAccessIssue]
-                            ps.PS2000A_TIME_UNITS['PS2000A_US'], 0, self.max_samples, # pyright: ignore[reportAttributeAccessIssue]
-                            1, 1, ps.PS2000A_RATIO_MODE['PS2000A_RATIO_MODE_NONE'], buffer_size)# pyright: ignore[reportAttributeAccessIssue]
+        self.status["runStreaming"] = self.ps.ps2000aRunStreaming(self.chandle, ctypes.byref(sample_interval), # pyright: ignore[reportAttributeAccessIssue]
+                            self.ps.PS2000A_TIME_UNITS['PS2000A_NS'], 0, self.max_samples, # pyright: ignore[reportAttributeAccessIssue]
+                            auto_stop, 1, self.ps.PS2000A_RATIO_MODE['PS2000A_RATIO_MODE_NONE'], buffer_size)# pyright: ignore[reportAttributeAccessIssue]
+        assert_pico_ok(self.status["runStreaming"])
+        self.start_time_ns = time.time_ns() # wall clock at stream start, used to align multiple units
+        sample_interval_ns = sample_interval.value
+        interval_s = sample_interval_ns / 1e9
+
+        self.pipeline = pipeline
+        if pipeline is not None:
+            pipeline.start(self._capture_meta(sample_interval_ns), [ch for ch in ['A', 'B'] if self.enabled_channels[ch]])
 
-        print("Streaming started.")
+        print(f"Streaming started. ({sample_interval_ns} ns interval, {buffer_size} sample driver buffer, {poll_s * 1000:.1f} ms poll)")
         
-        input_thread = threading.Thread(target=self._wait_for_input)
-        input_thread.daemon = True
-        input_thread.start()
+        if wait_for_input:
+            input_thread = threading.Thread(target=self._wait_for_input)
+            input_thread.daemon = True
+            input_thread.start()
 
+        status_done = threading.Event()
+        status_thread = threading.Thread(target=self._report_status, args=(status_done,))
+        status_thread.daemon = True
+        status_thread.start()
+
+        deadline = None if duration_s is None else time.perf_counter() + duration_s
         try:
-            while self.sample_count < self.max_samples and not self.auto_stop:
-                if self.stop_event.is_set():
+            while (unbounded or self.sample_count < self.max_samples) and not self.auto_stop:
+                if self.stop_event.is_set() or (deadline is not None and time.perf_counter() >= deadline):
                     break
                 
-                ps.ps2000aGetStreamingLatestValues(self.chandle, cFuncPtr, None)# pyright: ignore[reportAttributeAccessIssue]
-                
-                # status messages
-                if self.sample_count > 0 and self.sample_count % 5000 == 0:
-                    status_msg = f"\rSamples: {self.sample_count}"
-                    if self.enabled_channels['A'] and self.buffers_raw['A'] is not None:
-                        val_a = adc2mV(self.buffers_raw['A'][self.sample_count-1], self.channel_ranges['A'], self.max_adc)
-                        status_msg += f" | ChA: {val_a:.1f} mV"
-                    if self.enabled_channels['B'] and self.buffers_raw['B'] is not None:
-                        val_b = adc2mV(self.buffers_raw['B'][self.sample_count-1], self.channel_ranges['B'], self.max_adc)
-                        status_msg += f" | ChB: {val_b:.1f} mV"
-                    print(status_msg, end="")
+                # drain the driver back-to-back while it has data, only idle when it's empty
+                t0 = time.perf_counter()
+                self._chunk_ready = False
+                self.ps.ps2000aGetStreamingLatestValues(self.chandle, cFuncPtr, None)# pyright: ignore[reportAttributeAccessIssue]
+                self._track_gaps(interval_s, unbounded)
+                self.metrics.observe('poll_seconds', time.perf_counter() - t0)
                 
-                time.sleep(0.01)
+                if not self._chunk_ready:
+                    self.metrics.count('poll_idle_waits')
+                    self.stop_event.wait(poll_s)
 
         except KeyboardInterrupt:
             print("\n!!! INTERRUPT DETECTED !!! performing emergency save...")
             self.stop_event.set()
+        finally:
+            status_done.set()
             
-        print("\nStopping capture...")
-        ps.ps2000aStop(self.chandle) # pyright: ignore[reportAttributeAccessIssue]
+        print(self._status_message())
+        print("Stopping capture...")
+        self.ps.ps2000aStop(self.chandle) # pyright: ignore[reportAttributeAccessIssue]
+        if pipeline is not None:
+            pipeline.close()
+            self.pipeline = None
+        if self.dropped_samples:
+            print(f"Warning: ~{self.dropped_samples} samples were lost to driver buffer overruns (gaps in the data).")
+        for ch, count in self.overflow_counts.items():
+            if count:
+                print(f"Warning: Ch{ch} went over range in {count} chunks - consider a larger voltage range.")
+        self._record_capture_gauges(sample_interval_ns)
+        if disk_dir is not None:
+            self._finalize_disk_capture(sample_interval_ns)
+            self.save_metrics(disk_dir)
         self._process_data(sample_interval_ns)
 
+    def _record_capture_gauges(self, sample_interval_ns):
+        m = self.metrics
+        m.gauge('samples', self.sample_count)
+        m.gauge('dropped_samples', self.dropped_samples)
+        m.gauge('sample_interval_ns', sample_interval_ns)
+        m.gauge('driver_buffer_samples', self.driver_buffer_size)
+        m.gauge('poll_period_seconds', self.poll_period_s)
+        for ch, count in self.overflow_counts.items():
+            if self.enabled_channels[ch]:
+                m.gauge('overflow_chunks', count, channel=ch)
+
+    def save_metrics(self, directory="results", fmt='json'):
+        """Writes the capture / export metrics as metrics.json ('json') or metrics.prom ('prom')."""
+        path = self.metrics.save(directory, fmt)
+        print(f"Metrics saved to: {path}")
+        return path
+
+    def run_triggered_capture(self, trigger, directory, sample_interval_ns=1_000_000, pre_s=0.001, post_s=0.01,
+                              rearm=True, max_events=None, pipeline=None, wait_for_input=True):
+        """
+        Streams until stopped, but only keeps short event records around trigger points.
+        Memory and disk use are set by the event size (pre_s + post_s), not the session length.
+        :param trigger: A condition from pico_trigger (EdgeTrigger, LevelTrigger, WindowTrigger, PulseWidthTrigger).
+        :param directory: Events are saved to directory/event_0001/, event_0002/, ...
+        :param pre_s, post_s: Seconds kept before / after each trigger point.
+        :param rearm: Keep triggering after the first event.
+        :param max_events: Stop the capture after this many events (None = run until 'done' / Ctrl+C).
+        :param pipeline: Optional pipeline with extra stages (e.g. OnlineAnalytics) to run alongside.
+        :return: List of saved event folders.
+        """
+        pipeline = pipeline or CapturePipeline()
+        recorder = pipeline.subscribe(TriggeredRecorder(trigger, directory, pre_s, post_s, rearm, max_events,
+                                                        on_done=self.stop_event.set))
+        self.run_capture(sample_interval_ns=sample_interval_ns, wait_for_input=wait_for_input,
+                         pipeline=pipeline, record=False)
+        return recorder.events
+
+    def _disable_unused_channels(self):
+        """Disables channels that weren't set up (prevents driver errors). Returns {'A': enum, 'B': enum}."""
+        ch_map = {'A': self.ps.PS2000A_CHANNEL['PS2000A_CHANNEL_A'], 'B': self.ps.PS2000A_CHANNEL['PS2000A_CHANNEL_B']} # pyright: ignore[reportAttributeAccessIssue]
+        for ch, enabled in self.enabled_channels.items():
+            if not enabled:
+                self.ps.ps2000aSetChannel(self.chandle, ch_map[ch], 0, 0, 0, 0) # 3rd arg 0 means it is disabled # pyright: ignore[reportAttributeAccessIssue]
+        return ch_map
+
+    def run_rapid_block(self, segments, pre_samples, post_samples, sample_interval_ns=8, trigger_channel='A',
+                        trigger_mv=0.0, direction='rising', auto_trigger_ms=0, timeout_s=10.0):
+        """
+        Captures `segments` triggered bursts at the scope's full block-mode sample rate (rapid block).
+        Streaming is limited by USB bandwidth; here every burst goes into the scope's own memory,
+        split into one segment per trigger, and the scope re-arms in hardware between them.
+        When all segments are in, they are read back with one bulk transfer into a preallocated
+        (segments, samples) int16 array per channel.
+        :param pre_samples, post_samples: Samples kept before / after each trigger point.
+        :param sample_interval_ns: Requested interval; the fastest timebase at or above it is used
+                                   (2 ns with one channel, 4 ns with two on a 2206B).
+        :param direction: 'rising', 'falling', 'either', 'above' or 'below'.
+        :param auto_trigger_ms: Trigger anyway after this long without an event (0 = wait forever).
+        :param timeout_s: Give up waiting after this long (also stops on stop_event); the segments
+                          captured so far are kept.
+        :return: self.segments - {'A': int16 array (segments captured, pre_samples + post_samples)}.
+        """
+        enabled = [ch for ch in ['A', 'B'] if self.enabled_channels[ch]]
+        if not enabled:
+            print("Error: No channels setup! Call setup_channel() first.")
+            return
+        if trigger_channel not in enabled:
+            raise ValueError(f"Trigger channel {trigger_channel} is not set up")
+        directions = {'rising': 'PS2000A_RISING', 'falling': 'PS2000A_FALLING', 'either': 'PS2000A_RISING_OR_FALLING',
+                      'above': 'PS2000A_ABOVE', 'below': 'PS2000A_BELOW'}
+        if direction not in directions:
+            raise ValueError(f"direction must be one of {list(directions)}")
+        ch_map = self._disable_unused_channels()
+        self.stop_event.clear()
+        self.overflow_counts = {'A': 0, 'B': 0}
+        self.metrics.reset()
+        n = pre_samples + post_samples
+
+        # segmented memory: the scope's buffer is divided evenly between the segments
+        max_per_segment = ctypes.c_int32()
+        assert_pico_ok(self.ps.ps2000aMemorySegments(self.chandle, segments, ctypes.byref(max_per_segment))) # pyright: ignore[reportAttributeAccessIssue]
+        if n > max_per_segment.value:
+            raise ValueError(f"{n} samples per segment don't fit - {segments} segments leave {max_per_segment.value} each")
+        assert_pico_ok(self.ps.ps2000aSetNoOfCaptures(self.chandle, segments)) # pyright: ignore[reportAttributeAccessIssue]
+        timebase, interval_ns = self._block_timebase(sample_interval_ns, n)
+
+        threshold = int(round(trigger_mv / self._mv_per_count(trigger_channel)))
+        assert_pico_ok(self.ps.ps2000aSetSimpleTrigger( # pyright: ignore[reportAttributeAccessIssue]
+            self.chandle, 1, ch_map[trigger_channel], threshold,
+            self.ps.PS2000A_THRESHOLD_DIRECTION[directions[direction]], 0, int(auto_trigger_ms))) # pyright: ignore[reportAttributeAccessIssue]
+
+        t0 = time.perf_counter()
+        assert_pico_ok(self.ps.ps2000aRunBlock(self.chandle, pre_samples, post_samples, timebase, 0, # pyright: ignore[reportAttributeAccessIssue]
+                                               None, 0, None, None))
+        print(f"Rapid block armed: {segments} segments of {n} samples at {interval_ns:g} ns "
+              f"({trigger_channel} {direction} through {trigger_mv} mV)")
+
+        ready = ctypes.c_int16(0)
+        while True:
+            self.ps.ps2000aIsReady(self.chandle, ctypes.byref(ready)) # pyright: ignore[reportAttributeAccessIssue]
+            if ready.value or self.stop_event.is_set() or time.perf_counter() - t0 > timeout_s:
+                break
+            self.stop_event.wait(BLOCK_POLL_S)
+        self.metrics.observe('block_wait_seconds', time.perf_counter() - t0)
+
+        captured = segments
+        if not ready.value:
+            self.ps.ps2000aStop(self.chandle) # pyright: ignore[reportAttributeAccessIssue]
+            count = ctypes.c_uint32()
+            assert_pico_ok(self.ps.ps2000aGetNoOfCaptures(self.chandle, ctypes.byref(count))) # pyright: ignore[reportAttributeAccessIssue]
+            captured = count.value
+            print(f"Warning: only {captured} of {segments} segments triggered before the capture was stopped.")
+
+        # one (segments, samples) array per channel; each row is registered as that segment's buffer
+        self.segments = {ch: np.zeros((captured, n), dtype=np.int16) for ch in enabled}
+        self.trigger_offsets_s = np.zeros(captured)
+        self.pre_trigger_samples = pre_samples
+        self.segment_interval_ns = interval_ns
+        if captured:
+            self._read_segments(captured, n, ch_map)
+        self.ps.ps2000aStop(self.chandle) # pyright: ignore[reportAttributeAccessIssue]
+
+        self.metrics.gauge('segments', captured)
+        self.metrics.gauge('segment_samples', n)
+        self.metrics.gauge('sample_interval_ns', interval_ns)
+        for ch, count in self.overflow_counts.items():
+            if count:
+                print(f"Warning: Ch{ch} went over range in {count} segments - consider a larger voltage range.")
+        print(f"Captured {captured} segments in {time.perf_counter() - t0:.3f} s.")
+        return self.segments
+
+    def _block_timebase(self, sample_interval_ns, n_samples):
+        """Fastest valid timebase at or above the requested interval. Returns (timebase, actual interval ns)."""
+        interval = ctypes.c_float()
+        max_samples = ctypes.c_int32()
+        first = timebase_for_interval(sample_interval_ns)
+        for timebase in range(first, first + 8): # e.g. the fastest timebase needs a single channel
+            status = self.ps.ps2000aGetTimebase2(self.chandle, timebase, n_samples, ctypes.byref(interval), 0, # pyright: ignore[reportAttributeAccessIssue]
+                                                 ctypes.byref(max_samples), 0)
+            if status == 0:
+                return timebase, interval.value
+        raise ValueError(f"No valid timebase near {sample_interval_ns} ns for {n_samples} samples per segment")
+
+    def _read_segments(self, captured, n, ch_map):
+        """Registers each segment's row as its driver buffer, then fetches every segment in one bulk call."""
+        t0 = time.perf_counter()
+        mode = self.ps.PS2000A_RATIO_MODE['PS2000A_RATIO_MODE_NONE'] # pyright: ignore[reportAttributeAccessIssue]
+        for ch, array in self.segments.items():
+            for seg in range(captured):
+                assert_pico_ok(self.ps.ps2000aSetDataBuffers(self.chandle, ch_map[ch], # pyright: ignore[reportAttributeAccessIssue]
+                                                             array[seg].ctypes.data_as(ctypes.POINTER(ctypes.c_int16)),
+                                                             None, n, seg, mode))
+
+        n_samples = ctypes.c_uint32(n)
+        overflow = (ctypes.c_int16 * captured)()
+        assert_pico_ok(self.ps.ps2000aGetValuesBulk(self.chandle, ctypes.byref(n_samples), 0, captured - 1, # pyright: ignore[reportAttributeAccessIssue]
+                                                    1, mode, ctypes.byref(overflow)))
+        flags = np.frombuffer(overflow, dtype=np.int16)
+        self.overflow_counts = {'A': int(np.count_nonzero(flags & 1)), 'B': int(np.count_nonzero(flags & 2))}
+
+        times = (ctypes.c_int64 * captured)()
+        units = (ctypes.c_int32 * captured)()
+        status = self.ps.ps2000aGetValuesTriggerTimeOffsetBulk64(self.chandle, ctypes.byref(times), ctypes.byref(units), # pyright: ignore[reportAttributeAccessIssue]
+                                                                 0, captured - 1)
+        if status == 0:
+            self.trigger_offsets_s = np.frombuffer(times, dtype=np.int64) * np.take(TIME_UNIT_S, np.frombuffer(units, dtype=np.int32))
+        self.metrics.observe('bulk_read_seconds', time.perf_counter() - t0)
+
+    def segment_time(self, index=None):
+        """Time axis (s) of a segment relative to its trigger point (with its sub-sample offset if index is given)."""
+        n = next(iter(self.segments.values())).shape[1]
+        t = (np.arange(n) - self.pre_trigger_samples) * (self.segment_interval_ns / 1e9) # pyright: ignore[reportOptionalOperand]
+        return t if index is None else t - self.trigger_offsets_s[index]
+
+    def segment_mv(self, channel, index):
+        """One segment of one channel in mV."""
+        return self.segments[channel][index] * self._mv_per_count(channel)
+
+    def save_segments(self, name="rapid_block", directory="results"):
+        """
+        Saves the rapid block segments as directory/name/ (segA.npy, segB.npy - 2-D int16 -
+        trigger_offsets.npy and capture.json). Reopen with load_capture() or pico_storage.open_capture().
+        """
+        if not len(self.trigger_offsets_s): # a capture where nothing triggered still has (0, n) arrays
+            print("No segments to save.")
+            return
+        path = os.path.join(directory, name)
+        if not os.path.exists(path):
+            os.makedirs(path)
+        files = {}
+        for ch, array in self.segments.items():
+            files[ch] = f"seg{ch}.npy"
+            np.save(os.path.join(path, files[ch]), array)
+        np.save(os.path.join(path, "trigger_offsets.npy"), self.trigger_offsets_s)
+        write_meta(path, dict(self._capture_meta(self.segment_interval_ns), mode='rapid_block',
+                              segments=len(self.trigger_offsets_s), sample_count=next(iter(self.segments.values())).shape[1],
+                              pre_trigger_samples=self.pre_trigger_samples, dtype='int16', files=files,
+                              trigger_offsets="trigger_offsets.npy"))
+        print(f"Segments saved to: {path}")
+        return path
+
+    def _allocate_storage(self, channel):
+        """Returns the destination for a channel: a RAM buffer, a growable file in disk mode, or None."""
+        if not self.record:
+            return None
+        if self.disk_dir is None:
+            return np.zeros(shape=self.max_samples, dtype=np.int16)
+        return GrowableMemmap(os.path.join(self.disk_dir, f"ch{channel}.bin"))
+
+    def _latest_raw(self, channel):
+        """Most recent raw ADC value for a channel (status messages only)."""
+        buf = self.buffers_raw[channel]
+        if self.disk_dir is not None:
+            buf = buf._map # pyright: ignore[reportOptionalMemberAccess]
+        return int(buf[self.sample_count-1]) # pyright: ignore[reportOptionalSubscript]
+
+    def _mv_per_count(self, channel):
+        """Scale factor from raw ADC counts to mV for a configured channel."""
+        return CHANNEL_INPUT_RANGES_MV[self.channel_ranges[channel]] / self.max_adc.value
+
+    def _finalize_disk_capture(self, sample_interval_ns):
+        """Trims the channel files, writes the sidecar and swaps in read-only memmap views."""
+        files = {}
+        for ch in ['A', 'B']:
+            if self.enabled_channels[ch] and self.buffers_raw[ch] is not None:
+                writer = self.buffers_raw[ch]
+                writer.close() # pyright: ignore[reportOptionalMemberAccess]
+                files[ch] = os.path.basename(writer.path) # pyright: ignore[reportOptionalMemberAccess]
+                self.buffers_raw[ch] = writer.view() # pyright: ignore[reportOptionalMemberAccess]
+
+        write_meta(self.disk_dir, dict(self._capture_meta(sample_interval_ns),
+                                       sample_count=self.sample_count, dtype='int16', files=files))
+        print(f"Capture written to: {self.disk_dir} ({self.sample_count} samples per channel)")
+
+    def _capture_meta(self, sample_interval_ns):
+        """Metadata needed to turn raw ADC counts back into mV and seconds."""
+        return {
+            'sample_interval_ns': sample_interval_ns,
+            'max_adc': self.max_adc.value,
+            'channel_ranges': {ch: int(self.channel_ranges[ch]) for ch in ['A', 'B'] if self.enabled_channels[ch]},
+        }
+
+    def _raw_channels(self):
+        """Raw int16 data for each enabled channel, trimmed to the captured length."""
+        return {ch: self.data_mv[ch].raw for ch in ['A', 'B']
+                if self.enabled_channels[ch] and isinstance(self.data_mv[ch], ScaledChannel)}
+
     def _process_data(self, sample_interval_ns):
-        """Converts raw ADC data to mV and time arrays for enabled channels."""
-        end_idx = self.sample_count
+        """
+        Wraps the raw ADC buffers in lazy mV / time views for enabled channels.
+        Nothing is converted here: data_mv['A'][i:j] and data_mv['Time'][i:j] convert
+        only that window, so captures of any length stay at their int16 footprint.
+        """
+        end_idx = self.sample_count if self.record else 0
         
-        if self.enabled_channels['A'] and self.buffers_raw['A'] is not None:
-            self.data_mv['A'] = adc2mV(self.buffers_raw['A'][:end_idx], self.channel_ranges['A'], self.max_adc)
-            
-        if self.enabled_channels['B'] and self.buffers_raw['B'] is not None:
-            self.data_mv['B'] = adc2mV(self.buffers_raw['B'][:end_idx], self.channel_ranges['B'], self.max_adc)
+        for ch in ['A', 'B']:
+            self.data_mv[ch] = np.array([])
+            if self.enabled_channels[ch] and self.buffers_raw[ch] is not None:
+                self.data_mv[ch] = ScaledChannel(self.buffers_raw[ch][:end_idx], # pyright: ignore[reportOptionalSubscript]
+                                                 CHANNEL_INPUT_RANGES_MV[self.channel_ranges[ch]],
+                                                 self.max_adc.value)
         
-        total_time = (end_idx * sample_interval_ns) / 1e9
-        self.data_mv['Time'] = np.linspace(0, total_time, end_idx)
+        self.data_mv['Time'] = TimeBase(0.0, sample_interval_ns / 1e9, end_idx)
+        self.sample_interval_ns = sample_interval_ns
+        self.pyramids = {}
+
+    def load_capture(self, directory):
+        """
+        Reopens a saved capture (a run_capture disk_dir, an npy export or save_segments() output) so it can be saved,
+        exported or plotted again. No scope needs to be connected.
+        """
+        meta, channels = open_capture(directory)
+        self.max_adc = ctypes.c_int16(meta['max_adc'])
+        if meta.get('mode') == 'rapid_block':
+            for ch in ['A', 'B']:
+                self.enabled_channels[ch] = ch in channels
+                if ch in channels:
+                    self.channel_ranges[ch] = meta['channel_ranges'][ch]
+            self.segments = channels
+            self.trigger_offsets_s = np.load(os.path.join(directory, meta['trigger_offsets']))
+            self.pre_trigger_samples = meta['pre_trigger_samples']
+            self.segment_interval_ns = meta['sample_interval_ns']
+            return meta
+        for ch in ['A', 'B']:
+            self.enabled_channels[ch] = ch in channels
+            self.buffers_raw[ch] = channels.get(ch)
+            if ch in channels:
+                self.channel_ranges[ch] = meta['channel_ranges'][ch]
+        self.sample_count = meta['sample_count']
+        self.record = True
+        self._process_data(meta['sample_interval_ns'])
+        return meta
 
-    def save_to_csv(self, filename="data.csv", directory="results"):
-        """Saves enabled channels to CSV."""
-        if self.data_mv['Time'] is None:
+    def _window(self, t_start, t_end):
+        """Sample slice for a time window in seconds (None = start/end of capture)."""
+        if not isinstance(self.data_mv['Time'], TimeBase):
+            return slice(0, 0)
+        return self.data_mv['Time'].window(t_start, t_end)
+
+    def save_to_csv(self, filename="data.csv", directory="results", t_start=None, t_end=None):
+        """
+        Saves enabled channels to CSV.
+        :param t_start, t_end: Optional time window in seconds; defaults to the whole capture.
+        """
+        window = self._window(t_start, t_end)
+        if window.stop == window.start or not self._raw_channels():
             print("No data to save.")
             return
 
@@ -228,20 +701,74 @@ class PicoStreamer:
         if not filepath.endswith(".csv"):
             filepath += ".csv"
             
-        # build Pandas DataFrame dynamically
-        data_dict = {'Time_Sec': self.data_mv['Time']}
-        if self.enabled_channels['A'] and self.data_mv['A'] is not None:
-            data_dict['ChA_mV'] = self.data_mv['A']
-        if self.enabled_channels['B'] and self.data_mv['B'] is not None:
-            data_dict['ChB_mV'] = self.data_mv['B']
-            
-        df = pd.DataFrame(data_dict)
-        df.to_csv(filepath, index=False)
+        # streamed straight from the raw buffers, one chunk at a time
+        result = export_csv(filepath, self._raw_channels(), self._capture_meta(self.sample_interval_ns),
+                            start=window.start, stop=window.stop)
+        self._record_export(result)
         print(f"Data saved to: {filepath}")
 
-    def plot_data(self, filename="data.png", directory="results", title="PicoScope Capture"):
-        """Plots enabled channels."""
-        if self.data_mv['Time'] is None:
+    def save_binary(self, name="data", directory="results", fmt="npy", t_start=None, t_end=None):
+        """
+        Saves the raw int16 samples in a binary format (much smaller and faster than CSV).
+        :param fmt: 'npy' (folder of .npy + capture.json), 'parquet' or 'hdf5'.
+        :param t_start, t_end: Optional time window in seconds; defaults to the whole capture.
+                               The export's time base starts at its first sample, and the
+                               window start is kept in the metadata as window_start_s.
+        :return: Dict with the bytes written, seconds taken and MB/s.
+        """
+        window = self._window(t_start, t_end)
+        raw = {ch: data[window] for ch, data in self._raw_channels().items()}
+        if window.stop == window.start or not raw:
+            print("No data to save.")
+            return
+        meta = self._capture_meta(self.sample_interval_ns)
+        if window.start:
+            meta['window_start_s'] = window.start * self.sample_interval_ns / 1e9
+
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+
+        extension = {'npy': '', 'parquet': '.parquet', 'hdf5': '.h5'}
+        if fmt not in extension:
+            raise ValueError(f"Unknown format '{fmt}' - use one of {list(extension)}")
+        path = os.path.join(directory, name + extension[fmt])
+        result = EXPORTERS[fmt](path, raw, meta)
+        self._record_export(result)
+        return result
+
+    def _record_export(self, result):
+        self.metrics.observe('export_seconds', result['seconds'], format=result['format'])
+        self.metrics.count('export_bytes', result['bytes'], format=result['format'])
+
+    def build_plot_pyramids(self):
+        """
+        Precomputes multi-resolution min/max summaries of each channel.
+        Optional: plot_data() works without them, but with them zoomed re-plots of any
+        time window only read the small matching level instead of the raw samples.
+        """
+        for ch, raw in self._raw_channels().items():
+            self.pyramids[ch] = MinMaxPyramid(raw)
+
+    def _plot_envelope(self, channel, window, n_bins):
+        """Decimated (time_s, mV) polyline for a channel over a sample window."""
+        if channel in self.pyramids:
+            idx, mins, maxs = self.pyramids[channel].envelope(n_bins, window.start, window.stop)
+        else:
+            idx, mins, maxs = minmax_envelope(self.data_mv[channel].raw, n_bins, window.start, window.stop)
+        x, y = interleave(idx, mins, maxs)
+        return self.data_mv['Time'][x], y * self.data_mv[channel].scale
+
+    def plot_data(self, filename="data.png", directory="results", title="PicoScope Capture", t_start=None, t_end=None,
+                  show=True):
+        """
+        Plots enabled channels.
+        Each pixel column is drawn as the min/max of the samples under it, so plot time
+        depends on the figure width rather than the capture length.
+        :param t_start, t_end: Optional time window in seconds; defaults to the whole capture.
+        :param show: Open a plot window after saving (False for scripted / CI runs).
+        """
+        window = self._window(t_start, t_end)
+        if window.stop == window.start:
             print("No data to plot.")
             return
         
@@ -252,13 +779,16 @@ class PicoStreamer:
         if not filepath.endswith(".png"):
             filepath += ".png"
             
-        plt.figure(figsize=(10, 6))
+        import matplotlib.pyplot as plt # only plotting pays for the matplotlib import
+
+        fig = plt.figure(figsize=(10, 6))
+        n_bins = int(fig.get_figwidth() * fig.dpi)
         
-        if self.enabled_channels['A'] and self.data_mv['A'] is not None:
-            plt.plot(self.data_mv['Time'], self.data_mv['A'], label="Ch A", color='blue')
+        if self.enabled_channels['A'] and isinstance(self.data_mv['A'], ScaledChannel):
+            plt.plot(*self._plot_envelope('A', window, n_bins), label="Ch A", color='blue')
             
-        if self.enabled_channels['B'] and self.data_mv['B'] is not None:
-            plt.plot(self.data_mv['Time'], self.data_mv['B'], label="Ch B", color='orange', alpha=0.7)
+        if self.enabled_channels['B'] and isinstance(self.data_mv['B'], ScaledChannel):
+            plt.plot(*self._plot_envelope('B', window, n_bins), label="Ch B", color='orange', alpha=0.7)
             
         plt.xlabel("Time (s)")
         plt.ylabel("Voltage (mV)")
@@ -266,6 +796,10 @@ class PicoStreamer:
         plt.legend()
         plt.grid(True)
         plt.savefig(filepath)
+        print(f"Plot saved to: {filepath}")
+        if not show:
+            plt.close(fig)
+            return
         try:
             plt.show()
         except Exception as e:
@@ -276,7 +810,7 @@ class PicoStreamer:
     def close_unit(self):
         """Clean up connection."""
         if self.is_open:
-            ps.ps2000aStop(self.chandle) # pyright: ignore[reportAttributeAccessIssue]
-            ps.ps2000aCloseUnit(self.chandle) # pyright: ignore[reportAttributeAccessIssue]
+            self.ps.ps2000aStop(self.chandle) # pyright: ignore[reportAttributeAccessIssue]
+            self.ps.ps2000aCloseUnit(self.chandle) # pyright: ignore[reportAttributeAccessIssue]
             self.is_open = False
             print("PicoScope connection closed.")
\ No newline at end of file
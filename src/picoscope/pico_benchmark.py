@@ -0,0 +1,100 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+from pico_base import PicoStreamer
+from pico_driver import SimulatedPs2000a
+
+"""
+Capture-throughput benchmarks for PicoStreamer, run against the simulated ps2000a driver.
+No hardware needed. Measures, per sample interval:
+    - sustained samples/s through run_capture
+    - _streaming_callback latency (median / p99 / max)
+    - samples dropped because the driver buffer overran
+
+Usage:
+    python pico_benchmark.py                      # default interval sweep, real-time pacing
+    python pico_benchmark.py --free-run           # driver delivers as fast as it is polled
+    python pico_benchmark.py --json bench.json    # save results to compare against later runs
+"""
+
+DEFAULT_INTERVALS_NS = [1_000_000, 100_000, 10_000, 1_000, 500, 200, 100]
+
+
+class TimedStreamer(PicoStreamer):
+    """PicoStreamer that records how long each streaming callback takes."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.callback_ns = []
+
+    def _streaming_callback(self, *args):
+        t0 = time.perf_counter_ns()
+        super()._streaming_callback(*args)
+        self.callback_ns.append(time.perf_counter_ns() - t0)
+
+
+def bench_capture(sample_interval_ns, duration_s, channels=('A', 'B'), free_run=False):
+    """Runs one simulated capture and returns its throughput numbers."""
+    n_samples = max(int(duration_s * 1e9 / sample_interval_ns), 1)
+    sim = SimulatedPs2000a(speed=None if free_run else 1.0)
+
+    with TimedStreamer(max_samples=n_samples, driver=sim) as scope:
+        for ch in channels:
+            scope.setup_channel(ch, voltage_range='10V')
+
+        t0 = time.perf_counter()
+        scope.run_capture(sample_interval_ns=sample_interval_ns, wait_for_input=False)
+        wall_s = time.perf_counter() - t0
+
+        latencies = np.array(scope.callback_ns or [0]) / 1e3
+        return {
+            'sample_interval_ns': sample_interval_ns,
+            'channels': len(channels),
+            'free_run': free_run,
+            'samples': scope.sample_count,
+            'wall_s': wall_s,
+            'samples_per_s': scope.sample_count / wall_s if wall_s else 0.0,
+            'callbacks': len(scope.callback_ns),
+            'callback_us_median': float(np.median(latencies)),
+            'callback_us_p99': float(np.percentile(latencies, 99)),
+            'callback_us_max': float(latencies.max()),
+            'dropped_samples': sim.dropped_samples,
+            'detected_dropped': scope.dropped_samples,
+            'driver_buffer': scope.driver_buffer_size,
+            'poll_ms': scope.poll_period_s * 1000,
+        }
+
+
+def print_table(results):
+    print(f"\n{'interval':>12} {'buffer':>9} {'samples/s':>14} {'cb med us':>10} {'cb p99 us':>10} {'cb max us':>10} "
+          f"{'dropped':>10} {'detected':>10}")
+    for r in results:
+        print(f"{r['sample_interval_ns']:>10}ns {r['driver_buffer']:>9} {r['samples_per_s']:>14,.0f} {r['callback_us_median']:>10.1f} "
+              f"{r['callback_us_p99']:>10.1f} {r['callback_us_max']:>10.1f} {r['dropped_samples']:>10} {r['detected_dropped']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the PicoStreamer streaming hot path on the simulator.")
+    parser.add_argument('--intervals', type=int, nargs='+', default=DEFAULT_INTERVALS_NS,
+                        help="Sample intervals to sweep, in ns")
+    parser.add_argument('--duration', type=float, default=2.0, help="Seconds of signal per run")
+    parser.add_argument('--channels', default='AB', help="Channels to enable, e.g. A or AB")
+    parser.add_argument('--free-run', action='store_true', help="Deliver samples as fast as they are polled")
+    parser.add_argument('--json', help="Write results to this file")
+    args = parser.parse_args()
+
+    results = [bench_capture(ns, args.duration, tuple(args.channels.upper()), args.free_run)
+               for ns in args.intervals]
+    print_table(results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,7 @@ def main():
         
         # Start Capture
         # This will block until you type "done" or hit Ctrl+C
+        # For long soak tests pass disk_dir="results/soak_01" to stream to disk with no sample cap
         scope.run_capture(sample_interval_ns=SAMPLE_INTERVAL_NS)
         
         # Save Data
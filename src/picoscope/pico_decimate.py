@@ -0,0 +1,120 @@
+import numpy as np
+
+"""
+Min/max decimation for plotting long PicoScope traces.
+
+A PNG ~1000 px wide can only show ~1000 columns, so instead of handing matplotlib every
+sample we reduce each pixel column to the min and max of the raw int16 samples that fall
+in it. Spikes and glitches stay visible, and plot time scales with pixels, not capture length.
+
+MinMaxPyramid precomputes the same reduction at several resolutions so zoomed re-plots
+of a time window only touch the (much smaller) level that matches the zoom.
+"""
+
+BLOCK_BINS = 65_536 # bins reduced per numpy call, bounds temporary memory on huge memmaps
+
+
+def _reduce(mins, maxs, start, stop, bin_size):
+    """Min/max of consecutive `bin_size` groups of two equal-length arrays over [start, stop)."""
+    n = stop - start
+    n_full = n // bin_size
+    out_min = []
+    out_max = []
+
+    block = BLOCK_BINS * bin_size
+    for a in range(start, start + n_full * bin_size, block):
+        b = min(a + block, start + n_full * bin_size)
+        out_min.append(mins[a:b].reshape(-1, bin_size).min(axis=1))
+        out_max.append(maxs[a:b].reshape(-1, bin_size).max(axis=1))
+
+    tail = start + n_full * bin_size
+    if tail < stop:
+        out_min.append(np.array([mins[tail:stop].min()]))
+        out_max.append(np.array([maxs[tail:stop].max()]))
+
+    if not out_min:
+        return np.zeros(0, dtype=mins.dtype), np.zeros(0, dtype=maxs.dtype)
+    return np.concatenate(out_min), np.concatenate(out_max)
+
+
+def minmax_envelope(raw, n_bins, start=0, stop=None):
+    """
+    Reduces raw[start:stop] to at most n_bins (min, max) pairs.
+    :return: (bin_start_indices, mins, maxs); indices are absolute sample positions.
+             If the window already fits in n_bins the samples are returned as-is.
+    """
+    stop = len(raw) if stop is None else stop
+    n = stop - start
+    if n <= n_bins:
+        window = np.asarray(raw[start:stop])
+        return np.arange(start, stop), window, window
+
+    bin_size = -(-n // n_bins)
+    mins, maxs = _reduce(raw, raw, start, stop, bin_size)
+    return start + np.arange(len(mins)) * bin_size, mins, maxs
+
+
+class MinMaxPyramid:
+    """
+    Multi-resolution min/max summary of one raw channel.
+    Level k holds one (min, max) pair per base_bin * factor**k samples.
+    Memory is roughly 2 * len(raw) / base_bin int16 values in total.
+    """
+
+    def __init__(self, raw, base_bin=64, factor=8, min_bins=1024):
+        self.raw = raw
+        self.bin_sizes = []
+        self.levels = [] # list of (mins, maxs)
+
+        mins, maxs = _reduce(raw, raw, 0, len(raw), base_bin)
+        size = base_bin
+        while True:
+            self.bin_sizes.append(size)
+            self.levels.append((mins, maxs))
+            if len(mins) < min_bins * factor:
+                break
+            mins, maxs = _reduce(mins, maxs, 0, len(mins), factor)
+            size *= factor
+
+    def envelope(self, n_bins, start=0, stop=None):
+        """
+        Same result shape as minmax_envelope(), served from the best-matching level.
+        Columns follow that level's bin edges, except the first and last, which are clipped to
+        [start, stop) so they only hold samples inside the window.
+        """
+        stop = len(self.raw) if stop is None else stop
+        per_bin = (stop - start) / max(n_bins, 1)
+
+        # coarsest level that still has at least one level-bin per output bin
+        level = -1
+        for i, size in enumerate(self.bin_sizes):
+            if size <= per_bin:
+                level = i
+        if level < 0:
+            return minmax_envelope(self.raw, n_bins, start, stop)
+
+        size = self.bin_sizes[level]
+        mins, maxs = self.levels[level]
+        lo = start // size
+        hi = min(-(-stop // size), len(mins))
+        group = max(int(per_bin // size), 1)
+        out_min, out_max = _reduce(mins, maxs, lo, hi, group)
+        idx = lo * size + np.arange(len(out_min)) * size * group
+
+        # the level bins at either end can reach past [start, stop): redo those two columns from the
+        # raw samples, so a spike just outside the window doesn't show up inside it
+        idx[0] = start
+        last = len(out_min) - 1
+        for col in {0, last}:
+            window = np.asarray(self.raw[idx[col]:stop if col == last else idx[col + 1]])
+            out_min[col], out_max[col] = window.min(), window.max()
+        return idx, out_min, out_max
+
+
+def interleave(idx, mins, maxs):
+    """Turns an envelope into one polyline (min, max per column) that plt.plot can draw."""
+    x = np.repeat(idx, 2)
+    y = np.empty(2 * len(mins), dtype=np.result_type(mins, maxs))
+    y[0::2] = mins
+    y[1::2] = maxs
+    return x, y
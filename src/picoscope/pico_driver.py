@@ -0,0 +1,481 @@
+import ctypes
+import time
+
+import numpy as np
+
+"""
+Driver layer for PicoStreamer.
+
+PicoStreamer talks to the scope through a driver object exposing the same names as
+picosdk's `ps2000a` module (ps2000aOpenUnit, PS2000A_RANGE, StreamingReadyType, ...).
+`load_driver()` returns either the real picosdk module or the in-process simulator below,
+so everything in pico_base.py can run without a physical 2206B.
+"""
+
+def assert_pico_ok(status):
+    """Same contract as picosdk.functions.assert_pico_ok."""
+    if status != PICO_OK:
+        raise RuntimeError(f"PicoSDK returned status {status}")
+
+
+# full-scale mV for each PS2000A_RANGE enum value (same table picosdk uses)
+CHANNEL_INPUT_RANGES_MV = [10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000, 50000, 100000, 200000]
+
+PICO_OK = 0
+PICO_NOT_FOUND = 3
+PICO_INVALID_HANDLE = 12
+PICO_INVALID_PARAMETER = 13
+PICO_INVALID_TIMEBASE = 14
+
+# time unit enum -> seconds (PS2000A_TIME_UNITS: fs, ps, ns, us, ms, s)
+TIME_UNIT_S = [1e-15, 1e-12, 1e-9, 1e-6, 1e-3, 1.0]
+
+
+def load_driver(driver=None, serial=None):
+    """
+    Resolves the driver PicoStreamer should use.
+    :param driver: None or 'picosdk' for real hardware, 'sim' for the simulator,
+                   or an already-built driver object (e.g. a configured SimulatedPs2000a).
+    :param serial: With 'sim', the serial number the simulated unit reports.
+    """
+    if driver is None or driver == 'picosdk':
+        # imported on demand: picosdk loads the native driver library, which simulator runs don't need
+        try:
+            from picosdk.ps2000a import ps2000a
+        except ImportError:
+            raise SystemExit("Error importing picosdk - Did you run setup.sh? (or use driver='sim')")
+        return ps2000a
+    if driver == 'sim':
+        return SimulatedPs2000a() if serial is None else SimulatedPs2000a(serial=serial)
+    return driver
+
+
+def timebase_for_interval(interval_ns):
+    """
+    Fastest block-mode timebase of a 500 MS/s ps2000a (2206B / 2207B / 2208B) whose sample
+    interval is at least interval_ns: 2, 4, 8 ns for timebases 0-2, then (n - 2) * 16 ns.
+    Confirm with ps2000aGetTimebase2 - which timebases are valid depends on the enabled channels.
+    """
+    for timebase, ns in enumerate((2, 4, 8)):
+        if interval_ns <= ns:
+            return timebase
+    return int(np.ceil(interval_ns / 16)) + 2
+
+
+def _timebase_interval_ns(timebase):
+    return 2 ** timebase * 2 if timebase < 3 else (timebase - 2) * 16
+
+
+def _deref(ref):
+    """Gets the ctypes object behind byref()/pointer() arguments."""
+    if hasattr(ref, '_obj'):
+        return ref._obj
+    return ref.contents
+
+
+def rc_charge(v_final=5.0, tau_s=2.0):
+    """Waveform: first-order RC charging curve, like the supercap boilerplate."""
+    return lambda t: v_final * (1.0 - np.exp(-t / tau_s))
+
+
+def sine(amplitude=2.0, freq_hz=1_000.0, offset=0.0):
+    """Waveform: sine wave."""
+    return lambda t: offset + amplitude * np.sin(2 * np.pi * freq_hz * t)
+
+
+class SimulatedPs2000a:
+    """
+    In-process stand-in for the ps2000a driver.
+    Generates synthetic waveforms and delivers them through the same StreamingReadyType
+    callback contract as the real driver: data is written into the registered buffers
+    as a ring (wrapping `startIndex`), `overflow` carries the per-channel over-range bits,
+    and `autoStop` is raised once maxPostTriggerSamples have been delivered.
+
+    Block / rapid block mode follows the same call sequence as the real driver
+    (MemorySegments, SetNoOfCaptures, GetTimebase2, SetSimpleTrigger, RunBlock, IsReady,
+    SetDataBuffers per segment, GetValuesBulk, GetValuesTriggerTimeOffsetBulk64). Triggers are
+    found on the noise-free waveform, with the sub-sample crossing time reported as the offset.
+    A trigger that never comes leaves the block unfinished, like on the real scope; Stop then
+    keeps the segments captured so far (GetNoOfCaptures).
+    """
+
+    PS2000A_CHANNEL = {'PS2000A_CHANNEL_A': 0, 'PS2000A_CHANNEL_B': 1}
+    PS2000A_COUPLING = {'PS2000A_AC': 0, 'PS2000A_DC': 1}
+    PS2000A_RANGE = {
+        'PS2000A_10MV': 0, 'PS2000A_20MV': 1, 'PS2000A_50MV': 2, 'PS2000A_100MV': 3,
+        'PS2000A_200MV': 4, 'PS2000A_500MV': 5, 'PS2000A_1V': 6, 'PS2000A_2V': 7,
+        'PS2000A_5V': 8, 'PS2000A_10V': 9, 'PS2000A_20V': 10, 'PS2000A_50V': 11,
+    }
+    PS2000A_TIME_UNITS = {
+        'PS2000A_FS': 0, 'PS2000A_PS': 1, 'PS2000A_NS': 2,
+        'PS2000A_US': 3, 'PS2000A_MS': 4, 'PS2000A_S': 5,
+    }
+    PS2000A_THRESHOLD_DIRECTION = {
+        'PS2000A_ABOVE': 0, 'PS2000A_BELOW': 1, 'PS2000A_RISING': 2,
+        'PS2000A_FALLING': 3, 'PS2000A_RISING_OR_FALLING': 4,
+    }
+    PS2000A_RATIO_MODE = {
+        'PS2000A_RATIO_MODE_NONE': 0, 'PS2000A_RATIO_MODE_AGGREGATE': 1,
+        'PS2000A_RATIO_MODE_DECIMATE': 2, 'PS2000A_RATIO_MODE_AVERAGE': 4,
+    }
+    StreamingReadyType = ctypes.CFUNCTYPE(None, ctypes.c_int16, ctypes.c_int32, ctypes.c_uint32,
+                                          ctypes.c_int16, ctypes.c_uint32, ctypes.c_int16,
+                                          ctypes.c_int16, ctypes.c_void_p)
+
+    _UNIT_NS = {0: 1e-6, 1: 1e-3, 2: 1.0, 3: 1e3, 4: 1e6, 5: 1e9}
+    MAX_ADC = 32767
+    MEMORY_SAMPLES = 32_000_000 # block-mode capture memory, split evenly between segments
+    MAX_SEGMENTS = 32_000
+    REARM_S = 1e-6              # dead time between rapid block segments
+    MAX_TRIGGER_SCAN = 1 << 24  # samples searched for a trigger before the block is left unfinished
+
+    def __init__(self, waveforms=None, speed=1.0, noise_counts=20.0, serial='SIM00001', seed=0):
+        """
+        :param waveforms: Dict {'A': f(t_seconds) -> volts, 'B': ...}. Defaults to an RC
+                          charging curve on A and a 1 kHz sine on B.
+        :param speed: Samples are produced at `speed` x real time. None means free-running:
+                      every poll delivers as much as the buffer can take (max-throughput tests).
+        :param noise_counts: Std-dev of Gaussian noise added to every sample, in ADC counts.
+        :param serial: Serial number reported by this simulated unit.
+        """
+        self.waveforms = waveforms or {'A': rc_charge(), 'B': sine()}
+        self.speed = speed
+        self.noise_counts = noise_counts
+        self.serial = serial
+        self.rng = np.random.default_rng(seed)
+
+        self.handle = 0
+        self.channels = {}   # ch index -> dict(enabled, range)
+        self.buffers = {}    # ch index -> np view onto the caller's buffer
+        self.streaming = False
+
+        # block / rapid block state
+        self.segment_buffers = {} # (ch index, segment) -> np view onto the caller's buffer
+        self.n_segments = 1
+        self.segment_samples = self.MEMORY_SAMPLES
+        self.n_captures = 1
+        self.trigger = None
+        self.block = None
+        self.signal_time_s = 0.0 # block captures continue along the waveform from where the last one ended
+
+        # counters for benchmarks / tests
+        self.delivered_samples = 0
+        self.dropped_samples = 0
+        self.callbacks = 0
+
+    # --- unit lifecycle ---
+
+    def ps2000aOpenUnit(self, handle_ref, serial):
+        if serial is not None:
+            if isinstance(serial, ctypes.c_char_p):
+                serial = serial.value
+            requested = serial.decode() if isinstance(serial, bytes) else str(serial)
+            if requested != self.serial:
+                return PICO_NOT_FOUND
+        self.handle = 1
+        _deref(handle_ref).value = self.handle
+        return PICO_OK
+
+    def ps2000aCloseUnit(self, handle):
+        self.streaming = False
+        self.handle = 0
+        return PICO_OK
+
+    def ps2000aMaximumValue(self, handle, value_ref):
+        _deref(value_ref).value = self.MAX_ADC
+        return PICO_OK
+
+    def ps2000aStop(self, handle):
+        self.streaming = False
+        if self.block is not None and self.block['stopped_at'] is None:
+            self.block['stopped_at'] = self._block_elapsed()
+        return PICO_OK
+
+    # --- configuration ---
+
+    def ps2000aSetChannel(self, handle, channel, enabled, coupling, range, analogOffset):
+        if self._bad_handle(handle):
+            return PICO_INVALID_HANDLE
+        self.channels[int(channel)] = {'enabled': bool(enabled), 'range': int(range)}
+        return PICO_OK
+
+    def ps2000aSetDataBuffers(self, handle, channel, bufferMax, bufferMin, bufferLth, segmentIndex, mode):
+        if self._bad_handle(handle):
+            return PICO_INVALID_HANDLE
+        view = np.ctypeslib.as_array(bufferMax, shape=(int(bufferLth),))
+        self.buffers[int(channel)] = view
+        self.segment_buffers[(int(channel), int(segmentIndex))] = view
+        return PICO_OK
+
+    # --- streaming ---
+
+    def ps2000aRunStreaming(self, handle, sampleInterval_ref, sampleIntervalTimeUnits,
+                            maxPreTriggerSamples, maxPostTriggerSamples, autoStop,
+                            downSampleRatio, downSampleRatioMode, overviewBufferSize):
+        if self._bad_handle(handle):
+            return PICO_INVALID_HANDLE
+        interval = _deref(sampleInterval_ref).value
+        self.interval_s = interval * self._UNIT_NS[int(sampleIntervalTimeUnits)] / 1e9
+        self.auto_stop = bool(autoStop)
+        self.max_samples = int(maxPreTriggerSamples) + int(maxPostTriggerSamples)
+        self.overview_size = int(overviewBufferSize)
+
+        self.ring_size = min(len(b) for b in self.buffers.values()) if self.buffers else 0
+        self.write_pos = 0
+        self.produced = 0    # samples generated (delivered + pending + dropped)
+        self.pending = 0     # generated but not yet handed to the callback
+        self.delivered_samples = 0
+        self.dropped_samples = 0
+        self.callbacks = 0
+        self.t0 = time.perf_counter()
+        self.streaming = True
+        return PICO_OK
+
+    def ps2000aGetStreamingLatestValues(self, handle, lpPs2000aReady, pParameter):
+        if self._bad_handle(handle):
+            return PICO_INVALID_HANDLE
+        if not self.streaming:
+            return PICO_OK
+
+        self._produce()
+        n = min(self.pending, self.ring_size - self.write_pos)
+        if n <= 0:
+            return PICO_OK
+
+        start = self.write_pos
+        first = self.delivered_samples + self.dropped_samples
+        overflow = self._fill(start, first, n)
+
+        self.pending -= n
+        self.delivered_samples += n
+        self.write_pos = (start + n) % self.ring_size
+        self.callbacks += 1
+
+        stop = self.auto_stop and self.produced >= self.max_samples and self.pending == 0
+        if stop:
+            self.streaming = False
+        lpPs2000aReady(handle, n, start, overflow, 0, 0, int(stop), pParameter)
+        return PICO_OK
+
+    def _produce(self):
+        """Generates the samples that are due since the last poll, dropping what overruns the driver."""
+        if self.speed is None:
+            due = self.produced + self.ring_size
+        else:
+            elapsed = (time.perf_counter() - self.t0) * self.speed
+            due = int(elapsed / self.interval_s)
+        if self.auto_stop:
+            due = min(due, self.max_samples)
+
+        new = due - self.produced
+        if new <= 0:
+            return
+        self.produced = due
+        self.pending += new
+
+        # the driver only holds overviewBufferSize samples; older ones are lost
+        if self.pending > self.overview_size:
+            self.dropped_samples += self.pending - self.overview_size
+            self.pending = self.overview_size
+
+    def _fill(self, start, first_sample, n):
+        """Writes n samples into every enabled buffer; returns the over-range bit field."""
+        t = (first_sample + np.arange(n)) * self.interval_s
+        overflow = 0
+        for ch, buf in self.buffers.items():
+            if not self.channels.get(ch, {'enabled': False})['enabled']:
+                continue
+            counts = self._counts(ch, t)
+            if np.any(np.abs(counts) > self.MAX_ADC):
+                overflow |= 1 << ch
+            buf[start:start + n] = np.clip(counts, -self.MAX_ADC, self.MAX_ADC)
+        return overflow
+
+    def _counts(self, ch, t, noise=True):
+        """Unclipped ADC counts of channel ch at times t (s)."""
+        wave = self.waveforms.get('A' if ch == 0 else 'B')
+        volts = wave(t) if wave is not None else np.zeros(len(t))
+        counts = volts * 1000.0 / CHANNEL_INPUT_RANGES_MV[self.channels[ch]['range']] * self.MAX_ADC
+        if noise and self.noise_counts:
+            counts = counts + self.rng.normal(0.0, self.noise_counts, len(t))
+        return counts
+
+    # --- block / rapid block ---
+
+    def _enabled(self):
+        return [ch for ch, cfg in sorted(self.channels.items()) if cfg['enabled']]
+
+    def ps2000aMemorySegments(self, handle, nSegments, nMaxSamples_ref):
+        if self._bad_handle(handle):
+            return PICO_INVALID_HANDLE
+        if not 1 <= int(nSegments) <= self.MAX_SEGMENTS:
+            return PICO_INVALID_PARAMETER
+        self.n_segments = int(nSegments)
+        self.segment_samples = self.MEMORY_SAMPLES // self.n_segments
+        self.segment_buffers = {}
+        _deref(nMaxSamples_ref).value = self.segment_samples
+        return PICO_OK
+
+    def ps2000aSetNoOfCaptures(self, handle, nCaptures):
+        if self._bad_handle(handle):
+            return PICO_INVALID_HANDLE
+        if not 1 <= int(nCaptures) <= self.n_segments:
+            return PICO_INVALID_PARAMETER
+        self.n_captures = int(nCaptures)
+        return PICO_OK
+
+    def ps2000aGetTimebase2(self, handle, timebase, noSamples, timeIntervalNanoseconds_ref, oversample,
+                            maxSamples_ref, segmentIndex):
+        if self._bad_handle(handle):
+            return PICO_INVALID_HANDLE
+        # 500 MS/s is shared: timebase 0 only with a single channel enabled
+        if int(timebase) < 0 or (int(timebase) == 0 and len(self._enabled()) > 1):
+            return PICO_INVALID_TIMEBASE
+        if int(noSamples) > self.segment_samples:
+            return PICO_INVALID_PARAMETER
+        if timeIntervalNanoseconds_ref is not None:
+            _deref(timeIntervalNanoseconds_ref).value = _timebase_interval_ns(int(timebase))
+        if maxSamples_ref is not None:
+            _deref(maxSamples_ref).value = self.segment_samples
+        return PICO_OK
+
+    def ps2000aSetSimpleTrigger(self, handle, enable, source, threshold, direction, delay, autoTrigger_ms):
+        if self._bad_handle(handle):
+            return PICO_INVALID_HANDLE
+        self.trigger = None if not enable else {
+            'source': int(source), 'threshold': int(threshold), 'direction': int(direction),
+            'delay': int(delay), 'auto_s': int(autoTrigger_ms) / 1000,
+        }
+        return PICO_OK
+
+    def ps2000aRunBlock(self, handle, noOfPreTriggerSamples, noOfPostTriggerSamples, timebase, oversample,
+                        timeIndisposedMs_ref, segmentIndex, lpReady, pParameter):
+        # lpReady is not called: poll ps2000aIsReady (what PicoStreamer does)
+        if self._bad_handle(handle):
+            return PICO_INVALID_HANDLE
+        pre, post = int(noOfPreTriggerSamples), int(noOfPostTriggerSamples)
+        if pre + post > self.segment_samples or not self._enabled():
+            return PICO_INVALID_PARAMETER
+        interval_s = _timebase_interval_ns(int(timebase)) / 1e9
+
+        n = pre + post
+        data = {ch: np.empty((self.n_captures, n), dtype=np.int16) for ch in self._enabled()}
+        overflow = np.zeros(self.n_captures, dtype=np.int16)
+        offsets = np.zeros(self.n_captures)
+        ends = np.full(self.n_captures, np.inf) # signal time at which each segment is complete
+        start = cursor = self.signal_time_s
+        for i in range(self.n_captures):
+            found = self._next_trigger(cursor + pre * interval_s, interval_s)
+            if found is None:
+                break # never triggers: the block stays unfinished until Stop
+            t_trig, offsets[i] = found
+            t = t_trig + (np.arange(n) - pre) * interval_s
+            for ch in data:
+                counts = self._counts(ch, t)
+                if np.any(np.abs(counts) > self.MAX_ADC):
+                    overflow[i] |= 1 << ch
+                data[ch][i] = np.clip(counts, -self.MAX_ADC, self.MAX_ADC)
+            cursor = t[-1] + interval_s + self.REARM_S
+            ends[i] = cursor - start
+        self.signal_time_s = cursor
+
+        self.block = {'data': data, 'overflow': overflow, 'offsets': offsets, 'ends': ends,
+                      'samples': n, 't0': time.perf_counter(), 'stopped_at': None}
+        if timeIndisposedMs_ref is not None:
+            _deref(timeIndisposedMs_ref).value = int(ends[-1] * 1000) if np.isfinite(ends[-1]) else 0
+        return PICO_OK
+
+    def _next_trigger(self, t_from, interval_s):
+        """(sample time of the trigger, crossing time - sample time) of the first trigger at or after t_from."""
+        trig = self.trigger
+        if trig is None or trig['source'] not in self.channels:
+            return t_from, 0.0
+        thr, direction = trig['threshold'], trig['direction']
+        rising, falling, level = direction in (2, 4), direction in (3, 4), direction in (0, 1)
+        scanned, window = 0, 4096
+        t0 = t_from - interval_s # one sample of history, so a crossing at t_from is seen
+        while True:
+            t = t0 + np.arange(window + 1) * interval_s
+            v = self._counts(trig['source'], t, noise=False)
+            if level:
+                hit = np.flatnonzero(v[1:] >= thr if direction == 0 else v[1:] <= thr) + 1
+            else:
+                cross = np.zeros(window, dtype=bool)
+                if rising:
+                    cross |= (v[:-1] < thr) & (v[1:] >= thr)
+                if falling:
+                    cross |= (v[:-1] > thr) & (v[1:] <= thr)
+                hit = np.flatnonzero(cross) + 1
+            if len(hit):
+                i = hit[0]
+                step = v[i] - v[i - 1]
+                frac = (thr - v[i - 1]) / step if step and not level else 1.0
+                return t[i], (frac - 1.0) * interval_s
+            scanned += window
+            if trig['auto_s'] and scanned * interval_s >= trig['auto_s']:
+                return t0 + window * interval_s, 0.0 # auto trigger
+            if scanned >= self.MAX_TRIGGER_SCAN:
+                return None
+            t0 += window * interval_s
+            window = min(window * 2, 1 << 20)
+
+    def _block_elapsed(self):
+        """Signal time covered by the running block so far."""
+        if self.speed is None:
+            return np.inf
+        return (time.perf_counter() - self.block['t0']) * self.speed
+
+    def _captured(self):
+        if self.block is None:
+            return 0
+        elapsed = self.block['stopped_at'] if self.block['stopped_at'] is not None else self._block_elapsed()
+        ends = self.block['ends'][np.isfinite(self.block['ends'])] # segments that never trigger never complete
+        return int(np.searchsorted(ends, elapsed, side='right'))
+
+    def ps2000aIsReady(self, handle, ready_ref):
+        if self._bad_handle(handle):
+            return PICO_INVALID_HANDLE
+        _deref(ready_ref).value = int(self.block is not None and self._captured() == self.n_captures)
+        return PICO_OK
+
+    def ps2000aGetNoOfCaptures(self, handle, nCaptures_ref):
+        if self._bad_handle(handle):
+            return PICO_INVALID_HANDLE
+        _deref(nCaptures_ref).value = self._captured()
+        return PICO_OK
+
+    def ps2000aGetValuesBulk(self, handle, noOfSamples_ref, fromSegmentIndex, toSegmentIndex, downSampleRatio,
+                             downSampleRatioMode, overflow_ref):
+        if self._bad_handle(handle):
+            return PICO_INVALID_HANDLE
+        first, last = int(fromSegmentIndex), int(toSegmentIndex)
+        if self.block is None or not 0 <= first <= last < self._captured():
+            return PICO_INVALID_PARAMETER
+        n = min(_deref(noOfSamples_ref).value, self.block['samples'])
+        overflow = _deref(overflow_ref) if overflow_ref is not None else None
+        for seg in range(first, last + 1):
+            for ch, data in self.block['data'].items():
+                buf = self.segment_buffers.get((ch, seg))
+                if buf is None:
+                    return PICO_INVALID_PARAMETER # no buffer registered for this segment
+                buf[:n] = data[seg, :n]
+            if overflow is not None:
+                overflow[seg - first] = int(self.block['overflow'][seg])
+        _deref(noOfSamples_ref).value = n
+        return PICO_OK
+
+    def ps2000aGetValuesTriggerTimeOffsetBulk64(self, handle, times_ref, timeUnits_ref, fromSegmentIndex, toSegmentIndex):
+        if self._bad_handle(handle):
+            return PICO_INVALID_HANDLE
+        first, last = int(fromSegmentIndex), int(toSegmentIndex)
+        if self.block is None or not 0 <= first <= last < self._captured():
+            return PICO_INVALID_PARAMETER
+        times, units = _deref(times_ref), _deref(timeUnits_ref)
+        for seg in range(first, last + 1):
+            times[seg - first] = int(round(self.block['offsets'][seg] * 1e15))
+            units[seg - first] = self.PS2000A_TIME_UNITS['PS2000A_FS']
+        return PICO_OK
+
+    def _bad_handle(self, handle):
+        value = handle.value if hasattr(handle, 'value') else handle
+        return value != self.handle or self.handle == 0
@@ -0,0 +1,152 @@
+import json
+import os
+import time
+
+import numpy as np
+
+from pico_driver import CHANNEL_INPUT_RANGES_MV
+from pico_storage import write_meta
+
+"""
+Export paths for PicoStreamer captures.
+
+All exporters take the raw int16 buffers plus the capture metadata (sample_interval_ns,
+max_adc, channel_ranges) and work through them in chunks, so peak memory is one chunk
+regardless of capture length. Each returns (and prints) its write throughput so you can
+pick a format per test.
+
+    npy     - one raw int16 .npy per channel + capture.json sidecar (numpy only, memmap-able)
+    parquet - int16 columns in row groups, metadata in the schema (needs pyarrow)
+    hdf5    - int16 datasets with metadata as attributes (needs h5py)
+    csv     - Time_Sec / ChX_mV text columns, written one chunk at a time
+"""
+
+CHUNK_SAMPLES = 1_000_000
+CSV_CHUNK_ROWS = 200_000 # text rows are ~40 bytes each once formatted
+
+
+def _report(fmt, path, nbytes, seconds):
+    result = {
+        'format': fmt,
+        'path': path,
+        'bytes': nbytes,
+        'seconds': seconds,
+        'mb_per_s': (nbytes / 1e6) / seconds if seconds > 0 else float('inf'),
+    }
+    print(f"[{fmt}] {nbytes / 1e6:.1f} MB written to {path} in {seconds:.2f}s ({result['mb_per_s']:.1f} MB/s)")
+    return result
+
+
+def _size(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+    return os.path.getsize(path)
+
+
+def _chunks(n, chunk):
+    for start in range(0, n, chunk):
+        yield start, min(start + chunk, n)
+
+
+def export_npy(directory, raw, meta):
+    """
+    Writes each channel as a raw int16 .npy plus a capture.json sidecar.
+    Reopen with pico_storage.open_capture(directory) - the arrays come back as memmaps.
+    :param raw: Dict {'A': int16 array, ...} (RAM arrays or memmaps)
+    :param meta: Dict with sample_interval_ns, max_adc and channel_ranges
+    """
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+    t0 = time.perf_counter()
+    files = {}
+    n = 0
+    for ch, data in raw.items():
+        files[ch] = f"ch{ch}.npy"
+        n = len(data)
+        out = np.lib.format.open_memmap(os.path.join(directory, files[ch]), mode='w+', dtype=np.int16, shape=(n,))
+        for start, stop in _chunks(n, CHUNK_SAMPLES):
+            out[start:stop] = data[start:stop]
+        out.flush()
+        del out
+
+    write_meta(directory, dict(meta, sample_count=n, dtype='int16', files=files))
+    return _report('npy', directory, _size(directory), time.perf_counter() - t0)
+
+
+def export_parquet(path, raw, meta, row_group=CHUNK_SAMPLES):
+    """Writes raw int16 channels to Parquet, one row group per chunk."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("Parquet export needs pyarrow - run: pip install pyarrow")
+
+    t0 = time.perf_counter()
+    n = len(next(iter(raw.values())))
+    schema = pa.schema([(f"ch{ch}", pa.int16()) for ch in raw],
+                       metadata={'pico': json.dumps(dict(meta, sample_count=n))})
+    with pq.ParquetWriter(path, schema) as writer:
+        for start, stop in _chunks(n, row_group):
+            cols = [pa.array(np.asarray(data[start:stop])) for data in raw.values()]
+            writer.write_table(pa.Table.from_arrays(cols, schema=schema))
+    return _report('parquet', path, _size(path), time.perf_counter() - t0)
+
+
+def export_hdf5(path, raw, meta):
+    """Writes raw int16 channels to HDF5 datasets ('chA', 'chB') with metadata as attributes."""
+    try:
+        import h5py
+    except ImportError:
+        raise SystemExit("HDF5 export needs h5py - run: pip install h5py")
+
+    t0 = time.perf_counter()
+    with h5py.File(path, 'w') as f:
+        for ch, data in raw.items():
+            n = len(data)
+            dset = f.create_dataset(f"ch{ch}", shape=(n,), dtype='int16', chunks=(min(n, CHUNK_SAMPLES),) if n else None)
+            for start, stop in _chunks(n, CHUNK_SAMPLES):
+                dset[start:stop] = data[start:stop]
+        f.attrs['sample_interval_ns'] = meta['sample_interval_ns']
+        f.attrs['max_adc'] = meta['max_adc']
+        for ch, rng in meta['channel_ranges'].items():
+            f.attrs[f"range_ch{ch}"] = rng
+        if 'window_start_s' in meta:
+            f.attrs['window_start_s'] = meta['window_start_s']
+    return _report('hdf5', path, _size(path), time.perf_counter() - t0)
+
+
+def export_csv(path, raw, meta, start=0, stop=None, chunk=CSV_CHUNK_ROWS):
+    """
+    Streams Time_Sec / ChX_mV columns to CSV without pandas.
+    Only one chunk of float values exists at a time; each chunk is formatted in a single
+    string operation instead of row by row.
+    :param start, stop: Sample window to write (defaults to everything).
+    """
+    n = len(next(iter(raw.values())))
+    stop = n if stop is None else stop
+    interval_s = meta['sample_interval_ns'] / 1e9
+    scales = [CHANNEL_INPUT_RANGES_MV[meta['channel_ranges'][ch]] / meta['max_adc'] for ch in raw]
+
+    header = ",".join(['Time_Sec'] + [f"Ch{ch}_mV" for ch in raw])
+    row_fmt = ",".join(['%.9g'] + ['%.4f'] * len(raw)) + "\n"
+
+    t0 = time.perf_counter()
+    with open(path, 'w') as f:
+        f.write(header + "\n")
+        for a in range(start, stop, chunk):
+            b = min(a + chunk, stop)
+            block = np.empty((b - a, len(raw) + 1))
+            block[:, 0] = np.arange(a, b) * interval_s
+            for i, data in enumerate(raw.values()):
+                block[:, i + 1] = data[a:b] * scales[i]
+            f.write((row_fmt * (b - a)) % tuple(block.ravel()))
+    return _report('csv', path, _size(path), time.perf_counter() - t0)
+
+
+EXPORTERS = {
+    'npy': export_npy,
+    'parquet': export_parquet,
+    'hdf5': export_hdf5,
+    'csv': export_csv,
+}
@@ -0,0 +1,253 @@
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from pico_storage import open_capture, write_meta
+
+"""
+Parallel capture across several PicoScope units.
+
+MultiScopeCapture runs one PicoStreamer streaming loop per unit, each in its own process, so the
+units don't compete for one Python thread. All units are opened first, then released together at
+a shared wall-clock start time. Each one streams to its own disk capture folder, and afterwards
+the per-unit outputs are merged onto one common time base:
+
+    units = [
+        {'serial': 'JO123/0001', 'channels': {'A': '10V', 'B': '5V'}},
+        {'serial': 'JO123/0002', 'channels': {'A': '2V'}},
+    ]
+    with MultiScopeCapture(units, output_dir="results/bench_01") as multi:
+        merged_dir = multi.run(sample_interval_ns=10_000, duration_s=60)
+
+Pass driver='sim' to run the same thing against simulated units (no hardware needed).
+"""
+
+START_DELAY_S = 0.5 # head start between "all units ready" and the shared start time
+WORKER_POLL_S = 0.5 # how often the coordinator checks that unit processes are still alive
+MERGE_CHUNK = 1_000_000
+
+
+def _unit_dirname(serial):
+    return "unit_" + "".join(c if c.isalnum() else "_" for c in serial)
+
+
+def _unit_worker(unit, driver, sample_interval_ns, out_dir, ready, go, start_at, stop, results):
+    """Runs in a child process: opens one unit, waits for the shared start, streams to disk."""
+    from pico_base import PicoStreamer
+
+    serial = unit['serial']
+    try:
+        with PicoStreamer(driver=driver, serial=serial) as scope:
+            for ch, voltage_range in unit['channels'].items():
+                scope.setup_channel(ch, voltage_range=voltage_range)
+            ready.put(serial)
+
+            go.wait()
+            delay = (start_at.value - time.time_ns()) / 1e9
+            if delay > 0:
+                time.sleep(delay)
+
+            # forward the coordinator's stop to this unit's capture loop
+            threading.Thread(target=lambda: (stop.wait(), scope.stop_event.set()), daemon=True).start()
+            unit_dir = os.path.join(out_dir, _unit_dirname(serial))
+            scope.run_capture(sample_interval_ns=sample_interval_ns, disk_dir=unit_dir, wait_for_input=False)
+
+            results.put({
+                'serial': serial,
+                'directory': unit_dir,
+                'start_time_ns': scope.start_time_ns,
+                'sample_interval_ns': scope.sample_interval_ns,
+                'samples': scope.sample_count,
+                'dropped_samples': scope.dropped_samples,
+            })
+    except BaseException as e:
+        ready.put(serial) # don't leave the coordinator waiting
+        results.put({'serial': serial, 'error': repr(e)})
+
+
+class MultiScopeCapture:
+    """
+    Coordinates simultaneous streaming captures on several units.
+    :param units: List of {'serial': str, 'channels': {'A': '10V', ...}}.
+    :param driver: None for real hardware, 'sim' for simulated units.
+    :param output_dir: Per-unit folders and the merged dataset are written here.
+    """
+
+    def __init__(self, units, driver=None, output_dir="results/multi"):
+        serials = [u['serial'] for u in units]
+        if len(set(serials)) != len(serials):
+            raise ValueError("Each unit needs a distinct serial number")
+        self.units = units
+        self.driver = driver
+        self.output_dir = output_dir
+        self.ctx = mp.get_context('spawn') # same behaviour on Windows, Mac and Linux
+        self.stop_event = self.ctx.Event()
+        self.processes = []
+        self.results = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Makes sure every unit is stopped (and therefore closed by its own with-block)."""
+        self.stop()
+        for p in self.processes:
+            p.join(timeout=10)
+            if p.is_alive():
+                p.terminate()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _wait_for_input(self):
+        print(">>> Type 'done' and press ENTER to stop all units <<<")
+        while not self.stop_event.is_set():
+            try:
+                if input().strip().lower() == 'done':
+                    self.stop()
+            except EOFError:
+                break
+
+    def _gather(self, q, serials):
+        """
+        Reads one message per unit in serials from q (a bare serial or a result dict).
+        A worker that dies hard (driver crash, os._exit) never reaches its except block, so instead
+        of blocking forever, a dead process that hasn't reported is returned as a failed unit.
+        :return: (messages received, error results for the units that died).
+        """
+        processes = dict(zip([u['serial'] for u in self.units], self.processes))
+        pending = set(serials)
+        received, lost = [], []
+
+        def take(msg):
+            pending.discard(msg['serial'] if isinstance(msg, dict) else msg)
+            received.append(msg)
+
+        while pending:
+            try:
+                take(q.get(timeout=WORKER_POLL_S))
+                continue
+            except queue.Empty:
+                pass
+            dead = [s for s in pending if not processes[s].is_alive()]
+            if not dead:
+                continue
+            # a process flushes its queue before it exits, so anything it sent is readable now
+            while True:
+                try:
+                    take(q.get_nowait())
+                except queue.Empty:
+                    break
+            for serial in dead:
+                if serial in pending:
+                    pending.discard(serial)
+                    lost.append({'serial': serial, 'error': f"process exited with code {processes[serial].exitcode}"})
+        return received, lost
+
+    def run(self, sample_interval_ns=1_000_000, duration_s=None, wait_for_input=True, merge=True):
+        """
+        Captures on every unit until duration_s elapses, 'done' is typed, or Ctrl+C.
+        :return: Merged dataset folder (or the list of per-unit results if merge=False).
+        """
+        if not os.path.exists(self.output_dir):
+            os.makedirs(self.output_dir)
+
+        ready, results = self.ctx.Queue(), self.ctx.Queue()
+        go = self.ctx.Event()
+        start_at = self.ctx.Value('q', 0)
+        self.stop_event.clear()
+
+        self.processes = [
+            self.ctx.Process(target=_unit_worker, daemon=True,
+                             args=(unit, self.driver, sample_interval_ns, self.output_dir,
+                                   ready, go, start_at, self.stop_event, results))
+            for unit in self.units
+        ]
+        for p in self.processes:
+            p.start()
+
+        opened, lost = self._gather(ready, [u['serial'] for u in self.units])
+        start_at.value = time.time_ns() + int(START_DELAY_S * 1e9)
+        go.set()
+        print(f"All {len(opened)} units ready - streaming.")
+
+        if wait_for_input:
+            threading.Thread(target=self._wait_for_input, daemon=True).start()
+        try:
+            if duration_s is not None:
+                self.stop_event.wait(START_DELAY_S + duration_s)
+                self.stop()
+            reported, died = self._gather(results, opened)
+        except KeyboardInterrupt:
+            print("\n!!! INTERRUPT DETECTED !!! stopping all units...")
+            self.stop()
+            reported, died = self._gather(results, opened)
+        self.results = reported + lost + died
+
+        for p in self.processes:
+            p.join()
+
+        failed = [r for r in self.results if 'error' in r]
+        for r in failed:
+            print(f"Unit {r['serial']} failed: {r['error']}")
+        if not merge or failed:
+            return self.results
+        return merge_units(self.results, os.path.join(self.output_dir, "merged"))
+
+
+def merge_units(results, out_dir, sample_interval_ns=None):
+    """
+    Merges per-unit disk captures onto one common time base.
+    The merged grid starts at the latest unit start and ends at the earliest unit end, so every
+    channel has real data at every point; each unit is resampled by nearest sample index.
+    :param results: Per-unit dicts with directory, start_time_ns and sample_interval_ns.
+    :param sample_interval_ns: Grid spacing; defaults to the coarsest unit interval.
+    :return: out_dir, readable with pico_storage.open_capture() (channels named '<serial>_A' ...).
+    """
+    units = []
+    for r in results:
+        meta, channels = open_capture(r['directory'])
+        units.append((r, meta, channels))
+
+    interval_ns = sample_interval_ns or max(meta['sample_interval_ns'] for _, meta, _ in units)
+    t0_ns = max(r['start_time_ns'] for r, _, _ in units)
+    t1_ns = min(r['start_time_ns'] + meta['sample_count'] * meta['sample_interval_ns'] for r, meta, _ in units)
+    n = max((t1_ns - t0_ns) // interval_ns, 0)
+
+    if not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+
+    files, ranges, offsets = {}, {}, {}
+    for r, meta, channels in units:
+        offset_ns = t0_ns - r['start_time_ns']
+        offsets[r['serial']] = offset_ns
+        for ch, raw in channels.items():
+            name = f"{r['serial']}_{ch}"
+            files[name] = f"{_unit_dirname(r['serial'])}_ch{ch}.npy"
+            ranges[name] = meta['channel_ranges'][ch]
+            out = np.lib.format.open_memmap(os.path.join(out_dir, files[name]), mode='w+', dtype=np.int16, shape=(n,))
+            for a in range(0, n, MERGE_CHUNK):
+                b = min(a + MERGE_CHUNK, n)
+                t_ns = offset_ns + np.arange(a, b, dtype=np.int64) * interval_ns
+                src = np.clip(np.rint(t_ns / meta['sample_interval_ns']).astype(np.int64), 0, len(raw) - 1)
+                out[a:b] = raw[src]
+            out.flush()
+            del out
+
+    write_meta(out_dir, {
+        'sample_count': int(n),
+        'sample_interval_ns': int(interval_ns),
+        'max_adc': units[0][1]['max_adc'],
+        'channel_ranges': ranges,
+        'dtype': 'int16',
+        'files': files,
+        'start_time_ns': int(t0_ns),
+        'unit_offsets_ns': offsets,
+        'units': [{k: v for k, v in r.items()} for r, _, _ in units],
+    })
+    print(f"Merged {len(units)} units ({n} aligned samples) into: {out_dir}")
+    return out_dir
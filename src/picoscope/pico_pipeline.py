@@ -0,0 +1,313 @@
+import os
+import queue
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from pico_storage import META_FILENAME, GrowableMemmap, write_meta
+
+"""
+Producer/consumer pipeline for PicoStreamer.
+
+The streaming callback copies each driver chunk into a ring of preallocated fixed-size blocks.
+Whenever a block fills up, a ChunkDescriptor (zero-copy views into that block) is published to
+every subscribed stage. Each stage has its own bounded queue and worker thread, so disk writing,
+online statistics, live plotting etc. run while the capture is still streaming.
+
+The callback never blocks and never overwrites data a stage is still reading:
+    - if the next block is still in use, incoming samples are not published (counted as backpressure)
+    - if one stage's queue is full, only that stage misses the block (counted per stage)
+Everything is reported by CapturePipeline.report() when the capture ends. Every block carries
+its absolute start sample, so a stage sees a missed block as a jump in start_sample and must not
+treat the data on either side of it as contiguous (see DiskWriterStage.gaps).
+
+A stage is any object with:
+    name                   - used in the report
+    start(meta)            - called once streaming starts (sample interval, ranges, max ADC)
+    consume(descriptor)    - called on the stage's worker thread for every block
+    finish()               - called after the last block
+"""
+
+ChunkDescriptor = namedtuple('ChunkDescriptor', ['seq', 'start_sample', 'n', 'data', 'block'])
+
+
+class BlockRing:
+    """Preallocated int16 blocks, one row per block per channel, with per-block reference counts."""
+
+    def __init__(self, n_blocks, block_samples, channels):
+        self.n_blocks = n_blocks
+        self.block_samples = block_samples
+        self.blocks = {ch: np.zeros((n_blocks, block_samples), dtype=np.int16) for ch in channels}
+        self.refs = [0] * n_blocks
+        self.next = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Claims the next block for the producer, or returns None if a reader still holds it."""
+        with self.lock:
+            idx = self.next
+            if self.refs[idx] > 0:
+                return None
+            self.refs[idx] = 1
+            self.next = (idx + 1) % self.n_blocks
+            return idx
+
+    def hand_over(self, idx, readers):
+        """Transfers the producer's claim on a block to `readers` consumers."""
+        with self.lock:
+            self.refs[idx] = readers
+
+    def release(self, idx):
+        with self.lock:
+            self.refs[idx] -= 1
+
+
+class CapturePipeline:
+    """
+    Fans streaming data out to consumer stages on worker threads.
+    Usage:
+        pipeline = CapturePipeline()
+        pipeline.subscribe(DiskWriterStage("results/run_01"))
+        scope.run_capture(sample_interval_ns=1_000, pipeline=pipeline)
+    """
+
+    def __init__(self, block_samples=65_536, n_blocks=64, queue_depth=32):
+        """
+        :param block_samples: Samples per channel in each published block.
+        :param n_blocks: Blocks in the ring (memory = n_blocks * block_samples * 2 bytes per channel).
+        :param queue_depth: Max blocks waiting per stage before that stage starts missing blocks.
+        """
+        self.block_samples = block_samples
+        self.n_blocks = n_blocks
+        self.queue_depth = queue_depth
+        self.stages = []
+        self.queues = []
+        self.threads = []
+        self.missed = {}
+        self.ring = None
+
+    def subscribe(self, stage):
+        self.stages.append(stage)
+        self.missed[stage.name] = 0
+        return stage
+
+    def start(self, meta, channels):
+        """Allocates the block ring and starts one worker per stage. Called by run_capture."""
+        self.ring = BlockRing(self.n_blocks, self.block_samples, channels)
+        self.seq = 0
+        self.published = 0
+        self.backpressure_samples = 0
+        self.current = None # block being filled by the producer
+        self.fill = 0
+        self.block_start = 0
+        self.queues = []
+        self.threads = []
+        for stage in self.stages:
+            self.missed[stage.name] = 0
+            stage.start(meta)
+            q = queue.Queue(maxsize=self.queue_depth)
+            t = threading.Thread(target=self._worker, args=(stage, q), daemon=True)
+            self.queues.append(q)
+            self.threads.append(t)
+            t.start()
+
+    def publish(self, start_sample, chunks):
+        """
+        Copies one driver chunk into the ring; full blocks are handed to the stages. Never blocks.
+        :param start_sample: Absolute index of the first sample in the chunk.
+        :param chunks: Dict {channel: int16 view into the driver buffer}, all the same length.
+        """
+        if not self.stages or self.ring is None:
+            return
+        n = len(next(iter(chunks.values())))
+
+        # a jump in sample index ends the current block early so blocks stay contiguous
+        if self.current is not None and start_sample != self.block_start + self.fill:
+            self._dispatch()
+
+        done = 0
+        while done < n:
+            if self.current is None:
+                self.current = self.ring.acquire()
+                if self.current is None:
+                    self.backpressure_samples += n - done
+                    return
+                self.fill = 0
+                self.block_start = start_sample + done
+
+            take = min(n - done, self.block_samples - self.fill)
+            for ch, src in chunks.items():
+                self.ring.blocks[ch][self.current, self.fill:self.fill + take] = src[done:done + take]
+            self.fill += take
+            done += take
+
+            if self.fill == self.block_samples:
+                self._dispatch()
+
+    def _dispatch(self):
+        """Publishes the block being filled (possibly partial) to every stage."""
+        idx = self.current
+        self.current = None
+        if idx is None or self.fill == 0:
+            if idx is not None:
+                self.ring.release(idx) # pyright: ignore[reportOptionalMemberAccess]
+            return
+
+        data = {ch: blocks[idx, :self.fill] for ch, blocks in self.ring.blocks.items()} # pyright: ignore[reportOptionalMemberAccess]
+        desc = ChunkDescriptor(self.seq, self.block_start, self.fill, data, idx)
+        self.seq += 1
+        self.published += 1
+        self.ring.hand_over(idx, len(self.stages)) # pyright: ignore[reportOptionalMemberAccess]
+        for stage, q in zip(self.stages, self.queues):
+            try:
+                q.put_nowait(desc)
+            except queue.Full:
+                self.missed[stage.name] += 1
+                self.ring.release(idx) # pyright: ignore[reportOptionalMemberAccess]
+
+    def _worker(self, stage, q):
+        while True:
+            desc = q.get()
+            if desc is None:
+                break
+            try:
+                stage.consume(desc)
+            except Exception as e:
+                print(f"\nPipeline stage '{stage.name}' failed on block {desc.seq}: {e}")
+            finally:
+                self.ring.release(desc.block) # pyright: ignore[reportOptionalMemberAccess]
+        stage.finish()
+
+    def close(self):
+        """Flushes the last partial block and waits for every stage to finish. Called by run_capture."""
+        if self.ring is not None:
+            self._dispatch()
+        for q in self.queues:
+            q.put(None)
+        for t in self.threads:
+            t.join()
+        self.report()
+
+    def report(self):
+        print(f"Pipeline: {self.published} blocks published to {len(self.stages)} stage(s).")
+        if self.backpressure_samples:
+            print(f"Warning: pipeline backpressure - {self.backpressure_samples} samples were not published "
+                  f"because every block was still in use by a slow stage.")
+        for name, count in self.missed.items():
+            if count:
+                print(f"Warning: stage '{name}' fell behind and missed {count} blocks.")
+
+
+class DiskWriterStage:
+    """
+    Writes every chunk to growable memmap files - same layout as run_capture(disk_dir=...).
+    Samples of blocks that never reached this stage are written as zeros, so every sample stays
+    at its own time; they are listed in capture.json as gaps ([start_sample, n] pairs) with
+    complete = false, and pico_storage.valid_mask(meta) masks them out.
+    """
+
+    name = 'disk'
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.writers = {}
+        self.meta = {}
+        self.gaps = []
+        self.position = 0
+
+    def start(self, meta):
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        self.meta = meta
+        self.gaps = []
+        self.position = 0
+        self.writers = {ch: GrowableMemmap(os.path.join(self.directory, f"ch{ch}.bin")) for ch in meta['channel_ranges']}
+
+    def consume(self, desc):
+        missing = desc.start_sample - self.position
+        if missing > 0:
+            self.gaps.append([self.position, missing])
+            for writer in self.writers.values():
+                writer.pad(missing)
+        for ch, data in desc.data.items():
+            self.writers[ch].append(data)
+        self.position = desc.start_sample + desc.n
+
+    def finish(self):
+        files = {}
+        for ch, writer in self.writers.items():
+            writer.close()
+            files[ch] = os.path.basename(writer.path)
+        write_meta(self.directory, dict(self.meta, sample_count=self.position, dtype='int16', files=files,
+                                        complete=not self.gaps, gaps=self.gaps))
+        if self.gaps:
+            lost = sum(n for _, n in self.gaps)
+            print(f"Warning: {self.directory} has {len(self.gaps)} gap(s) ({lost} samples written as zeros), "
+                  f"listed under 'gaps' in {META_FILENAME}.")
+
+
+class LivePlotFeed:
+    """
+    Keeps a decimated min/max trace of the last `window_s` seconds for live plotting.
+    Call snapshot() from any thread (e.g. a matplotlib animation) to get the current trace.
+    """
+
+    name = 'live_plot'
+
+    def __init__(self, window_s=10.0, points=2000):
+        self.window_s = window_s
+        self.points = points
+        self.lock = threading.Lock()
+        self.bin_samples = 1
+        self.scales = {}
+        self.pending = {}
+        self.trace = {}
+
+    def start(self, meta):
+        from pico_driver import CHANNEL_INPUT_RANGES_MV
+        self.interval_s = meta['sample_interval_ns'] / 1e9
+        self.bin_samples = max(int(self.window_s / self.interval_s / self.points), 1)
+        self.scales = {ch: CHANNEL_INPUT_RANGES_MV[rng] / meta['max_adc'] for ch, rng in meta['channel_ranges'].items()}
+        self.pending = {ch: np.zeros(0, dtype=np.int16) for ch in self.scales}
+        self.pending_start = 0
+        self.trace = {'Time': np.zeros(0)}
+        for ch in self.scales:
+            self.trace[ch + '_min'] = np.zeros(0)
+            self.trace[ch + '_max'] = np.zeros(0)
+
+    def consume(self, desc):
+        pending = len(self.pending[next(iter(self.pending))])
+        if pending and desc.start_sample != self.pending_start + pending:
+            # a missed block: drop the leftover samples rather than bin them across the gap
+            self.pending = {ch: np.zeros(0, dtype=np.int16) for ch in self.scales}
+            pending = 0
+        if not pending:
+            self.pending_start = desc.start_sample
+        for ch, data in desc.data.items():
+            self.pending[ch] = np.concatenate([self.pending[ch], data])
+
+        n_bins = len(self.pending[next(iter(self.pending))]) // self.bin_samples
+        if n_bins == 0:
+            return
+        used = n_bins * self.bin_samples
+        times = (self.pending_start + np.arange(n_bins) * self.bin_samples) * self.interval_s
+
+        with self.lock:
+            self.trace['Time'] = np.concatenate([self.trace['Time'], times])[-self.points:]
+            for ch in self.scales:
+                bins = self.pending[ch][:used].reshape(n_bins, self.bin_samples)
+                for key, values in ((ch + '_min', bins.min(axis=1)), (ch + '_max', bins.max(axis=1))):
+                    self.trace[key] = np.concatenate([self.trace[key], values * self.scales[ch]])[-self.points:]
+
+        for ch in self.scales:
+            self.pending[ch] = self.pending[ch][used:]
+        self.pending_start += used
+
+    def finish(self):
+        pass
+
+    def snapshot(self):
+        """Copy of the current trace: {'Time': s, 'A_min': mV, 'A_max': mV, ...}."""
+        with self.lock:
+            return {k: v.copy() for k, v in self.trace.items()}
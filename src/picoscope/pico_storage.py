@@ -0,0 +1,123 @@
+import json
+import os
+
+import numpy as np
+
+"""
+Disk-backed sample storage for PicoStreamer.
+
+Each enabled channel is appended to its own raw int16 file ("chA.bin", "chB.bin")
+and a small JSON sidecar ("capture.json") records what is needed to read it back.
+Capture length is limited by disk space instead of RAM.
+"""
+
+META_FILENAME = "capture.json"
+
+
+class GrowableMemmap:
+    """
+    Append-only int16 file that is memory-mapped in large chunks.
+    The file is grown by `chunk_samples` at a time, so the OS writes back big contiguous
+    pages and RAM use stays roughly constant no matter how long the capture runs.
+    """
+
+    def __init__(self, path, dtype=np.int16, chunk_samples=16_777_216):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.chunk_samples = chunk_samples
+        self.length = 0
+        self.capacity = 0
+
+        self._fh = open(path, "w+b")
+        self._map = None
+        self._grow(chunk_samples)
+
+    def __len__(self):
+        return self.length
+
+    def _grow(self, min_capacity):
+        """Extends the file (rounded up to a whole chunk) and re-maps it."""
+        chunks = -(-min_capacity // self.chunk_samples)
+        new_capacity = max(chunks * self.chunk_samples, self.capacity + self.chunk_samples)
+
+        if self._map is not None:
+            self._map.flush()
+            self._map = None
+
+        self._fh.truncate(new_capacity * self.dtype.itemsize)
+        self._map = np.memmap(self._fh, dtype=self.dtype, mode="r+", shape=(new_capacity,))
+        self.capacity = new_capacity
+
+    def append(self, chunk):
+        """Copies one chunk of samples onto the end of the file."""
+        end = self.length + len(chunk)
+        if end > self.capacity:
+            self._grow(end)
+        self._map[self.length:end] = chunk # pyright: ignore[reportOptionalSubscript]
+        self.length = end
+
+    def pad(self, n):
+        """Appends n zero samples. The file grows zero-filled, so nothing has to be written."""
+        end = self.length + n
+        if end > self.capacity:
+            self._grow(end)
+        self.length = end
+
+    def close(self):
+        """Flushes the mapping and trims the file down to the samples actually written."""
+        if self._fh.closed:
+            return
+        if self._map is not None:
+            self._map.flush()
+            self._map = None
+        self._fh.truncate(self.length * self.dtype.itemsize)
+        self._fh.close()
+
+    def view(self):
+        """Returns a read-only, zero-copy view of everything written so far."""
+        return open_channel(self.path, self.length, self.dtype)
+
+
+def open_channel(path, length, dtype=np.int16):
+    """Maps a raw channel file without reading it into RAM."""
+    if length == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(length,))
+
+
+def write_meta(directory, meta):
+    """Writes the JSON sidecar describing a capture directory."""
+    with open(os.path.join(directory, META_FILENAME), "w") as f:
+        json.dump(meta, f, indent=2)
+
+
+def read_meta(directory):
+    with open(os.path.join(directory, META_FILENAME)) as f:
+        return json.load(f)
+
+
+def valid_mask(meta):
+    """
+    Boolean mask over a capture's samples, False where meta['gaps'] lists samples that were
+    never received (written as zeros by the pipeline's DiskWriterStage).
+    """
+    mask = np.ones(meta["sample_count"], dtype=bool)
+    for start, n in meta.get("gaps", []):
+        mask[start:start + n] = False
+    return mask
+
+
+def open_capture(directory):
+    """
+    Reopens a disk-backed capture (run_capture disk_dir) or an npy export (save_binary).
+    :return: (meta dict, {channel: np.memmap of raw int16 ADC counts})
+    """
+    meta = read_meta(directory)
+    channels = {}
+    for ch, filename in meta["files"].items():
+        path = os.path.join(directory, filename)
+        if filename.endswith(".npy"):
+            channels[ch] = np.load(path, mmap_mode="r") # written by pico_export.export_npy
+        else:
+            channels[ch] = open_channel(path, meta["sample_count"], meta["dtype"])
+    return meta, channels
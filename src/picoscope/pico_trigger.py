@@ -0,0 +1,305 @@
+import os
+
+import numpy as np
+
+from pico_analytics import schmitt_states
+from pico_driver import CHANNEL_INPUT_RANGES_MV
+from pico_storage import write_meta
+
+"""
+Software triggering for PicoStreamer.
+
+A trigger condition is evaluated on every streamed chunk with vectorized numpy (levels are
+converted to ADC counts once at start, state carries across chunk boundaries). TriggeredRecorder
+keeps a fixed-size pre-trigger ring buffer and, when the trigger fires, saves a small event
+record of pre + post samples. With re-arming, one long session produces many small events, and
+memory / disk use depend on the event size rather than the session length. If the pipeline
+misses a block, the trigger state and the history are reset and an event in progress is saved
+with partial=True, so no record spans a gap.
+
+Conditions:
+    LevelTrigger      - signal is above / below a level
+    EdgeTrigger       - signal crosses a level (rising / falling / either), with hysteresis
+    WindowTrigger     - signal enters or leaves a [low, high] window
+    PulseWidthTrigger - a high / low pulse ends whose width is inside [min_s, max_s]
+                        (e.g. max_s=2e-6 catches glitches shorter than 2 us)
+"""
+
+
+class _Trigger:
+    """Base class: subclasses implement arm() and find()."""
+
+    def __init__(self, channel):
+        self.channel = channel.upper()
+
+    def start(self, meta):
+        """Converts mV / seconds settings to ADC counts / samples for this capture."""
+        self.scale = CHANNEL_INPUT_RANGES_MV[meta['channel_ranges'][self.channel]] / meta['max_adc']
+        self.interval_s = meta['sample_interval_ns'] / 1e9
+        self.arm()
+
+    def counts(self, mv):
+        return int(round(mv / self.scale))
+
+    def arm(self):
+        pass
+
+    def find(self, raw, start_sample):
+        """Returns the chunk-relative indices at which the condition fires, in order."""
+        raise NotImplementedError
+
+
+class LevelTrigger(_Trigger):
+    def __init__(self, channel, level_mv, above=True):
+        super().__init__(channel)
+        self.level_mv = level_mv
+        self.above = above
+
+    def arm(self):
+        self.level = self.counts(self.level_mv)
+
+    def find(self, raw, start_sample):
+        return np.flatnonzero(raw >= self.level if self.above else raw <= self.level)
+
+
+class EdgeTrigger(_Trigger):
+    def __init__(self, channel, level_mv, direction='rising', hysteresis_mv=0.0):
+        super().__init__(channel)
+        if direction not in ('rising', 'falling', 'either'):
+            raise ValueError("direction must be 'rising', 'falling' or 'either'")
+        self.level_mv = level_mv
+        self.direction = direction
+        self.hysteresis_mv = hysteresis_mv
+
+    def arm(self):
+        self.hi = self.counts(self.level_mv + self.hysteresis_mv / 2)
+        self.lo = self.counts(self.level_mv - self.hysteresis_mv / 2)
+        self.state = None
+
+    def find(self, raw, start_sample):
+        filled, prev = schmitt_states(raw, self.hi, self.lo, self.state)
+        if filled is None:
+            return np.zeros(0, dtype=np.int64)
+        self.state = int(filled[-1])
+        changed = (prev >= 0) & (filled >= 0) & (prev != filled)
+        if self.direction == 'rising':
+            changed &= filled == 1
+        elif self.direction == 'falling':
+            changed &= filled == 0
+        return np.flatnonzero(changed)
+
+
+class WindowTrigger(_Trigger):
+    def __init__(self, channel, low_mv, high_mv, mode='exit'):
+        super().__init__(channel)
+        if mode not in ('enter', 'exit'):
+            raise ValueError("mode must be 'enter' or 'exit'")
+        self.low_mv = low_mv
+        self.high_mv = high_mv
+        self.mode = mode
+
+    def arm(self):
+        self.low = self.counts(self.low_mv)
+        self.high = self.counts(self.high_mv)
+        self.inside = None
+
+    def find(self, raw, start_sample):
+        inside = (raw >= self.low) & (raw <= self.high)
+        prev = np.empty_like(inside)
+        prev[1:] = inside[:-1]
+        # first sample of the capture can't be a transition
+        prev[0] = inside[0] if self.inside is None else self.inside
+        self.inside = bool(inside[-1])
+        want = inside if self.mode == 'enter' else ~inside
+        return np.flatnonzero(want & (prev != inside))
+
+
+class PulseWidthTrigger(_Trigger):
+    def __init__(self, channel, level_mv, polarity='high', min_s=None, max_s=None, hysteresis_mv=0.0):
+        super().__init__(channel)
+        if polarity not in ('high', 'low'):
+            raise ValueError("polarity must be 'high' or 'low'")
+        self.level_mv = level_mv
+        self.polarity = polarity
+        self.min_s = min_s
+        self.max_s = max_s
+        self.hysteresis_mv = hysteresis_mv
+
+    def arm(self):
+        self.hi = self.counts(self.level_mv + self.hysteresis_mv / 2)
+        self.lo = self.counts(self.level_mv - self.hysteresis_mv / 2)
+        self.min_samples = 0 if self.min_s is None else int(np.ceil(self.min_s / self.interval_s))
+        self.max_samples = np.inf if self.max_s is None else int(np.floor(self.max_s / self.interval_s))
+        self.state = None
+        self.pulse_start = None # absolute index where the current pulse began
+
+    def find(self, raw, start_sample):
+        filled, prev = schmitt_states(raw, self.hi, self.lo, self.state)
+        if filled is None:
+            return np.zeros(0, dtype=np.int64)
+        self.state = int(filled[-1])
+
+        active = 1 if self.polarity == 'high' else 0
+        changed = (prev >= 0) & (filled >= 0) & (prev != filled)
+        starts = np.flatnonzero(changed & (filled == active)) + start_sample
+        ends = np.flatnonzero(changed & (filled != active)) + start_sample
+
+        # pair each pulse end with the latest start before it (possibly from an earlier chunk)
+        all_starts = starts if self.pulse_start is None else np.concatenate([[self.pulse_start], starts])
+        pos = np.searchsorted(all_starts, ends) - 1
+        valid = pos >= 0
+        widths = ends[valid] - all_starts[pos[valid]]
+        ok = (widths >= self.min_samples) & (widths <= self.max_samples)
+
+        if len(starts) and (not len(ends) or starts[-1] > ends[-1]):
+            self.pulse_start = int(starts[-1])
+        elif len(ends):
+            self.pulse_start = None
+        return ends[valid][ok] - start_sample
+
+
+class TriggeredRecorder:
+    """
+    Pipeline stage that saves pre + post trigger event records.
+    :param trigger: One of the trigger conditions above.
+    :param directory: Events go to directory/event_0001/, event_0002/, ... (same layout as
+                      npy exports, so pico_storage.open_capture() reads them).
+    :param pre_s, post_s: Seconds kept before / recorded after the trigger point.
+    :param rearm: Keep triggering after the first event.
+    :param max_events: Stop recording after this many events (None = unlimited).
+    :param on_done: Called once max_events is reached (e.g. to stop the capture).
+    """
+
+    name = 'trigger'
+
+    def __init__(self, trigger, directory, pre_s=0.001, post_s=0.01, rearm=True, max_events=None, on_done=None):
+        self.trigger = trigger
+        self.directory = directory
+        self.pre_s = pre_s
+        self.post_s = post_s
+        self.rearm = rearm
+        self.max_events = max_events
+        self.on_done = on_done
+        self.events = []
+
+    def start(self, meta):
+        self.meta = meta
+        self.trigger.start(meta)
+        interval_s = meta['sample_interval_ns'] / 1e9
+        self.pre = int(round(self.pre_s / interval_s))
+        self.post = max(int(round(self.post_s / interval_s)), 1)
+        channels = list(meta['channel_ranges'])
+
+        # pre-trigger history ring and the one event currently being recorded
+        self.history = {ch: np.zeros(self.pre, dtype=np.int16) for ch in channels}
+        self.history_fill = 0
+        self.history_pos = 0
+        self.event = {ch: np.zeros(self.pre + self.post, dtype=np.int16) for ch in channels}
+        self.event_fill = 0
+        self.event_trigger = None
+        self.event_pre = 0
+        self.armed = True
+        self.events = []
+        self.position = 0 # absolute index of the next expected sample
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+
+    def consume(self, desc):
+        if desc.start_sample != self.position:
+            self._gap()
+        self.position = desc.start_sample + desc.n
+        fires = self.trigger.find(desc.data[self.trigger.channel], desc.start_sample)
+        n = desc.n
+        pos = 0
+        while pos < n:
+            if self.event_trigger is not None:
+                take = min(self.pre + self.post - self.event_fill, n - pos)
+                for ch, data in desc.data.items():
+                    self.event[ch][self.event_fill:self.event_fill + take] = data[pos:pos + take]
+                self.event_fill += take
+                pos += take
+                if self.event_fill == self.pre + self.post:
+                    self._save_event()
+                continue
+
+            if not self.armed:
+                break
+            later = fires[np.searchsorted(fires, pos):]
+            if not len(later):
+                break
+            idx = int(later[0])
+            self._begin_event(desc, idx)
+            pos = idx
+
+        self._push_history(desc)
+
+    def _gap(self):
+        """A block was missed: nothing before it may be joined to what comes after."""
+        if self.event_trigger is not None:
+            self._save_event(partial=True)
+        self.history_fill = 0
+        self.history_pos = 0
+        self.trigger.arm() # no edges / pulse widths across the gap
+
+    def _begin_event(self, desc, idx):
+        """Starts an event at chunk index idx, pulling pre-trigger samples from the chunk and history."""
+        from_chunk = min(idx, self.pre)
+        from_history = min(self.pre - from_chunk, self.history_fill)
+        self.event_pre = from_chunk + from_history
+        for ch, data in desc.data.items():
+            if from_history:
+                self.event[ch][:from_history] = self._history_tail(ch, from_history)
+            self.event[ch][from_history:self.event_pre] = data[idx - from_chunk:idx]
+        self.event_fill = self.event_pre
+        self.event_trigger = desc.start_sample + idx
+
+    def _history_tail(self, ch, k):
+        """Last k samples of the history ring, oldest first."""
+        ring = self.history[ch]
+        end = self.history_pos
+        if k <= end:
+            return ring[end - k:end]
+        return np.concatenate([ring[self.pre - (k - end):], ring[:end]])
+
+    def _push_history(self, desc):
+        if self.pre == 0:
+            return
+        take = min(desc.n, self.pre)
+        for ch, data in desc.data.items():
+            tail = data[desc.n - take:]
+            first = min(take, self.pre - self.history_pos)
+            self.history[ch][self.history_pos:self.history_pos + first] = tail[:first]
+            self.history[ch][:take - first] = tail[first:]
+        self.history_pos = (self.history_pos + take) % self.pre
+        self.history_fill = min(self.history_fill + take, self.pre)
+
+    def _save_event(self, partial=False):
+        number = len(self.events) + 1
+        path = os.path.join(self.directory, f"event_{number:04d}")
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+        files = {}
+        for ch, data in self.event.items():
+            files[ch] = f"ch{ch}.npy"
+            np.save(os.path.join(path, files[ch]), data[:self.event_fill])
+        interval_s = self.meta['sample_interval_ns'] / 1e9
+        write_meta(path, dict(self.meta, sample_count=self.event_fill, dtype='int16', files=files,
+                              trigger_sample=self.event_trigger, pre_samples=self.event_pre,
+                              trigger_time_s=self.event_trigger * interval_s, # pyright: ignore[reportOptionalOperand]
+                              start_time_s=(self.event_trigger - self.event_pre) * interval_s, # pyright: ignore[reportOptionalOperand]
+                              partial=partial))
+        self.events.append(path)
+        print(f"\nTrigger event {number} saved to: {path}")
+
+        self.event_trigger = None
+        self.event_fill = 0
+        self.armed = self.rearm and (self.max_events is None or len(self.events) < self.max_events)
+        if not self.armed and self.on_done is not None:
+            self.on_done()
+
+    def finish(self):
+        # keep whatever post-trigger data arrived before the capture stopped
+        if self.event_trigger is not None:
+            self._save_event(partial=True)
+        print(f"{len(self.events)} trigger event(s) recorded in: {self.directory}")
@@ -0,0 +1,87 @@
+import numpy as np
+
+"""
+Lazy, sliceable views over raw PicoScope data.
+
+The raw int16 ADC buffers stay the source of truth. ScaledChannel converts only the
+requested window to mV, and TimeBase computes timestamps from start + index * interval,
+so nothing the size of the whole capture is ever materialized as float64.
+"""
+
+DEFAULT_CHUNK = 1_000_000
+
+
+class ScaledChannel:
+    """
+    mV view over a raw int16 buffer (RAM array or np.memmap).
+    view[i], view[a:b] and view[a:b:step] return float64 mV for just that window.
+    """
+
+    def __init__(self, raw, range_mv, max_adc):
+        self.raw = raw
+        self.range_mv = range_mv
+        self.max_adc = max_adc
+        self.scale = range_mv / max_adc # mV per ADC count
+
+    def __len__(self):
+        return len(self.raw)
+
+    @property
+    def shape(self):
+        return (len(self.raw),)
+
+    def __getitem__(self, key):
+        return self.raw[key] * self.scale
+
+    def __array__(self, dtype=None, copy=None):
+        """Full conversion - only happens if something calls np.asarray() on the view."""
+        out = self.raw * self.scale
+        return out if dtype is None else out.astype(dtype)
+
+    def to_counts(self, mv):
+        """Converts a mV level to the nearest ADC count (for comparing against raw data)."""
+        return int(round(mv / self.scale))
+
+
+class TimeBase:
+    """Implicit time axis: t[i] = start_s + i * interval_s, computed per window."""
+
+    def __init__(self, start_s, interval_s, length):
+        self.start_s = start_s
+        self.interval_s = interval_s
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def shape(self):
+        return (self.length,)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return self.start_s + np.arange(*key.indices(self.length)) * self.interval_s
+        idx = np.asarray(key)
+        if np.any(idx < 0):
+            idx = np.where(idx < 0, idx + self.length, idx)
+        return self.start_s + idx * self.interval_s
+
+    def __array__(self, dtype=None, copy=None):
+        return self[:] if dtype is None else self[:].astype(dtype)
+
+    def index_of(self, t_s):
+        """Sample index at (or just after) time t_s, clamped to the capture."""
+        idx = int(np.ceil((t_s - self.start_s) / self.interval_s - 1e-9))
+        return min(max(idx, 0), self.length)
+
+    def window(self, t_start=None, t_end=None):
+        """Converts a time window in seconds into a slice of sample indices."""
+        start = 0 if t_start is None else self.index_of(t_start)
+        stop = self.length if t_end is None else self.index_of(t_end)
+        return slice(start, max(start, stop))
+
+
+def iter_windows(window, chunk=DEFAULT_CHUNK):
+    """Splits a contiguous slice into consecutive slices of at most `chunk` samples."""
+    for start in range(window.start, window.stop, chunk):
+        yield slice(start, min(start + chunk, window.stop))
@@ -44,6 +44,12 @@ fi
 
 echo "Using Python: $($PY_CMD --version)"
 
+# numpy / pandas in requirements.txt and testbench.py's config reader need 3.11+
+if ! $PY_CMD -c 'import sys; sys.exit(sys.version_info < (3, 11))'; then
+    echo "❌ CRITICAL ERROR: Python 3.11 or newer is required!"
+    return 1 2>/dev/null || exit 1
+fi
+
 
 # Create VENV if missing
 if [ ! -d "$VENV_PATH" ]; then
@@ -0,0 +1,586 @@
+import time
+
+_T0 = time.perf_counter() # first thing, so --timing covers every import below
+
+import argparse
+import json
+import os
+import sys
+
+"""
+One command line entry point for both instruments, driven by a config file (testbench.toml).
+
+    python src/testbench.py pico capture --duration 30
+    python src/testbench.py pico export results/run_01 --format parquet
+    python src/testbench.py pico plot results/run_01 --start 2 --end 3
+    python src/testbench.py pico analyze results/run_01
+    python src/testbench.py pico rapid --segments 500 --trigger-mv 1650
+    python src/testbench.py saleae capture --runs 10
+    python src/testbench.py saleae export lab_results/run_1
+    python src/testbench.py saleae plot lab_results/run_1
+    python src/testbench.py saleae analyze lab_results/run_1
+    python src/testbench.py align results/run_01 lab_results/run_1 --out results/joined_01
+    python src/testbench.py catalog add results/run_01 --tag supercap
+    python src/testbench.py catalog find --channel A --where "max_mv > 4500"
+    python src/testbench.py batch results/ lab_results/ --out results/batch_report.json
+    python src/testbench.py startup                  # cold-start time of each command
+
+Nothing heavy is imported up front: each subcommand imports only the modules it uses, so a
+capture doesn't pay for matplotlib, and `saleae analyze` never loads the Logic 2 API.
+Add --timing to any command to print how long it took to get going.
+"""
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CONFIG = os.path.join(HERE, "testbench.toml")
+ANALYZE_CHUNK = 1_000_000
+
+DEFAULTS = {
+    'pico': {
+        'driver': 'picosdk',
+        'serial': '',
+        'sample_interval_ns': 1_000_000,
+        'output_dir': 'results',
+        'name': 'run_01',
+        'channels': {'A': '10V'},
+        'analyze': {},
+        'rapid_block': {
+            'segments': 100,
+            'pre_samples': 1000,
+            'post_samples': 4000,
+            'sample_interval_ns': 8,
+            'trigger_channel': 'A',
+            'trigger_mv': 1000.0,
+            'direction': 'rising',
+            'auto_trigger_ms': 0,
+            'timeout_s': 10.0,
+        },
+    },
+    'saleae': {
+        'port': 10430,
+        'output_dir': 'lab_results',
+        'name': 'run_1',
+        'duration_s': 5.0,
+        'digital_sample_rate': 500_000_000,
+        'analog_sample_rate': 50_000,
+        'digital_voltage': 1.8,
+        'channels': {'0': 'digital'},
+        'save_sal': False,
+        'analyze': {},
+    },
+    'align': {
+        'pico_channel': 'A',
+        'level_mv': 1650.0,
+        'hysteresis_mv': 200.0,
+        'saleae_channel': 0,
+    },
+    'batch': {
+        'jobs': ['rc_fit', 'edge_stats', 'threshold_timing'],
+        'workers': 0,
+        'cache_dir': '.batch_cache',
+    },
+    'catalog': {
+        'root': 'catalog',
+        'auto_add': False,
+        'tags': [],
+    },
+}
+
+_marks = []
+
+
+def mark(label):
+    """Records time since process start (see --timing)."""
+    _marks.append((label, time.perf_counter() - _T0))
+
+
+def load(module):
+    """Imports an instrument module on first use, so each subcommand only pays for what it needs."""
+    import importlib
+    import instrument_paths  # noqa: F401 - puts the instrument folders on sys.path
+    try:
+        return importlib.import_module(module)
+    except ImportError as e:
+        raise SystemExit(f"Error importing {module} ({e}) - did you run that instrument's setup.sh?")
+
+
+def load_config(path):
+    """Reads the TOML config on top of DEFAULTS (a missing default file just means defaults)."""
+    config = json.loads(json.dumps(DEFAULTS))
+    if path is None:
+        path = DEFAULT_CONFIG if os.path.exists(DEFAULT_CONFIG) else None
+    if path is None:
+        return config
+    try:
+        import tomllib
+    except ImportError:
+        raise SystemExit(f"Reading {path} needs Python 3.11 or newer (tomllib) - this is {sys.version.split()[0]}")
+    with open(path, 'rb') as f:
+        user = tomllib.load(f)
+    for section, values in user.items():
+        config.setdefault(section, {}).update(values)
+    return config
+
+
+def capture_dir(section, args):
+    return args.dir or os.path.join(section['output_dir'], args.name or section['name'])
+
+
+def plot_path(args):
+    """--out, or plots/<capture name>.png next to the capture folder - never inside it."""
+    folder = os.path.normpath(args.dir)
+    return args.out or os.path.join(os.path.dirname(folder), "plots", os.path.basename(folder) + ".png")
+
+
+def catalog_add(config, paths, instrument, settings):
+    """Adds finished captures to the catalog when [catalog] auto_add is set."""
+    if not config['catalog']['auto_add']:
+        return
+    capture_catalog = load('capture_catalog')
+    with capture_catalog.CaptureCatalog(config['catalog']['root']) as catalog:
+        for path in paths:
+            catalog.add(path, instrument=instrument, config=settings, tags=config['catalog']['tags'])
+
+
+# --- pico ---------------------------------------------------------------------------------------
+
+def pico_capture(config, args):
+    pico_base = load('pico_base')
+    p = config['pico']
+    directory = capture_dir(p, args)
+    duration = args.duration if args.duration is not None else p.get('duration_s')
+    driver = None if p['driver'] == 'picosdk' else p['driver']
+
+    with pico_base.PicoStreamer(driver=driver, serial=p['serial'] or None) as scope:
+        for ch, voltage_range in p['channels'].items():
+            scope.setup_channel(ch, voltage_range=voltage_range)
+        mark("scope ready")
+        scope.run_capture(sample_interval_ns=p['sample_interval_ns'], disk_dir=directory, wait_for_input=not duration,
+                          duration_s=duration or None)
+    catalog_add(config, [directory], 'pico', p)
+
+
+def pico_rapid(config, args):
+    pico_base = load('pico_base')
+    p = config['pico']
+    rb = dict(DEFAULTS['pico']['rapid_block'], **p.get('rapid_block', {}))
+    for key in ('segments', 'trigger_mv'):
+        if getattr(args, key) is not None:
+            rb[key] = getattr(args, key)
+    driver = None if p['driver'] == 'picosdk' else p['driver']
+    name = args.name or p['name'] + "_rapid" # not the folder `pico capture` streams to
+    pico_storage = load('pico_storage')
+    if os.path.exists(os.path.join(p['output_dir'], name, pico_storage.META_FILENAME)):
+        raise SystemExit(f"{os.path.join(p['output_dir'], name)} already holds a capture - pick another --name")
+
+    with pico_base.PicoStreamer(driver=driver, serial=p['serial'] or None) as scope:
+        for ch, voltage_range in p['channels'].items():
+            scope.setup_channel(ch, voltage_range=voltage_range)
+        mark("scope ready")
+        scope.run_rapid_block(**rb)
+        path = scope.save_segments(name, p['output_dir'])
+    if path is not None:
+        catalog_add(config, [path], 'pico', p)
+
+
+def _pico_loaded(directory):
+    pico_base = load('pico_base')
+    scope = pico_base.PicoStreamer()
+    scope.load_capture(directory)
+    mark("capture opened")
+    return scope
+
+
+def pico_export(config, args):
+    scope = _pico_loaded(args.dir)
+    name = args.name or os.path.basename(os.path.normpath(args.dir))
+    out = args.out or config['pico']['output_dir']
+    if args.format == 'csv':
+        scope.save_to_csv(name, out, args.start, args.end)
+    else:
+        scope.save_binary(name, out, args.format, args.start, args.end)
+
+
+def pico_plot(config, args):
+    scope = _pico_loaded(args.dir)
+    name = os.path.basename(os.path.normpath(args.dir))
+    path = plot_path(args)
+    scope.plot_data(filename=os.path.basename(path), directory=os.path.dirname(path) or ".", title=name,
+                    t_start=args.start, t_end=args.end, show=args.show)
+
+
+def pico_analyze(config, args):
+    pico_analytics = load('pico_analytics')
+    pico_storage = load('pico_storage')
+    settings = config['pico']['analyze']
+
+    meta, channels = pico_storage.open_capture(args.dir)
+    mark("capture opened")
+    stats = pico_analytics.OnlineAnalytics(thresholds_mv=settings.get('thresholds_mv'),
+                                           hysteresis_mv=settings.get('hysteresis_mv', 0.0),
+                                           target_mv=settings.get('target_mv'),
+                                           summary_path=args.out or os.path.join(args.dir, "summary.json"))
+    stats.start(meta)
+    for ch, raw in channels.items():
+        for start in range(0, len(raw), ANALYZE_CHUNK):
+            stats.update(ch, raw[start:start + ANALYZE_CHUNK], start)
+    stats.finish()
+    for ch, summary in stats.snapshot().items():
+        if summary['samples']:
+            print(f"Ch {ch}: min {summary['min_mv']:.1f} mV, max {summary['max_mv']:.1f} mV, "
+                  f"mean {summary['mean_mv']:.1f} mV, rms {summary['rms_mv']:.1f} mV")
+
+
+# --- saleae -------------------------------------------------------------------------------------
+
+def saleae_capture(config, args):
+    saleae_base = load('saleae_base')
+    s = config['saleae']
+    duration = args.duration if args.duration is not None else s['duration_s']
+    name = args.name or s['name']
+
+    with saleae_base.SaleaeWrapper(port=s['port']) as logic:
+        logic.setup_channels(
+            channel_map={int(ch): mode for ch, mode in s['channels'].items()},
+            digital_sample_rate=s['digital_sample_rate'],
+            analog_sample_rate=s['analog_sample_rate'],
+            digital_voltage_level=s['digital_voltage']
+        )
+        mark("logic ready")
+        names = [name] if args.runs == 1 else [f"{name}_{i:03d}" for i in range(1, args.runs + 1)]
+        futures = logic.capture_batch(names, duration, s['output_dir'], save_sal=s['save_sal'], convert=True)
+        paths = [future.result() for future in futures.values()]
+    catalog_add(config, paths, 'saleae', s)
+
+
+def saleae_export(config, args):
+    saleae_loader = load('saleae_loader')
+    run = saleae_loader.load_capture(args.dir, rebuild=args.rebuild)
+    mark("capture opened")
+    for ch, (times, _) in run.digital.items():
+        print(f"Digital {ch}: {max(len(times) - 1, 0)} edges")
+    for ch, samples in run.analog.items():
+        print(f"Analog {ch}: {len(samples)} samples at {1 / run.analog_dt[ch] if run.analog_dt[ch] else 0:.0f} S/s")
+
+
+def saleae_plot(config, args):
+    import numpy as np
+    import matplotlib.pyplot as plt
+    saleae_loader = load('saleae_loader')
+    pico_decimate = load('pico_decimate')
+
+    run = saleae_loader.load_capture(args.dir)
+    mark("capture opened")
+    rows = len(run.digital) + len(run.analog)
+    if rows == 0:
+        print("No data to plot.")
+        return
+    fig, axes = plt.subplots(rows, 1, figsize=(10, 1.5 + 1.5 * rows), sharex=True, squeeze=False)
+    axes = axes[:, 0]
+    n_bins = int(fig.get_figwidth() * fig.dpi)
+
+    for ax, ch in zip(axes, run.digital):
+        trace = run.trace(ch).window(args.start, args.end)
+        x = np.r_[trace.times_ns, trace.end_ns] / 1e9
+        y = np.r_[trace.states, trace.states[-1]]
+        ax.step(x, y, where='post', color='green')
+        ax.set_ylabel(f"D{ch}")
+        ax.set_yticks([0, 1])
+
+    for ax, ch in zip(axes[len(run.digital):], run.analog):
+        samples, t0, dt = run.analog[ch], run.analog_t0[ch], run.analog_dt[ch]
+        start = 0 if args.start is None or not dt else max(int((args.start - t0) / dt), 0)
+        stop = len(samples) if args.end is None or not dt else min(int((args.end - t0) / dt) + 1, len(samples))
+        if stop > start:
+            x, y = pico_decimate.interleave(*pico_decimate.minmax_envelope(samples, n_bins, start, stop))
+            ax.plot(t0 + x * dt, y, color='blue')
+        ax.set_ylabel(f"A{ch} (V)")
+
+    axes[-1].set_xlabel("Time (s)")
+    filepath = plot_path(args)
+    os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+    fig.savefig(filepath)
+    print(f"Plot saved to: {filepath}")
+    if args.show:
+        plt.show()
+    plt.close(fig)
+
+
+def saleae_analyze(config, args):
+    import numpy as np
+    saleae_loader = load('saleae_loader')
+    run = saleae_loader.load_capture(args.dir)
+    mark("capture opened")
+
+    report = {'digital': {}, 'uart': {}}
+    for ch in run.digital:
+        trace = run.trace(ch)
+        periods = trace.periods()
+        widths = trace.pulse_widths()
+        report['digital'][str(ch)] = {
+            'edges': len(trace),
+            'duty_cycle': trace.duty_cycle(),
+            'frequency_hz': float(1 / np.median(periods)) if len(periods) else None,
+            'min_high_pulse_s': float(widths.min()) if len(widths) else None,
+        }
+        print(f"D{ch}: {len(trace)} edges, duty {trace.duty_cycle() * 100:.2f} %"
+              + (f", {report['digital'][str(ch)]['frequency_hz']:.3f} Hz" if len(periods) else ""))
+
+    uarts = config['saleae']['analyze'].get('uart', [])
+    if uarts:
+        saleae_decode = load('saleae_decode')
+    for uart in uarts:
+        parity = uart.get('parity', 'none')
+        frames = saleae_decode.decode_uart(run.trace(uart['channel']), uart['baud'], parity=None if parity == 'none' else parity)
+        errors = int((frames['framing_error'] | frames['parity_error']).sum())
+        text = saleae_decode.uart_bytes(frames)
+        report['uart'][str(uart['channel'])] = {'frames': len(frames), 'errors': errors,
+                                                'text': text.decode(errors='replace')}
+        print(f"UART D{uart['channel']} @ {uart['baud']}: {len(frames)} frames, {errors} errors")
+
+    path = args.out or os.path.join(args.dir, "analysis.json")
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Analysis saved to: {path}")
+
+
+# --- both ---------------------------------------------------------------------------------------
+
+def align_captures(config, args):
+    align = load('align')
+    saleae_loader = load('saleae_loader')
+    a = config['align']
+
+    run = saleae_loader.load_capture(args.saleae_dir)
+    pico_sync = align.pico_edges(args.pico_dir, a['pico_channel'], a['level_mv'], a['hysteresis_mv'], direction='both')
+    clock = align.estimate_clock(pico_sync, run.trace(a['saleae_channel']).edges())
+    print(clock)
+    if args.out:
+        align.export_joined(args.pico_dir, run, clock, args.out)
+
+
+def batch(config, args):
+    batch_analysis = load('batch_analysis')
+    b = config['batch']
+    jobs = args.jobs or b['jobs']
+    analyzer = batch_analysis.BatchAnalyzer(jobs=jobs, settings={job: b.get(job, {}) for job in jobs},
+                                            workers=args.workers or b['workers'] or None,
+                                            cache_dir=args.cache_dir or b['cache_dir'])
+    mark("analyzer ready")
+    results = analyzer.run(args.paths)
+    print(f"{results['computed']} analyzed, {results['cached']} from cache, {len(results['errors'])} failed "
+          f"in {results['wall_s']:.1f} s ({results['cpu_s']:.1f} s of worker time)")
+    for job, channels in results['summary'].items():
+        for ch, metrics in channels.items():
+            shown = ", ".join(f"{m} {v['mean']:.4g} ± {v['std']:.2g}" for m, v in list(metrics.items())[:3])
+            print(f"  {job} {ch}: {shown}")
+    analyzer.write_report(results, args.out)
+
+
+# --- catalog ------------------------------------------------------------------------------------
+
+def _run_line(run):
+    tags = f" [{', '.join(run['tags'])}]" if run['tags'] else ""
+    duration = f"{run['duration_s']:.3f} s" if run['duration_s'] is not None else "-"
+    return f"{run['id']:>5}  {run['created']}  {run['instrument'] or '-':<7} {duration:>12}  {run['name']}{tags}"
+
+
+def catalog_cmd(config, args):
+    capture_catalog = load('capture_catalog')
+    with capture_catalog.CaptureCatalog(args.root or config['catalog']['root']) as catalog:
+        if args.action == 'add':
+            for path in args.paths:
+                catalog.add(path, name=args.name, instrument=args.instrument, tags=args.tag or config['catalog']['tags'])
+        elif args.action == 'find':
+            try:
+                runs = catalog.find(instrument=args.instrument, name=args.name, tag=args.tag, since=args.since,
+                                    until=args.until, channel=args.channel, where=args.where or (), limit=args.limit)
+            except ValueError as e:
+                raise SystemExit(str(e))
+            for run in runs:
+                print(_run_line(run))
+            print(f"{len(runs)} runs")
+        elif args.action == 'show':
+            print(json.dumps(catalog.get(args.id), indent=2))
+        elif args.action == 'checkout':
+            catalog.checkout(args.id, args.dest)
+        elif args.action == 'remove':
+            catalog.remove(args.id)
+
+
+STARTUP_COMMANDS = {
+    'python': [],
+    'cli --help': ['--help'],
+    'pico capture imports': ['startup', '--probe', 'pico_base'],
+    'pico plot imports': ['startup', '--probe', 'pico_base', 'matplotlib.pyplot'],
+    'saleae analyze imports': ['startup', '--probe', 'saleae_loader', 'saleae_decode'],
+    'align imports': ['startup', '--probe', 'align', 'saleae_loader'],
+}
+
+
+def startup(config, args):
+    """Times fresh interpreters running each command's imports; optionally appends to a history file."""
+    if args.probe:
+        for module in args.probe:
+            load(module)
+        return
+
+    import statistics
+    import subprocess
+    results = {}
+    for label, cli_args in STARTUP_COMMANDS.items():
+        cmd = [sys.executable, '-c', 'pass'] if not cli_args else [sys.executable, os.path.abspath(__file__)] + cli_args
+        times = []
+        for _ in range(args.runs):
+            t0 = time.perf_counter()
+            subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            times.append(time.perf_counter() - t0)
+        results[label] = statistics.median(times) * 1000
+
+    previous = None
+    if args.history and os.path.exists(args.history):
+        with open(args.history) as f:
+            lines = f.read().splitlines()
+        previous = json.loads(lines[-1])['ms'] if lines else None
+
+    print(f"\n{'command':<26} {'cold start ms':>14} {'previous':>10}")
+    for label, ms in results.items():
+        before = f"{previous[label]:.0f}" if previous and label in previous else "-"
+        print(f"{label:<26} {ms:>14.0f} {before:>10}")
+
+    if args.history:
+        with open(args.history, 'a') as f:
+            f.write(json.dumps({'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': sys.version.split()[0],
+                                'runs': args.runs, 'ms': results}) + "\n")
+        print(f"Appended to: {args.history}")
+
+
+# --- argument parsing ---------------------------------------------------------------------------
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Capture, export, plot and analyze PicoScope / Saleae data.")
+    parser.add_argument('-c', '--config', help=f"TOML config (default: {DEFAULT_CONFIG} if it exists)")
+    parser.add_argument('--timing', action='store_true', help="Print time from process start to each stage")
+    instruments = parser.add_subparsers(dest='instrument', required=True)
+
+    def window(p):
+        p.add_argument('--start', type=float, help="Window start (s)")
+        p.add_argument('--end', type=float, help="Window end (s)")
+
+    pico = instruments.add_parser('pico', help="PicoScope (PicoStreamer)").add_subparsers(dest='action', required=True)
+    p = pico.add_parser('capture', help="Stream to a disk capture folder")
+    p.add_argument('--duration', type=float, help="Seconds to capture (default: config, else until 'done')")
+    p.add_argument('--name', help="Capture folder name under output_dir")
+    p.add_argument('--dir', help="Capture folder (overrides output_dir / name)")
+    p.set_defaults(func=pico_capture)
+    p = pico.add_parser('rapid', help="Rapid block: many triggered bursts at full sample rate (settings in [pico.rapid_block])")
+    p.add_argument('--segments', type=int, help="Number of triggered segments (default: config)")
+    p.add_argument('--trigger-mv', type=float, help="Trigger level in mV (default: config)")
+    p.add_argument('--name', help="Output folder name under output_dir (default: <name>_rapid)")
+    p.set_defaults(func=pico_rapid)
+    p = pico.add_parser('export', help="Convert a capture to npy / parquet / hdf5 / csv")
+    p.add_argument('dir')
+    p.add_argument('--format', choices=['npy', 'parquet', 'hdf5', 'csv'], default='npy')
+    p.add_argument('--name', help="Output name (default: capture folder name)")
+    p.add_argument('--out', help="Output folder (default: output_dir)")
+    window(p)
+    p.set_defaults(func=pico_export)
+    p = pico.add_parser('plot', help="Min/max plot of a capture")
+    p.add_argument('dir')
+    p.add_argument('--out', help="PNG path (default: plots/<name>.png next to the capture folder)")
+    p.add_argument('--show', action='store_true', help="Open a plot window")
+    window(p)
+    p.set_defaults(func=pico_plot)
+    p = pico.add_parser('analyze', help="Min / max / mean / RMS, thresholds, time-to-X%% (settings in [pico.analyze])")
+    p.add_argument('dir')
+    p.add_argument('--out', help="Summary JSON path (default: <dir>/summary.json)")
+    p.set_defaults(func=pico_analyze)
+
+    saleae = instruments.add_parser('saleae', help="Saleae Logic 2 (SaleaeWrapper)").add_subparsers(dest='action', required=True)
+    p = saleae.add_parser('capture', help="Timed capture(s), exported and converted in the background")
+    p.add_argument('--duration', type=float, help="Seconds per capture (default: config)")
+    p.add_argument('--name', help="Run name (default: config)")
+    p.add_argument('--runs', type=int, default=1, help="Number of back-to-back captures")
+    p.set_defaults(func=saleae_capture)
+    p = saleae.add_parser('export', help="Convert the CSV export to the binary cache")
+    p.add_argument('dir')
+    p.add_argument('--rebuild', action='store_true')
+    p.set_defaults(func=saleae_export)
+    p = saleae.add_parser('plot', help="Plot digital and analog channels")
+    p.add_argument('dir')
+    p.add_argument('--out', help="PNG path (default: plots/<name>.png next to the run folder)")
+    p.add_argument('--show', action='store_true', help="Open a plot window")
+    window(p)
+    p.set_defaults(func=saleae_plot)
+    p = saleae.add_parser('analyze', help="Edge / duty / frequency stats and UART decode (settings in [saleae.analyze])")
+    p.add_argument('dir')
+    p.add_argument('--out', help="Report JSON path (default: <dir>/analysis.json)")
+    p.set_defaults(func=saleae_analyze)
+
+    p = instruments.add_parser('align', help="Align a Pico capture with a Saleae run via a shared sync signal")
+    p.add_argument('pico_dir')
+    p.add_argument('saleae_dir')
+    p.add_argument('--out', help="Write the joined data (.npy columns) here")
+    p.set_defaults(func=align_captures)
+
+    p = instruments.add_parser('batch', help="Run analysis jobs over many captures on a process pool (settings in [batch])")
+    p.add_argument('paths', nargs='+', help="Capture folders / CSVs, or folders containing them")
+    p.add_argument('--jobs', nargs='+', choices=['rc_fit', 'edge_stats', 'threshold_timing'])
+    p.add_argument('--workers', type=int, help="Worker processes (default: one per core)")
+    p.add_argument('--cache-dir', help="Result cache (default: [batch] cache_dir)")
+    p.add_argument('--out', default="batch_report.json", help="Report JSON path (a .csv table is written next to it)")
+    p.set_defaults(func=batch)
+
+    catalog = instruments.add_parser('catalog', help="Index / search / restore stored captures (capture_catalog)")
+    catalog.add_argument('--root', help="Catalog folder (default: [catalog] root)")
+    catalog = catalog.add_subparsers(dest='action', required=True)
+    p = catalog.add_parser('add', help="Store and index capture folders / CSV files")
+    p.add_argument('paths', nargs='+')
+    p.add_argument('--name', help="Run name (default: folder / file name)")
+    p.add_argument('--instrument', choices=['pico', 'saleae'], help="Default: detected from the files")
+    p.add_argument('--tag', action='append', help="Tag to attach (repeatable)")
+    p.set_defaults(func=catalog_cmd)
+    p = catalog.add_parser('find', help="List runs matching every filter, newest first")
+    p.add_argument('--instrument', choices=['pico', 'saleae'])
+    p.add_argument('--name', help="Exact name or pattern with * wildcards")
+    p.add_argument('--tag')
+    p.add_argument('--since', help="YYYY-MM-DD[THH:MM:SS]")
+    p.add_argument('--until', help="YYYY-MM-DD[THH:MM:SS], inclusive (a date covers the whole day)")
+    p.add_argument('--channel', help="Channel the --where conditions apply to")
+    p.add_argument('--where', action='append', help="e.g. \"max_mv > 4500\" or \"duration_s >= 60\" (repeatable)")
+    p.add_argument('--limit', type=int)
+    p.set_defaults(func=catalog_cmd)
+    p = catalog.add_parser('show', help="Print one run with its files and channel summaries")
+    p.add_argument('id', type=int)
+    p.set_defaults(func=catalog_cmd)
+    p = catalog.add_parser('checkout', help="Copy a run's files out of the catalog")
+    p.add_argument('id', type=int)
+    p.add_argument('dest')
+    p.set_defaults(func=catalog_cmd)
+    p = catalog.add_parser('remove', help="Drop a run and any files no other run uses")
+    p.add_argument('id', type=int)
+    p.set_defaults(func=catalog_cmd)
+
+    p = instruments.add_parser('startup', help="Measure cold-start time of each command")
+    p.add_argument('--runs', type=int, default=5)
+    p.add_argument('--history', help="Append results to this JSON-lines file and compare with the last entry")
+    p.add_argument('--probe', nargs='+', help=argparse.SUPPRESS)
+    p.set_defaults(func=startup)
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    config = load_config(args.config)
+    mark("arguments parsed")
+    try:
+        args.func(config, args)
+    finally:
+        if args.timing:
+            mark("done")
+            print("\nTiming (s since process start):")
+            for label, seconds in _marks:
+                print(f"  {label:<18} {seconds:.3f}")
+
+
+if __name__ == "__main__":
+    main()
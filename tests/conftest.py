@@ -0,0 +1,40 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# the shared modules live in src/; instrument_paths adds src/picoscope and src/logic_analyzer
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+import instrument_paths  # noqa: E402,F401
+from pico_storage import write_meta  # noqa: E402
+
+
+def _write_pico_capture(directory, counts, interval_ns=1_000):
+    os.makedirs(directory)
+    counts = np.asarray(counts, dtype=np.int16)
+    counts.tofile(os.path.join(directory, "chA.bin"))
+    write_meta(directory, {'sample_interval_ns': interval_ns, 'max_adc': 32767, 'channel_ranges': {'A': 9},
+                           'sample_count': len(counts), 'dtype': 'int16', 'files': {'A': "chA.bin"}})
+    return directory
+
+
+@pytest.fixture
+def make_pico_capture():
+    """make_pico_capture(directory, counts, interval_ns=1_000): a disk capture of channel A on the 10 V range."""
+    return _write_pico_capture
+
+
+def _write_saleae_export(directory):
+    os.makedirs(directory)
+    with open(os.path.join(directory, "digital.csv"), 'w') as f:
+        f.write("Time [s],Channel 0\n")
+        for i in range(10):
+            f.write(f"{i * 1e-6:.9f},{i % 2}\n")
+    return directory
+
+
+@pytest.fixture
+def make_saleae_export():
+    """make_saleae_export(directory): a digital.csv export of channel 0 toggling every microsecond."""
+    return _write_saleae_export
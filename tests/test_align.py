@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from align import estimate_clock, pico_edges, sample_pico_at
+from pico_base import PicoStreamer
+from pico_driver import SimulatedPs2000a
+from saleae_digital import DigitalTrace
+
+INTERVAL_NS = 1_000
+N = 200_000 # 0.2 s
+OFFSET_S, DRIFT = 0.0371, 200e-6
+
+
+def toggles(seed=1):
+    """Sync toggle times (s) with uneven gaps of 0.5 - 1.5 ms."""
+    gaps = np.random.default_rng(seed).uniform(0.5e-3, 1.5e-3, 400)
+    t = np.cumsum(gaps)
+    return t[t < N * INTERVAL_NS / 1e9]
+
+
+def square(toggle_s, volts=3.3):
+    return lambda t: volts * (np.searchsorted(toggle_s, t, side='right') % 2)
+
+
+def pico_capture(directory, toggle_s):
+    driver = SimulatedPs2000a(waveforms={'A': square(toggle_s)}, speed=None, noise_counts=0)
+    with PicoStreamer(max_samples=N, driver=driver) as scope:
+        scope.setup_channel('A', '5V')
+        scope.run_capture(sample_interval_ns=INTERVAL_NS, wait_for_input=False)
+        scope.save_binary("sync", directory)
+    return f"{directory}/sync"
+
+
+def saleae_trace(toggle_s, t0_pico, t1_pico):
+    """The same toggles seen by the Saleae over part of the Pico run, on its own clock."""
+    keep = toggle_s[(toggle_s >= t0_pico) & (toggle_s < t1_pico)]
+    first_state = int(np.searchsorted(toggle_s, t0_pico, side='right') % 2)
+    times_s = OFFSET_S + (1 + DRIFT) * np.concatenate([[t0_pico], keep])
+    states = (first_state + np.arange(len(times_s))) % 2
+    return DigitalTrace(np.rint(times_s * 1e9).astype(np.int64), states.astype(np.uint8))
+
+
+def test_offset_and_drift_are_recovered(tmp_path):
+    toggle_s = toggles()
+    pico_dir = pico_capture(str(tmp_path), toggle_s)
+    trace = saleae_trace(toggle_s, 0.03, 0.17)
+
+    clock = estimate_clock(pico_edges(pico_dir, 'A', level_mv=1650), trace.edges(kind='rising'))
+    assert clock.offset_s == pytest.approx(OFFSET_S, abs=2e-6)
+    assert clock.drift == pytest.approx(DRIFT, abs=10e-6)
+    assert clock.matched == len(trace.edges(kind='rising'))
+    assert clock.residual_s < INTERVAL_NS / 1e9
+
+    # Pico voltage at Saleae event times: 100 us after each Saleae edge the line has settled
+    rising, falling = trace.edges(kind='rising'), trace.edges(kind='falling')
+    mv = sample_pico_at(pico_dir, np.concatenate([rising, falling]) + 100e-6, clock)['A']
+    assert np.all(np.abs(mv[:len(rising)] - 3300) < 50)
+    assert np.all(np.abs(mv[len(rising):]) < 50)
+
+
+def test_periodic_sync_is_rejected():
+    pico = np.arange(1, 100) * 1e-3
+    with pytest.raises(ValueError, match="too regular"):
+        estimate_clock(pico, OFFSET_S + pico[20:80])
@@ -0,0 +1,25 @@
+import numpy as np
+
+from pico_analytics import OnlineAnalytics
+from pico_pipeline import ChunkDescriptor
+
+META = {'sample_interval_ns': 1_000, 'max_adc': 32767, 'channel_ranges': {'A': 9}} # 10 V range
+HIGH, LOW = 10_000, 0 # ~3 V and 0 V in counts
+
+
+def block(seq, start, data):
+    return ChunkDescriptor(seq, start, len(data), {'A': np.asarray(data, dtype=np.int16)}, 0)
+
+
+def test_no_crossing_is_made_up_across_a_gap():
+    stats = OnlineAnalytics(thresholds_mv={'A': [1500]}, hysteresis_mv=100)
+    stats.start(META)
+    stats.consume(block(0, 0, [LOW] * 50 + [HIGH] * 50))  # rising at sample 50
+    stats.consume(block(1, 500, [LOW] * 30 + [HIGH] * 70)) # after a gap: starts low, rising at 530
+    stats.consume(block(2, 600, [HIGH] * 50 + [LOW] * 50)) # contiguous: falling at 650
+
+    summary = stats.snapshot()['A']
+    assert summary['gaps'] == 1 and summary['samples'] == 300
+    thr = summary['thresholds'][0]
+    assert np.allclose(thr['times_s'], [50e-6, 530e-6, 650e-6]) # no falling edge at 500
+    assert thr['directions'] == [1, 1, -1]
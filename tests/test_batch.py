@@ -0,0 +1,127 @@
+import os
+
+import numpy as np
+import pytest
+
+from batch_analysis import BatchAnalyzer
+
+TAU_S = 0.002
+INTERVAL_NS = 10_000
+N = 5_000
+MAX_ADC = 32767
+RANGE_MV = 10_000 # range index 9 = 10 V
+
+
+def rc_counts(tau_s=TAU_S):
+    """RC charge to 5 V on the 10 V range."""
+    t = np.arange(N) * INTERVAL_NS / 1e9
+    return np.rint(5000 * (1 - np.exp(-t / tau_s)) / RANGE_MV * MAX_ADC)
+
+
+@pytest.fixture
+def make_rc_capture(make_pico_capture):
+    return lambda directory, tau_s=TAU_S: make_pico_capture(directory, rc_counts(tau_s), INTERVAL_NS)
+
+
+@pytest.fixture
+def analyzer(tmp_path):
+    return BatchAnalyzer(jobs=['rc_fit'], workers=1, cache_dir=str(tmp_path / "cache"))
+
+
+def test_rc_fit_recovers_tau(tmp_path, analyzer, make_rc_capture):
+    make_rc_capture(str(tmp_path / "runs" / "run_1"))
+    results = analyzer.run([str(tmp_path / "runs")], progress=False)
+    assert not results['errors']
+    fit = results['captures'][0]['results']['rc_fit']['A']
+    assert fit['tau_s'] == pytest.approx(TAU_S, rel=0.01)
+
+
+def test_rerun_is_served_from_the_cache(tmp_path, analyzer, make_rc_capture):
+    runs = str(tmp_path / "runs")
+    make_rc_capture(os.path.join(runs, "run_1"))
+    make_rc_capture(os.path.join(runs, "run_2"), tau_s=0.004)
+    first = analyzer.run([runs], progress=False)
+    assert (first['computed'], first['cached']) == (2, 0)
+
+    second = analyzer.run([runs], progress=False)
+    assert (second['computed'], second['cached']) == (0, 2)
+    assert [c['results'] for c in second['captures']] == [c['results'] for c in first['captures']]
+
+
+def test_derived_files_keep_the_cache_valid(tmp_path, analyzer, make_rc_capture):
+    run = make_rc_capture(str(tmp_path / "run_1"))
+    analyzer.run([run], progress=False)
+    with open(os.path.join(run, "run_1.png"), 'w') as f:
+        f.write("plot")
+    assert analyzer.run([run], progress=False)['cached'] == 1
+
+
+def test_only_changed_captures_are_recomputed(tmp_path, analyzer, make_rc_capture):
+    runs = str(tmp_path / "runs")
+    make_rc_capture(os.path.join(runs, "run_1"))
+    changed = make_rc_capture(os.path.join(runs, "run_2"))
+    analyzer.run([runs], progress=False)
+
+    data = np.fromfile(os.path.join(changed, "chA.bin"), dtype=np.int16)
+    (data // 2).tofile(os.path.join(changed, "chA.bin"))
+    results = analyzer.run([runs], progress=False)
+    assert (results['computed'], results['cached']) == (1, 1)
+    assert [c['computed'] for c in results['captures']] == [[], ['rc_fit']]
+
+
+def test_new_job_settings_miss_the_cache(tmp_path, analyzer, make_rc_capture):
+    run = make_rc_capture(str(tmp_path / "run_1"))
+    analyzer.run([run], progress=False)
+    windowed = BatchAnalyzer(jobs=['rc_fit'], settings={'rc_fit': {'t_end': 0.01}}, workers=1,
+                             cache_dir=analyzer.cache_dir)
+    assert windowed.run([run], progress=False)['computed'] == 1
+
+
+def test_two_workers_match_one(tmp_path, analyzer, make_rc_capture):
+    runs = str(tmp_path / "runs")
+    for i, tau_s in enumerate([0.001, 0.002, 0.003, 0.004]):
+        make_rc_capture(os.path.join(runs, f"run_{i}"), tau_s)
+    parallel = BatchAnalyzer(jobs=['rc_fit'], workers=2, cache_dir=str(tmp_path / "cache_2"))
+    results = parallel.run([runs], progress=False)
+
+    assert not results['errors'] and results['computed'] == 4
+    assert [c['results'] for c in results['captures']] == [c['results'] for c in analyzer.run([runs], progress=False)['captures']]
+    assert results['summary']['rc_fit']['A']['tau_s']['count'] == 4
+
+
+def test_edge_stats_on_a_thresholded_square_wave(tmp_path, make_pico_capture):
+    square = np.where((np.arange(N) // 50) % 2, 3300, 0) / RANGE_MV * MAX_ADC # 1 kHz, 50 % duty
+    run = make_pico_capture(str(tmp_path / "run_1"), np.rint(square), INTERVAL_NS)
+    analyzer = BatchAnalyzer(jobs=['edge_stats'], settings={'edge_stats': {'level_mv': 1650, 'hysteresis_mv': 100}},
+                             workers=1, cache_dir=str(tmp_path / "cache"))
+    stats = analyzer.run([run], progress=False)['captures'][0]['results']['edge_stats']['A']
+
+    assert stats['level_mv'] == 1650
+    assert stats['edges'] == 99 # a toggle every 50 samples over 5000 samples
+    assert stats['frequency_hz'] == pytest.approx(1000)
+    assert stats['duty_cycle'] == pytest.approx(0.5, abs=0.01)
+    assert stats['min_high_s'] == pytest.approx(0.5e-3) and stats['max_low_s'] == pytest.approx(0.5e-3)
+
+
+def test_threshold_timing_on_an_rc_curve(tmp_path, make_rc_capture):
+    run = make_rc_capture(str(tmp_path / "run_1"))
+    settings = {'threshold_timing': {'levels_mv': {'A': [2500]}, 'target_mv': {'A': 5000}, 'percents': [63.2, 99]}}
+    analyzer = BatchAnalyzer(jobs=['threshold_timing'], settings=settings, workers=1, cache_dir=str(tmp_path / "cache"))
+    timing = analyzer.run([run], progress=False)['captures'][0]['results']['threshold_timing']['A']
+
+    dt = INTERVAL_NS / 1e9
+    assert timing['crossings_2500mv'] == 1
+    assert timing['first_rising_2500mv_s'] == pytest.approx(TAU_S * np.log(2), abs=dt)
+    assert timing['first_falling_2500mv_s'] is None
+    assert timing['time_to_63.2pct_s'] == pytest.approx(TAU_S, abs=dt)
+    assert timing['time_to_99pct_s'] == pytest.approx(TAU_S * np.log(100), abs=dt)
+
+
+def test_saleae_cache_stays_under_the_batch_cache(tmp_path, make_saleae_export):
+    run = make_saleae_export(str(tmp_path / "sal"))
+    analyzer = BatchAnalyzer(jobs=['edge_stats'], workers=1, cache_dir=str(tmp_path / "cache"))
+    results = analyzer.run([run], progress=False)
+
+    assert results['captures'][0]['results']['edge_stats']['0']['edges'] == 8
+    assert sorted(os.listdir(run)) == ["digital.csv"]
+    assert os.listdir(tmp_path / "cache" / "saleae") == [results['captures'][0]['sha256']]
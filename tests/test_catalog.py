@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from capture_catalog import CaptureCatalog
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    with CaptureCatalog(str(tmp_path / "catalog")) as catalog:
+        yield catalog
+
+
+def test_identical_data_is_added_once(tmp_path, catalog, make_pico_capture):
+    first = catalog.add(make_pico_capture(str(tmp_path / "run_1"), range(1000)))
+    second = catalog.add(make_pico_capture(str(tmp_path / "run_2"), range(1000)))
+    assert first == second
+    assert len(catalog.find()) == 1
+
+
+def test_changed_data_is_a_new_run(tmp_path, catalog, make_pico_capture):
+    first = catalog.add(make_pico_capture(str(tmp_path / "run_1"), range(1000)))
+    second = catalog.add(make_pico_capture(str(tmp_path / "run_2"), range(1, 1001)))
+    assert first != second
+
+
+def test_files_written_later_become_attachments(tmp_path, catalog, make_pico_capture):
+    run = make_pico_capture(str(tmp_path / "run_1"), range(1000))
+    run_id = catalog.add(run)
+    for name in ("run_1.png", "metrics.prom"):
+        with open(os.path.join(run, name), 'w') as f:
+            f.write("derived")
+
+    assert catalog.add(run) == run_id
+    files = {f['path']: f['data'] for f in catalog.get(run_id)['files']}
+    assert files == {'capture.json': True, 'chA.bin': True, 'run_1.png': False, 'metrics.prom': False}
+
+
+def test_channel_summary_is_queryable(tmp_path, catalog, make_pico_capture):
+    run_id = catalog.add(make_pico_capture(str(tmp_path / "run_1"), [0, 16384, 32767]))
+    assert [r['id'] for r in catalog.find(channel='A', where=['max_mv > 9999'])] == [run_id]
+    assert catalog.find(channel='A', where=['max_mv > 10001']) == []
+
+
+def test_date_bounds_include_the_whole_day(tmp_path, catalog, make_pico_capture):
+    run_id = catalog.add(make_pico_capture(str(tmp_path / "run_1"), range(1000)))
+    day = catalog.get(run_id)['created'][:10]
+    assert [r['id'] for r in catalog.find(since=day, until=day)] == [run_id]
+
+
+def test_saleae_index_leaves_the_folder_alone(tmp_path, catalog, make_saleae_export):
+    run = make_saleae_export(str(tmp_path / "sal"))
+    run_id = catalog.add(run)
+    assert sorted(os.listdir(run)) == ["digital.csv"]
+    # 9 transitions, but the last one is the end of the capture (edge windows are half-open)
+    assert catalog.get(run_id)['channels']['0']['edges'] == 8
+
+
+def test_checkout_restores_the_files(tmp_path, catalog, make_pico_capture):
+    run = make_pico_capture(str(tmp_path / "run_1"), range(1000))
+    run_id = catalog.add(run)
+    restored = catalog.checkout(run_id, str(tmp_path / "restored"))
+    with open(os.path.join(run, "chA.bin"), 'rb') as a, open(os.path.join(restored, "chA.bin"), 'rb') as b:
+        assert a.read() == b.read()
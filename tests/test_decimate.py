@@ -0,0 +1,21 @@
+import numpy as np
+
+from pico_decimate import MinMaxPyramid, minmax_envelope
+
+
+def test_pyramid_envelope_stays_inside_the_window():
+    raw = np.random.default_rng(0).integers(-1000, 1000, 1_000_000).astype(np.int16)
+    start, stop = 100_003, 900_001 # not aligned to any level's bins
+    raw[start - 1], raw[stop] = 30_000, -30_000 # spikes just outside the window
+
+    idx, mins, maxs = MinMaxPyramid(raw).envelope(1000, start, stop)
+    assert idx[0] == start and idx[-1] < stop
+    assert mins.min() == raw[start:stop].min() and maxs.max() == raw[start:stop].max()
+
+    # same overall extremes as the exact envelope, and every column is a true min/max of its samples
+    _, exact_min, exact_max = minmax_envelope(raw, 1000, start, stop)
+    assert (mins.min(), maxs.max()) == (exact_min.min(), exact_max.max())
+    edges = np.append(idx, stop)
+    for col in (0, 1, len(idx) - 2, len(idx) - 1):
+        window = raw[edges[col]:edges[col + 1]]
+        assert (mins[col], maxs[col]) == (window.min(), window.max())
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from saleae_decode import decode_i2c, decode_spi, decode_uart, encode_i2c, encode_spi, encode_uart, uart_bytes
+
+MESSAGE = b"Hello, testbench!\x00\xff\x55"
+
+
+@pytest.mark.parametrize('parity', [None, 'even', 'odd'])
+def test_uart_round_trip(parity):
+    frames = decode_uart(encode_uart(MESSAGE, 115_200, parity=parity), 115_200, parity=parity)
+    assert uart_bytes(frames) == MESSAGE
+    assert not (frames['parity_error'] | frames['framing_error'] | frames['break']).any()
+
+
+def test_uart_wrong_parity_is_flagged():
+    frames = decode_uart(encode_uart(b"\x01", 115_200, parity='even'), 115_200, parity='odd')
+    assert frames['parity_error'].all()
+
+
+@pytest.mark.parametrize('cpol, cpha', [(0, 0), (0, 1), (1, 0), (1, 1)])
+def test_spi_round_trip_all_modes(cpol, cpha):
+    mosi_words = [0x00, 0xA5, 0x3C, 0xFF, 0x81]
+    miso_words = [0xFF, 0x5A, 0xC3, 0x00, 0x7E]
+    clk, mosi, miso, cs = encode_spi(mosi_words, miso_words, clock_hz=1e6, cpol=cpol, cpha=cpha)
+    words = decode_spi(clk, mosi, miso, cs, cpol=cpol, cpha=cpha)
+    assert list(words['mosi']) == mosi_words
+    assert list(words['miso']) == miso_words
+    assert not words['incomplete'].any()
+
+
+def test_spi_lsb_first_16_bit():
+    clk, mosi, miso, cs = encode_spi([0x1234, 0xBEEF], bits_per_word=16, msb_first=False)
+    words = decode_spi(clk, mosi, miso, cs, bits_per_word=16, msb_first=False)
+    assert list(words['mosi']) == [0x1234, 0xBEEF]
+
+
+def test_i2c_round_trip():
+    transactions = [(0x48, False, [0x01, 0x60]), (0x48, True, [0x1F, 0x80, 0x00])]
+    scl, sda = encode_i2c(transactions)
+    out = decode_i2c(scl, sda)
+
+    expected = []
+    for address, read, payload in transactions:
+        expected += [(address << 1) | int(read)] + payload
+    assert list(out['value']) == expected
+    assert out['ack'].all() and not out['incomplete'].any()
+    addresses = out[out['address_byte']]
+    assert list(addresses['value'] >> 1) == [0x48, 0x48]
+    assert list(addresses['value'] & 1) == [0, 1]
+    assert np.all(np.diff(out['start_s']) > 0)
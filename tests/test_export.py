@@ -0,0 +1,22 @@
+import numpy as np
+
+from pico_base import PicoStreamer
+from pico_driver import SimulatedPs2000a
+from pico_storage import open_capture
+
+N = 100_000
+INTERVAL_NS = 1_000
+
+
+def test_binary_export_keeps_only_the_window(tmp_path):
+    with PicoStreamer(max_samples=N, driver=SimulatedPs2000a(speed=None)) as scope:
+        scope.setup_channel('A', '10V')
+        scope.run_capture(sample_interval_ns=INTERVAL_NS, wait_for_input=False)
+        scope.save_binary("all", str(tmp_path))
+        scope.save_binary("window", str(tmp_path), t_start=0.02, t_end=0.05)
+
+    _, everything = open_capture(str(tmp_path / "all"))
+    meta, window = open_capture(str(tmp_path / "window"))
+    assert meta['sample_count'] == len(window['A']) == 30_000
+    assert meta['window_start_s'] == 0.02
+    assert np.array_equal(window['A'], everything['A'][20_000:50_000])
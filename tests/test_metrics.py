@@ -0,0 +1,73 @@
+import json
+import os
+
+import pytest
+
+from capture_metrics import Histogram, Metrics
+
+
+def test_histogram_buckets_and_quantiles():
+    hist = Histogram([1.0, 2.0, 5.0, 10.0])
+    for value in [0.5, 1.0, 1.5, 3.0, 20.0]:
+        hist.observe(value)
+
+    assert hist.counts == [2, 1, 1, 0, 1] # bounds are inclusive, the last slot is +Inf
+    assert (hist.n, hist.sum, hist.min, hist.max) == (5, 26.0, 0.5, 20.0)
+    assert hist.quantile(0.2) == 1.0
+    assert hist.quantile(0.5) == 2.0 # upper bound of the bucket holding the median
+    assert hist.quantile(1.0) == 20.0 # the +Inf bucket reports the largest value seen
+    assert Histogram([1.0]).quantile(0.5) is None
+
+
+def test_sample_every_thins_histograms_only():
+    metrics = Metrics('t', sample_every=3)
+    for _ in range(7):
+        metrics.observe('poll_seconds', 1e-3)
+        metrics.observe('poll_seconds', 1e-3, channel='B')
+        metrics.count('polls')
+
+    d = metrics.to_dict()
+    assert d['histograms']['poll_seconds']['count'] == 3 # observations 0, 3 and 6
+    assert d['histograms']['poll_seconds{channel=B}']['count'] == 3 # sampled per label set
+    assert d['counters']['polls'] == 7
+
+
+def test_prometheus_buckets_are_cumulative():
+    metrics = Metrics('t')
+    for value in [1, 3, 100]:
+        metrics.observe('chunk_samples', value, channel='A')
+    metrics.event('overflow', channel='A')
+    lines = metrics.to_prometheus().splitlines()
+
+    assert lines.count("# TYPE t_chunk_samples histogram") == 1
+    buckets = [line for line in lines if line.startswith("t_chunk_samples_bucket")]
+    assert 't_chunk_samples_bucket{channel="A",le="1.0"} 1' in buckets
+    assert 't_chunk_samples_bucket{channel="A",le="4.0"} 2' in buckets
+    assert 't_chunk_samples_bucket{channel="A",le="64.0"} 2' in buckets
+    assert 't_chunk_samples_bucket{channel="A",le="256.0"} 3' in buckets
+    assert buckets[-1] == 't_chunk_samples_bucket{channel="A",le="+Inf"} 3'
+    counts = [int(line.rsplit(" ", 1)[1]) for line in buckets]
+    assert counts == sorted(counts)
+    assert 't_chunk_samples_sum{channel="A"} 104.0' in lines
+    assert 't_chunk_samples_count{channel="A"} 3' in lines
+    assert "t_overflow_events_total 1" in lines
+
+
+def test_save_writes_json_and_prom(tmp_path):
+    metrics = Metrics('t')
+    metrics.gauge('dropped_samples', 0)
+    with metrics.timer('export_seconds', format='csv'):
+        pass
+    directory = str(tmp_path / "run")
+
+    with open(metrics.save(directory)) as f:
+        saved = json.load(f)
+    assert saved['namespace'] == 't' and saved['gauges'] == {'dropped_samples': 0}
+    assert saved['histograms']['export_seconds{format=csv}']['count'] == 1
+
+    path = metrics.save(directory, fmt='prom')
+    assert os.path.basename(path) == "metrics.prom"
+    with open(path) as f:
+        assert "t_dropped_samples 0\n" in f.read()
+    with pytest.raises(ValueError):
+        metrics.save(directory, fmt='csv')
@@ -0,0 +1,57 @@
+import os
+
+import numpy as np
+
+from pico_driver import CHANNEL_INPUT_RANGES_MV, rc_charge
+from pico_multi import MultiScopeCapture
+from pico_storage import open_capture
+
+INTERVAL_NS = 10_000
+UNITS = [
+    {'serial': 'SIM00001', 'channels': {'A': '10V'}},
+    {'serial': 'SIM00002', 'channels': {'A': '10V', 'B': '5V'}},
+]
+
+
+class ExitingDriver:
+    """Kills the unit's process outright, the way a crash in the native driver would."""
+
+    def ps2000aOpenUnit(self, handle_ref, serial):
+        os._exit(3)
+
+
+def test_sim_units_are_merged_onto_one_time_base(tmp_path):
+    with MultiScopeCapture(UNITS, driver='sim', output_dir=str(tmp_path)) as multi:
+        merged_dir = multi.run(sample_interval_ns=INTERVAL_NS, duration_s=0.3, wait_for_input=False)
+
+    results = {r['serial']: r for r in multi.results}
+    assert sorted(results) == ['SIM00001', 'SIM00002']
+    for r in results.values():
+        assert 'error' not in r
+        assert r['samples'] > 0 and r['dropped_samples'] == 0
+        assert r['sample_interval_ns'] == INTERVAL_NS
+
+    meta, channels = open_capture(merged_dir)
+    assert sorted(channels) == ['SIM00001_A', 'SIM00002_A', 'SIM00002_B']
+    assert meta['start_time_ns'] == max(r['start_time_ns'] for r in results.values())
+    # the later unit starts the grid; the other one is read from its offset onwards
+    offsets = meta['unit_offsets_ns']
+    assert sorted(offsets) == ['SIM00001', 'SIM00002'] and min(offsets.values()) == 0
+    for serial, r in results.items():
+        assert offsets[serial] == meta['start_time_ns'] - r['start_time_ns']
+        assert meta['sample_count'] <= r['samples'] - offsets[serial] // INTERVAL_NS
+
+    # each unit's own clock starts at its stream start, so the merged A traces follow rc_charge from the offset
+    mv_per_count = CHANNEL_INPUT_RANGES_MV[meta['channel_ranges']['SIM00001_A']] / meta['max_adc']
+    for serial, offset_ns in offsets.items():
+        t = (offset_ns + np.arange(meta['sample_count']) * INTERVAL_NS) / 1e9
+        mv = np.asarray(channels[f'{serial}_A'], dtype=np.float64) * mv_per_count
+        assert np.abs(mv - rc_charge()(t) * 1000).max() < 50 # simulator noise is 20 counts (~6 mV)
+
+
+def test_a_unit_that_dies_is_reported_instead_of_hanging(tmp_path):
+    with MultiScopeCapture(UNITS, driver=ExitingDriver(), output_dir=str(tmp_path)) as multi:
+        results = multi.run(sample_interval_ns=INTERVAL_NS, duration_s=0.1, wait_for_input=False)
+
+    assert sorted(r['serial'] for r in results) == ['SIM00001', 'SIM00002']
+    assert all(r['error'] == "process exited with code 3" for r in results)
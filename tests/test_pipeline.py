@@ -0,0 +1,86 @@
+import threading
+import time
+
+import numpy as np
+
+from pico_pipeline import CapturePipeline, ChunkDescriptor, DiskWriterStage, LivePlotFeed
+from pico_storage import open_capture, valid_mask
+
+META = {'sample_interval_ns': 1_000, 'max_adc': 32767, 'channel_ranges': {'A': 9}}
+BLOCK = 100
+
+
+class GateStage:
+    """Holds on to every block until released, so the ring runs out of free blocks."""
+
+    name = 'gate'
+
+    def __init__(self):
+        self.open = threading.Event()
+
+    def start(self, meta):
+        pass
+
+    def consume(self, desc):
+        self.open.wait(5)
+
+    def finish(self):
+        pass
+
+
+def ramp(start, n):
+    return {'A': np.arange(start, start + n, dtype=np.int16)}
+
+
+def block(seq, start, n, data=None):
+    return ChunkDescriptor(seq, start, n, data if data is not None else ramp(start, n), 0)
+
+
+def test_backpressure_gap_keeps_samples_at_their_time(tmp_path):
+    directory = str(tmp_path / "run")
+    pipeline = CapturePipeline(block_samples=BLOCK, n_blocks=2, queue_depth=8)
+    gate = pipeline.subscribe(GateStage())
+    pipeline.subscribe(DiskWriterStage(directory))
+    pipeline.start(META, ['A'])
+
+    pipeline.publish(0, ramp(0, BLOCK))
+    pipeline.publish(BLOCK, ramp(BLOCK, BLOCK))
+    pipeline.publish(2 * BLOCK, ramp(2 * BLOCK, BLOCK)) # both blocks still held: not published
+    assert pipeline.backpressure_samples == BLOCK
+
+    gate.open.set()
+    deadline = time.time() + 5
+    while any(pipeline.ring.refs) and time.time() < deadline:
+        time.sleep(0.001)
+    pipeline.publish(3 * BLOCK, ramp(3 * BLOCK, BLOCK))
+    pipeline.close()
+
+    meta, channels = open_capture(directory)
+    assert meta['complete'] is False
+    assert meta['gaps'] == [[2 * BLOCK, BLOCK]]
+    assert meta['sample_count'] == 4 * BLOCK
+    mask = valid_mask(meta)
+    expected = np.arange(4 * BLOCK)
+    assert np.array_equal(channels['A'][mask], expected[mask])
+    assert not channels['A'][~mask].any()
+
+
+def test_disk_writer_without_gaps_is_complete(tmp_path):
+    stage = DiskWriterStage(str(tmp_path))
+    stage.start(META)
+    stage.consume(block(0, 0, BLOCK))
+    stage.consume(block(1, BLOCK, BLOCK))
+    stage.finish()
+    meta, channels = open_capture(str(tmp_path))
+    assert meta['complete'] is True and meta['gaps'] == []
+    assert np.array_equal(channels['A'], np.arange(2 * BLOCK))
+
+
+def test_live_plot_does_not_bin_across_a_gap():
+    feed = LivePlotFeed(window_s=0.001, points=10) # 100 samples per bin at 1 us
+    feed.start(META)
+    feed.consume(block(0, 0, 150))    # one full bin, 50 samples left over
+    feed.consume(block(1, 1000, 100)) # after a gap: the leftovers must not be joined on
+    trace = feed.snapshot()
+    assert np.allclose(trace['Time'], [0.0, 1000e-6])
+
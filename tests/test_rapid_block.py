@@ -0,0 +1,79 @@
+import os
+
+import numpy as np
+
+from pico_base import PicoStreamer
+from pico_driver import SimulatedPs2000a
+from pico_storage import open_capture
+
+PRE, POST = 100, 400
+
+
+def scope_with(channels):
+    scope = PicoStreamer(driver=SimulatedPs2000a(speed=None, noise_counts=0))
+    scope.open_unit()
+    for ch in channels:
+        scope.setup_channel(ch, '10V')
+    return scope
+
+
+def test_triggered_segments_fill_the_requested_shape():
+    scope = scope_with('B')
+    segments = scope.run_rapid_block(5, PRE, POST, sample_interval_ns=2, trigger_channel='B', trigger_mv=1000.0)
+    scope.close_unit()
+
+    assert segments['B'].shape == (5, PRE + POST)
+    assert scope.segment_interval_ns == 2 # one channel gets the fastest timebase
+    # the 1 kHz sine crosses 1000 mV rising once per period, between the last pre and the first post sample
+    for i in range(5):
+        mv = scope.segment_mv('B', i)
+        assert mv[PRE - 1] < 1000 <= mv[PRE]
+        assert -2e-9 < scope.trigger_offsets_s[i] <= 0
+
+
+def test_two_channels_fall_back_to_4_ns():
+    scope = scope_with('AB')
+    segments = scope.run_rapid_block(3, PRE, POST, sample_interval_ns=2, trigger_channel='B', trigger_mv=0.0)
+    scope.close_unit()
+
+    assert scope.segment_interval_ns == 4
+    assert segments['A'].shape == segments['B'].shape == (3, PRE + POST)
+
+
+def test_timeout_keeps_the_segments_that_triggered():
+    # the RC curve on A rises through 1000 mV once (at ~0.45 s), so only the first segment triggers
+    scope = scope_with('A')
+    segments = scope.run_rapid_block(3, PRE, POST, sample_interval_ns=64, trigger_channel='A',
+                                     trigger_mv=1000.0, timeout_s=0.2)
+    scope.close_unit()
+
+    assert segments['A'].shape == (1, PRE + POST)
+    assert len(scope.trigger_offsets_s) == 1
+
+
+def test_nothing_triggered_is_not_saved(tmp_path):
+    scope = scope_with('A')
+    segments = scope.run_rapid_block(2, PRE, POST, sample_interval_ns=64, trigger_channel='A',
+                                     trigger_mv=6000.0, timeout_s=0.1) # above the RC curve's 5 V
+    assert segments['A'].shape == (0, PRE + POST)
+    assert scope.save_segments("empty", str(tmp_path)) is None
+    scope.close_unit()
+    assert not os.path.exists(tmp_path / "empty")
+
+
+def test_saved_segments_round_trip(tmp_path):
+    scope = scope_with('AB')
+    scope.run_rapid_block(4, PRE, POST, sample_interval_ns=4, trigger_channel='B', trigger_mv=500.0)
+    path = scope.save_segments("burst", str(tmp_path))
+    scope.close_unit()
+
+    meta, channels = open_capture(path)
+    assert meta['mode'] == 'rapid_block' and meta['segments'] == 4
+    assert meta['pre_trigger_samples'] == PRE and meta['sample_interval_ns'] == 4
+    for ch in 'AB':
+        assert np.array_equal(channels[ch], scope.segments[ch])
+
+    reloaded = PicoStreamer()
+    reloaded.load_capture(path)
+    assert np.array_equal(reloaded.trigger_offsets_s, scope.trigger_offsets_s)
+    assert np.allclose(reloaded.segment_time(2), scope.segment_time(2))
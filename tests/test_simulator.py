@@ -0,0 +1,44 @@
+import numpy as np
+
+from pico_base import PicoStreamer
+from pico_driver import SimulatedPs2000a, rc_charge, sine
+from pico_pipeline import CapturePipeline
+
+N = 200_000
+INTERVAL_NS = 1_000
+
+
+def capture(speed=None):
+    driver = SimulatedPs2000a(speed=speed, noise_counts=0)
+    with PicoStreamer(max_samples=N, driver=driver) as scope:
+        scope.setup_channel('A', '10V')
+        scope.setup_channel('B', '5V')
+        scope.run_capture(sample_interval_ns=INTERVAL_NS, wait_for_input=False)
+    return scope
+
+
+def test_streaming_delivers_every_sample():
+    scope = capture(speed=20.0)
+    assert scope.sample_count == N
+    assert scope.dropped_samples == 0
+    assert len(scope.data_mv['A']) == len(scope.data_mv['Time']) == N
+
+
+def test_duration_counts_from_stream_start():
+    # a stop requested before the capture starts is cleared by run_capture; duration_s isn't
+    with PicoStreamer(driver=SimulatedPs2000a(speed=1.0, noise_counts=0)) as scope:
+        scope.setup_channel('A', '10V')
+        scope.stop_event.set()
+        scope.run_capture(sample_interval_ns=INTERVAL_NS, wait_for_input=False, record=False,
+                          pipeline=CapturePipeline(), duration_s=0.2)
+    assert 0.15 < scope.sample_count * INTERVAL_NS / 1e9 < 0.5
+
+
+def test_streaming_samples_match_the_waveform():
+    scope = capture()
+    t = np.asarray(scope.data_mv['Time'])
+    assert np.allclose(np.diff(t), INTERVAL_NS / 1e9)
+    # one ADC count is 10 V / 32767 on A and 5 V / 32767 on B
+    assert np.abs(np.asarray(scope.data_mv['A']) - rc_charge()(t) * 1000).max() < 0.5
+    assert np.abs(np.asarray(scope.data_mv['B']) - sine()(t) * 1000).max() < 0.5
+
@@ -0,0 +1,19 @@
+from pico_base import PicoStreamer
+from pico_driver import SimulatedPs2000a
+from pico_storage import open_capture
+
+INTERVAL_NS = 1_000
+
+
+def test_disk_capture_round_trips(tmp_path):
+    directory = str(tmp_path / "run")
+    with PicoStreamer(max_samples=200_000, driver=SimulatedPs2000a(speed=20.0, noise_counts=0)) as scope:
+        scope.setup_channel('A', '10V')
+        scope.setup_channel('B', '5V')
+        # disk captures aren't capped at max_samples
+        scope.run_capture(sample_interval_ns=INTERVAL_NS, disk_dir=directory, wait_for_input=False, duration_s=0.2)
+
+    meta, channels = open_capture(directory)
+    assert scope.dropped_samples == 0
+    assert 0 < meta['sample_count'] == len(channels['A']) == scope.sample_count
+    assert meta['sample_interval_ns'] == INTERVAL_NS
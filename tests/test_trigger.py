@@ -0,0 +1,28 @@
+import numpy as np
+
+from pico_pipeline import ChunkDescriptor
+from pico_storage import open_capture
+from pico_trigger import EdgeTrigger, TriggeredRecorder
+
+META = {'sample_interval_ns': 1_000, 'max_adc': 32767, 'channel_ranges': {'A': 9}}
+
+
+def block(seq, start, data):
+    return ChunkDescriptor(seq, start, len(data), {'A': data}, 0)
+
+
+def test_trigger_event_is_cut_at_a_gap(tmp_path):
+    signal = np.zeros(2000, dtype=np.int16)
+    signal[250:] = 10_000 # rising edge at sample 250, high from then on
+    recorder = TriggeredRecorder(EdgeTrigger('A', 1000), str(tmp_path), pre_s=100e-6, post_s=400e-6)
+    recorder.start(META)
+    recorder.consume(block(0, 0, signal[:300]))
+    recorder.consume(block(1, 1000, signal[1000:1300])) # still high: no edge across the gap
+    recorder.finish()
+
+    assert len(recorder.events) == 1
+    meta, channels = open_capture(recorder.events[0])
+    assert meta['partial'] is True
+    assert meta['trigger_sample'] == 250
+    assert len(channels['A']) == 150 # 100 pre + the 50 samples before the gap
+    assert recorder.history_fill == 100 # history refilled from after the gap only